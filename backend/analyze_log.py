@@ -1,12 +1,134 @@
 import pandas as pd
 import os
 import sys
+import json
+from collections import Counter
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LOG_FILE = os.path.join(ROOT, "game_log.csv")
+LOG_DIR = os.path.join(ROOT, "game_log")
+STATE_FILE = "_aggregates.json"
+
+FAST_MOVE_SECONDS = 3.0
+AGG_COLUMNS = ["time_taken", "cp_loss", "is_blunder", "bot_persona"]
+
+# --- Mergeable aggregates ---
+# Every statistic below is derived from these sums/counts, so partitions can be
+# aggregated once and merged instead of re-reading the whole log.
+
+def empty_aggregates():
+    return {
+        "rows": 0,
+        "persona_counts": {},
+        "cp_loss_sum": 0.0,
+        "cp_loss_hist": {},  # exact value counts -> exact median after merging
+        "blunders": 0,
+        "fast": {"count": 0, "cp_loss_sum": 0.0},
+        "slow": {"count": 0, "cp_loss_sum": 0.0},
+    }
+
+def aggregate(df):
+    fast = df[df['time_taken'] < FAST_MOVE_SECONDS]
+    slow = df[df['time_taken'] >= FAST_MOVE_SECONDS]
+    return {
+        "rows": int(len(df)),
+        "persona_counts": {str(k): int(v) for k, v in df['bot_persona'].value_counts().items()},
+        "cp_loss_sum": float(df['cp_loss'].sum()),
+        "cp_loss_hist": {str(int(k)): int(v) for k, v in df['cp_loss'].value_counts().items()},
+        "blunders": int(df['is_blunder'].sum()),
+        "fast": {"count": int(len(fast)), "cp_loss_sum": float(fast['cp_loss'].sum())},
+        "slow": {"count": int(len(slow)), "cp_loss_sum": float(slow['cp_loss'].sum())},
+    }
+
+def merge(a, b):
+    return {
+        "rows": a["rows"] + b["rows"],
+        "persona_counts": dict(Counter(a["persona_counts"]) + Counter(b["persona_counts"])),
+        "cp_loss_sum": a["cp_loss_sum"] + b["cp_loss_sum"],
+        "cp_loss_hist": dict(Counter(a["cp_loss_hist"]) + Counter(b["cp_loss_hist"])),
+        "blunders": a["blunders"] + b["blunders"],
+        "fast": {k: a["fast"][k] + b["fast"][k] for k in a["fast"]},
+        "slow": {k: a["slow"][k] + b["slow"][k] for k in a["slow"]},
+    }
+
+def _median(hist, total):
+    values = sorted((int(k), v) for k, v in hist.items())
+    def nth(n):
+        seen = 0
+        for value, count in values:
+            seen += count
+            if seen > n:
+                return value
+    if total % 2:
+        return float(nth(total // 2))
+    return (nth(total // 2 - 1) + nth(total // 2)) / 2
+
+# --- Columnar log (Parquet, partitioned by date=/tag=) ---
+
+def _partition_files(log_dir):
+    files = []
+    for dirpath, _, names in os.walk(log_dir):
+        for name in names:
+            if name.endswith(".parquet") and not name.startswith("."):
+                files.append(os.path.relpath(os.path.join(dirpath, name), log_dir))
+    return sorted(files)
+
+def update_columnar_aggregates(log_dir=LOG_DIR, rebuild=False):
+    """Aggregate only partition files not seen before and merge them into the stored state."""
+    import pyarrow.parquet as pq
+
+    state_path = os.path.join(log_dir, STATE_FILE)
+    state = {"processed": [], "aggregates": empty_aggregates()}
+    if os.path.exists(state_path) and not rebuild:
+        with open(state_path) as f:
+            state = json.load(f)
+
+    processed = set(state["processed"])
+    new_files = [p for p in _partition_files(log_dir) if p not in processed]
+    aggregates = state["aggregates"]
+    for rel_path in new_files:
+        df = pq.read_table(os.path.join(log_dir, rel_path), columns=AGG_COLUMNS).to_pandas()
+        aggregates = merge(aggregates, aggregate(df))
+
+    state = {"processed": sorted(processed | set(new_files)), "aggregates": aggregates}
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+    print(f"Columnar log: {len(new_files)} new partition file(s), {len(state['processed'])} total")
+    return aggregates
+
+def import_csv(log_file=LOG_FILE, log_dir=LOG_DIR, tag="csv-import"):
+    """One-off migration of an existing CSV log into the columnar layout."""
+    from move_log import rows_to_table, write_partitions
+
+    df = pd.read_csv(log_file, dtype=str, keep_default_na=False)
+    written = write_partitions(log_dir, rows_to_table(df.values.tolist()), tag)
+    print(f"Imported {len(df)} rows from {log_file} into {len(written)} partition file(s)")
+
+def export_csv(out_path, log_dir=LOG_DIR):
+    """Write the whole columnar log back out as a CSV in the original format."""
+    import pyarrow.dataset as ds
+
+    table = ds.dataset(log_dir, format="parquet", partitioning="hive", exclude_invalid_files=True).to_table()
+    df = table.to_pandas()
+    from move_log import LOG_COLUMNS
+    df = df[[name for name, _ in LOG_COLUMNS]].sort_values("timestamp")
+    df["timestamp"] = df["timestamp"].map(lambda t: t.isoformat())
+    df.to_csv(out_path, index=False)
+    print(f"Exported {len(df)} rows to {out_path}")
+
+# --- Report ---
+
 def analyze_log():
-    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "game_log.csv")
+    if os.path.isdir(LOG_DIR) and _partition_files(LOG_DIR):
+        report(update_columnar_aggregates(LOG_DIR))
+        return
+
+    log_file = LOG_FILE
     
     if not os.path.exists(log_file):
         print("No game log found.")
@@ -22,44 +144,49 @@ def analyze_log():
         print("Log is empty.")
         return
 
+    report(aggregate(df))
+
+def report(agg):
+    total = agg["rows"]
+    if total == 0:
+        print("Log is empty.")
+        return
+    personas = agg["persona_counts"]
+
     print("\n--- Game Log Analysis ---")
-    print(f"Total Moves Recorded: {len(df)}")
+    print(f"Total Moves Recorded: {total}")
     
     # 1. Persona Distribution
     print("\n[Bot Persona Distribution]")
-    print(df['bot_persona'].value_counts(normalize=True).mul(100).round(1).astype(str) + '%')
+    distribution = pd.Series(personas, name="proportion", dtype=float).sort_values(ascending=False) / total
+    distribution.index.name = "bot_persona"
+    print(distribution.mul(100).round(1).astype(str) + '%')
 
     # 2. User Performance
+    avg_cp_loss = agg["cp_loss_sum"] / total
+    blunder_rate = agg["blunders"] / total * 100
     print("\n[User Performance Stats]")
-    print(f"Average CP Loss: {df['cp_loss'].mean():.2f}")
-    print(f"Blunder Rate: {(df['is_blunder'].sum() / len(df) * 100):.1f}%")
+    print(f"Average CP Loss: {avg_cp_loss:.2f}")
+    print(f"Blunder Rate: {blunder_rate:.1f}%")
     
     # 3. Correlation: Time vs CP Loss
     # Simple check: Do fast moves lead to more blunders?
-    fast_moves = df[df['time_taken'] < 3.0]
-    slow_moves = df[df['time_taken'] >= 3.0]
+    fast_cp_loss = agg["fast"]["cp_loss_sum"] / agg["fast"]["count"] if agg["fast"]["count"] else None
+    slow_cp_loss = agg["slow"]["cp_loss_sum"] / agg["slow"]["count"] if agg["slow"]["count"] else None
     
     print("\n[Time vs Performance]")
-    if not fast_moves.empty:
-        print(f"Fast Moves (<3s) Avg CP Loss: {fast_moves['cp_loss'].mean():.2f}")
-    if not slow_moves.empty:
-        print(f"Slow Moves (>3s) Avg CP Loss: {slow_moves['cp_loss'].mean():.2f}")
+    if fast_cp_loss is not None:
+        print(f"Fast Moves (<3s) Avg CP Loss: {fast_cp_loss:.2f}")
+    if slow_cp_loss is not None:
+        print(f"Slow Moves (>3s) Avg CP Loss: {slow_cp_loss:.2f}")
 
     # 4. Tuning Recommendations
     print("\n[Tuning Recommendations]")
-    avg_cp_loss = df['cp_loss'].mean()
-    median_cp_loss = df['cp_loss'].median()
-    blunder_rate = (df['is_blunder'].sum() / len(df)) * 100
-    assist_rate = (df['bot_persona'] == 'Assist Mode').mean() * 100
-    mercy_rate = (df['bot_persona'] == 'Mercy Mode').mean() * 100
-    defensive_rate = (df['bot_persona'] == 'Defensive Master').mean() * 100
-    balanced_rate = (df['bot_persona'] == 'Balanced Challenger').mean() * 100
-    
-    # Time segments
-    fast_moves = df[df['time_taken'] < 3.0]
-    slow_moves = df[df['time_taken'] >= 3.0]
-    fast_cp_loss = fast_moves['cp_loss'].mean() if not fast_moves.empty else None
-    slow_cp_loss = slow_moves['cp_loss'].mean() if not slow_moves.empty else None
+    median_cp_loss = _median(agg["cp_loss_hist"], total)
+    assist_rate = personas.get('Assist Mode', 0) / total * 100
+    mercy_rate = personas.get('Mercy Mode', 0) / total * 100
+    defensive_rate = personas.get('Defensive Master', 0) / total * 100
+    balanced_rate = personas.get('Balanced Challenger', 0) / total * 100
     
     # Difficulty banding suggestions
     if avg_cp_loss > 100:
@@ -111,5 +238,23 @@ def analyze_log():
     elif median_cp_loss < 25:
         print("  Action: Consider challenging settings: USER_WINNING_MARGIN -> 160, MISTAKE_NATURAL_MIN -> 170, FAST_PLAY_LIMIT -> 2.5.")
 
-if __name__ == "__main__":
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Analyze the MorphEngine game log')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute columnar aggregates from all partitions')
+    parser.add_argument('--import-csv', action='store_true', help='Convert game_log.csv into the columnar log')
+    parser.add_argument('--export-csv', type=str, default=None, help='Export the columnar log as a CSV file')
+    args = parser.parse_args()
+
+    if args.import_csv:
+        import_csv()
+    if args.export_csv:
+        export_csv(args.export_csv)
+        return
+    if args.rebuild:
+        report(update_columnar_aggregates(LOG_DIR, rebuild=True))
+        return
     analyze_log()
+
+if __name__ == "__main__":
+    main()
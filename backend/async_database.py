@@ -0,0 +1,229 @@
+import asyncio
+from datetime import datetime
+
+from database import (MONGO_DB, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_TIMEOUT_MS, MONGO_URL,
+                      USE_MONGO, apply_to_memory, create_memory_game, games_memory, is_mongo_id,
+                      make_breaker, mongo_failed, new_game, update_ops)
+import metrics
+
+if USE_MONGO:
+    from bson.objectid import ObjectId
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+
+def group_updates(items):
+    """[(game_id, fields, moves)] -> {game_id: (merged $set fields, moves in order)}"""
+    grouped = {}
+    for game_id, fields, moves in items:
+        merged, pushed = grouped.setdefault(game_id, ({}, []))
+        merged.update(fields)
+        pushed.extend(moves)
+    return grouped
+
+
+def motor_client():
+    return AsyncIOMotorClient(
+        MONGO_URL,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    )
+
+
+class AsyncGameStore:
+    """
+    Async game persistence on Motor, falling back to database.games_memory.
+
+    The client is created on first use, not at import or startup, and a circuit
+    breaker sends calls straight to the memory store while Mongo is down.
+    Move updates are buffered and flushed as one ordered bulk_write per batch.
+
+    client_factory returns a Motor-compatible client; pass e.g.
+    mongomock_motor.AsyncMongoMockClient to run without a server.
+    """
+
+    def __init__(self, client_factory=None, batch_size=500, flush_interval=0.5):
+        if client_factory is None and USE_MONGO and AsyncIOMotorClient is not None:
+            client_factory = motor_client
+        elif client_factory is None:
+            print("motor not installed. Using In-Memory Fallback.")
+        self._client_factory = client_factory
+        self._client = None
+        self.breaker = make_breaker()
+        # Outcome of the last ping, read or write; a client object alone proves nothing
+        self.connected = False
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._flush_now = asyncio.Event()
+        self._flusher = None
+        self._connector = None
+        self._closing = False
+
+        self.flushes = 0
+        self.written = 0
+        self.fallback = 0
+
+    def _games(self):
+        """The games collection, or None while Mongo is unavailable."""
+        if self._client_factory is None or not self.breaker.allow():
+            return None
+        if self._client is None:
+            try:
+                self._client = self._client_factory()
+            except Exception as e:
+                # Bad URL, DNS or config: fail like a down server, which also ends a half-open probe
+                self._failed("connecting to", e)
+                return None
+            print(f"Connecting to MongoDB: {MONGO_URL} (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+        return self._client[MONGO_DB].games
+
+    def _succeeded(self):
+        self.connected = True
+        self.breaker.success()
+
+    def _failed(self, action, e):
+        self.connected = False
+        mongo_failed(self.breaker, action, e)
+
+    def _is_mongo_game(self, game_id):
+        return self._client_factory is not None and is_mongo_id(game_id)
+
+    async def create_game(self, guest_id, side, fen, orientation):
+        game = new_game(guest_id, side, fen, orientation)
+
+        with metrics.PHASE_SECONDS.time("db_write"):
+            games = self._games()
+            if games is not None:
+                try:
+                    result = await games.insert_one(game)
+                    self._succeeded()
+                    return str(result.inserted_id)
+                except Exception as e:
+                    self._failed("inserting to", e)
+
+            return create_memory_game(game)
+
+    async def update_game_move(self, game_id, fen, move_uci, is_bot=False):
+        update_data = {"current_fen": fen, "last_updated": datetime.utcnow()}
+
+        with metrics.PHASE_SECONDS.time("db_write"):
+            if self._is_mongo_game(game_id):
+                self._enqueue(game_id, update_data, [(fen, move_uci)])
+            else:
+                games_memory.add_move(game_id, fen, move_uci, updated_at=update_data["last_updated"])
+
+    async def finish_game(self, game_id, result=None):
+        update_data = {"status": "finished", "result": result, "last_updated": datetime.utcnow()}
+
+        with metrics.PHASE_SECONDS.time("db_write"):
+            if self._is_mongo_game(game_id):
+                # Same queue as the moves, so the status lands after the final move
+                self._enqueue(game_id, update_data)
+            else:
+                games_memory.set_status(game_id, "finished", result)
+
+    async def get_game(self, game_id):
+        if self._is_mongo_game(game_id):
+            games = self._games()
+            if games is not None:
+                try:
+                    game = await games.find_one({"_id": ObjectId(game_id)})
+                    self._succeeded()
+                    if game is not None:
+                        return game
+                except Exception as e:
+                    self._failed("reading", e)
+
+        return games_memory.get(game_id)
+
+    # --- Write-behind ---
+
+    def _enqueue(self, game_id, fields, moves=()):
+        self._pending.append((game_id, fields, list(moves)))
+        if len(self._pending) >= self.batch_size:
+            self._flush_now.set()
+
+    async def _flush(self):
+        items, self._pending = self._pending, []
+        if not items:
+            return
+        with metrics.PHASE_SECONDS.time("db_flush"):
+            await self._write_batch(items)
+
+    async def _write_batch(self, items):
+        grouped = group_updates(items)
+        self.flushes += 1
+
+        games = self._games()
+        if games is not None:
+            try:
+                await games.bulk_write(update_ops(grouped), ordered=True)
+                self._succeeded()
+                self.written += len(items)
+                return
+            except Exception as e:
+                self._failed(f"flushing {len(items)} updates to", e)
+
+        self.fallback += len(items)
+        apply_to_memory(grouped)
+
+    async def _flush_loop(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                # The batch is lost either way; the loop must survive for the next ones
+                print(f"Error flushing game updates: {e}")
+
+    async def connect(self):
+        """Open the connection in the background, so neither startup nor the first game waits on it."""
+        games = self._games()
+        if games is None:
+            return
+        try:
+            await self._client.admin.command("ping")
+            self._succeeded()
+            print(f"Connected to MongoDB: {MONGO_URL}")
+        except Exception as e:
+            self._failed("connecting to", e)
+
+    async def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+            self._connector = asyncio.create_task(self.connect())
+
+    async def close(self):
+        self._closing = True
+        if self._connector is not None and not self._connector.done():
+            self._connector.cancel()
+        if self._flusher is not None:
+            # Let an in-flight bulk_write finish rather than cancelling it
+            self._flush_now.set()
+            await self._flusher
+            self._flusher = None
+        await self._flush()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self):
+        return {
+            "backend": "mongo" if self._client_factory is not None else "memory",
+            "connected": self.connected,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "written": self.written,
+            "fallback": self.fallback,
+            "breaker": self.breaker.stats(),
+        }
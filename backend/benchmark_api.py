@@ -0,0 +1,260 @@
+"""
+Load / latency benchmark for the HTTP API.
+
+N concurrent simulated players start games and play moves through /start-game and
+/get-move, either against the app in-process (ASGI, default) or a running server
+(--url). User moves come from recorded games (--pgn, e.g. from export_pgn.py) when
+they are legal in the current position, otherwise from a random legal move; the
+reported think time follows a log-normal distribution around a few seconds.
+
+Writes a JSON report (throughput, p50/p95/p99 latency, per-persona cost) that can be
+compared against an earlier run with --baseline. Requires httpx.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import chess
+import chess.pgn
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+sys.path.append(BACKEND)
+
+
+def percentile(values, q):
+    # Nearest-rank percentile on a sorted copy
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean": round(sum(latencies) / len(latencies), 5),
+        "p50": round(percentile(latencies, 50), 5),
+        "p95": round(percentile(latencies, 95), 5),
+        "p99": round(percentile(latencies, 99), 5),
+        "max": round(max(latencies), 5),
+    }
+
+
+def load_recorded_games(path):
+    games = []
+    with open(path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                break
+            moves = list(game.mainline_moves())
+            if moves:
+                games.append(moves)
+    print(f"Loaded {len(games)} recorded games from {path}")
+    return games
+
+
+def think_time(rng, median=4.0, sigma=0.8):
+    # Log-normal: most moves take a few seconds, with a long tail of slow ones
+    return min(120.0, max(0.3, rng.lognormvariate(math.log(median), sigma)))
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.persona_latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, response):
+        if response.status_code != 200:
+            self.errors[f"{endpoint} {response.status_code}"] += 1
+            return None
+        self.latencies[endpoint].append(seconds)
+        return response.json()
+
+
+async def timed_post(client, recorder, endpoint, payload):
+    start = time.perf_counter()
+    try:
+        response = await client.post(endpoint, json=payload)
+    except httpx.HTTPError as e:
+        recorder.errors[f"{endpoint} {type(e).__name__}"] += 1
+        return None
+    return recorder.record(endpoint, time.perf_counter() - start, response)
+
+
+async def play_game(client, recorder, rng, args, recorded):
+    game = await timed_post(client, recorder, "/start-game", {"guest_id": "bench", "side": rng.choice(["white", "black"])})
+    if game is None:
+        return
+    board = chess.Board(game["fen"])
+    script = iter(rng.choice(recorded)) if recorded else iter(())
+
+    # Bot opens when the user plays black ("0000" = no user move, as in the frontend)
+    user_move = "0000" if game["orientation"] == "black" else None
+
+    for _ in range(args.max_moves):
+        if board.is_game_over():
+            break
+        if user_move is None:
+            move = next(script, None)
+            if move is None or not board.is_legal(move):
+                script = iter(())  # Recording diverged from this game; play randomly from here
+                move = rng.choice(list(board.legal_moves))
+            user_move = move.uci()
+        taken = think_time(rng)
+        if args.think_scale:
+            await asyncio.sleep(taken * args.think_scale)
+
+        payload = {"game_id": game["game_id"], "user_move": user_move, "fen": board.fen(), "time_taken": taken}
+        start = time.perf_counter()
+        reply = await timed_post(client, recorder, "/get-move", payload)
+        if reply is None:
+            break
+        persona = (reply.get("stats") or {}).get("difficulty")
+        if persona:
+            recorder.persona_latencies[persona].append(time.perf_counter() - start)
+        board = chess.Board(reply["fen"])
+        if reply.get("game_over"):
+            break
+        user_move = None
+
+
+async def player(client, recorder, seed, args, recorded):
+    rng = random.Random(seed)
+    for _ in range(args.games):
+        await play_game(client, recorder, rng, args, recorded)
+
+
+async def run_players(client, recorder, args, recorded):
+    base_seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    start = time.perf_counter()
+    await asyncio.gather(*(player(client, recorder, base_seed + i, args, recorded) for i in range(args.players)))
+    return time.perf_counter() - start
+
+
+async def benchmark(args, recorded):
+    recorder = Recorder()
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            version = (await client.get("/health")).json().get("version")
+            wall = await run_players(client, recorder, args, recorded)
+    else:
+        from main import app, API_VERSION
+        version = API_VERSION
+        transport = httpx.ASGITransport(app=app)
+        # Run the app's startup/shutdown hooks (engine pool, DB flusher) around the run
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                wall = await run_players(client, recorder, args, recorded)
+    return recorder, wall, version
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(args, recorder, wall, version):
+    moves = recorder.latencies["/get-move"]
+    total = sum(len(v) for v in recorder.persona_latencies.values())
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "version": version,
+            "commit": git_commit(),
+            "target": args.url or "in-process",
+            "players": args.players,
+            "games_per_player": args.games,
+            "max_moves": args.max_moves,
+            "think_scale": args.think_scale,
+            "seed": args.seed,
+            "pgn": args.pgn,
+            "env": {k: os.environ[k] for k in ("ENGINE_POOL_SIZE", "EVAL_CACHE_MB", "MOVE_LATENCY_SLO_P95", "PONDER_MOVES", "ENGINE_QUEUE")
+                    if k in os.environ},
+        },
+        "wall_seconds": round(wall, 3),
+        "moves": len(moves),
+        "throughput_moves_per_sec": round(len(moves) / wall, 3) if wall else None,
+        "errors": dict(recorder.errors),
+        "latency": {endpoint: summarize(values) for endpoint, values in recorder.latencies.items()},
+        "personas": {
+            persona: {"share": round(len(values) / total, 4), **summarize(values)}
+            for persona, values in sorted(recorder.persona_latencies.items())
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"\n--- API Benchmark ({report['meta']['target']}, {report['meta']['players']} players) ---")
+    print(f"Moves: {report['moves']} in {report['wall_seconds']}s -> {report['throughput_moves_per_sec']} moves/s")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+    for endpoint, s in report["latency"].items():
+        print(f"{endpoint:<12} n={s['count']:<6} p50={s['p50']*1000:.1f}ms p95={s['p95']*1000:.1f}ms p99={s['p99']*1000:.1f}ms")
+    print("\nPer persona (/get-move latency):")
+    for persona, s in report["personas"].items():
+        print(f"  {persona:<22} {s['share']*100:5.1f}%  mean={s['mean']*1000:.1f}ms p95={s['p95']*1000:.1f}ms")
+
+    if baseline:
+        print(f"\nVs baseline ({baseline['meta'].get('commit')}, {baseline['meta'].get('timestamp')}):")
+        old, new = baseline.get("throughput_moves_per_sec"), report["throughput_moves_per_sec"]
+        if old and new:
+            print(f"  throughput  {old} -> {new} moves/s ({(new - old) / old * 100:+.1f}%)")
+        old_lat = baseline.get("latency", {}).get("/get-move", {})
+        new_lat = report["latency"].get("/get-move", {})
+        for q in ("p50", "p95", "p99"):
+            if old_lat.get(q) and new_lat.get(q):
+                print(f"  /get-move {q}  {old_lat[q]*1000:.1f} -> {new_lat[q]*1000:.1f}ms "
+                      f"({(new_lat[q] - old_lat[q]) / old_lat[q] * 100:+.1f}%)")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark /start-game and /get-move under concurrent players')
+    parser.add_argument('-p', '--players', type=int, default=8, help='Concurrent simulated players')
+    parser.add_argument('-g', '--games', type=int, default=2, help='Games per player')
+    parser.add_argument('-m', '--max-moves', type=int, default=40, help='User moves per game before moving on')
+    parser.add_argument('--url', type=str, default=None, help='Benchmark a running server (e.g. http://localhost:8000) instead of in-process')
+    parser.add_argument('--pgn', type=str, default=None, help='Replay user moves from these recorded games')
+    parser.add_argument('--think-scale', type=float, default=0.0, help='Sleep this fraction of each think time (0 = back-to-back moves)')
+    parser.add_argument('--seed', type=int, default=None, help='Base seed; player i uses seed+i')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('-o', '--out', type=str, default=None, help='JSON report path (default: bench_api_<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, default=None, help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    recorded = load_recorded_games(args.pgn) if args.pgn else []
+    recorder, wall, version = asyncio.run(benchmark(args, recorded))
+    report = build_report(args, recorder, wall, version)
+
+    out = args.out or os.path.join(ROOT, f"bench_api_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nReport saved to {out}")
+
+
+if __name__ == '__main__':
+    main()
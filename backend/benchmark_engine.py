@@ -0,0 +1,203 @@
+"""
+Micro-benchmarks for MorphEngine's own (Python-side) cost per move.
+
+Search results come from fake_uci_engine.py, either in-process (the decision
+paths alone: board construction, score conversion, candidate filtering,
+logging) or through the engine pool and UCI pipe (full get_move), so the
+numbers don't depend on Stockfish being installed or on its search time.
+
+Use --baseline with an earlier report to fail (exit 1) when a path got slower
+than --max-regression, e.g. in CI.
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import chess
+import chess.engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+FAKE_ENGINE = os.path.join(BACKEND, 'fake_uci_engine.py')
+
+sys.path.append(BACKEND)
+
+from fake_uci_engine import DEFAULT_DEPTH, canned_lines
+
+
+def sample_positions(n, seed):
+    """(prev_board, user_move_uci, board) triples from random playouts, bot to move in board."""
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < n:
+        board = chess.Board()
+        for _ in range(rng.randint(1, 80)):
+            if board.is_game_over():
+                break
+            board.push(rng.choice(list(board.legal_moves)))
+        if board.is_game_over() or not board.move_stack:
+            continue
+        prev_board = board.copy()
+        user_move = prev_board.pop()
+        samples.append((prev_board, user_move.uci(), board))
+    return samples
+
+
+def canned_info(board, limit, multipv, root_moves=None):
+    """engine.analyse-shaped MultiPV list from the fake engine's scoring."""
+    depth = limit.depth or DEFAULT_DEPTH
+    info = []
+    for move, cp, mate in canned_lines(board, multipv, root_moves):
+        score = chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp)
+        info.append({"score": chess.engine.PovScore(score, board.turn), "pv": [move], "depth": depth})
+    return info
+
+
+def time_ops(fn, items, repeat=3):
+    # Best of `repeat` passes, per-op cost in microseconds
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"ops": len(items), "us_per_op": round(best / len(items) * 1e6, 2)}
+
+
+def run_plan(morph, answers, sample, game_id=None):
+    # Drive _plan_move with precomputed answers, so only MorphEngine's own code is timed
+    prev_board, user_move, board = sample
+    plan = morph._plan_move(board, 3.0, prev_board, user_move, game_id)
+    try:
+        request = next(plan)
+        while True:
+            req_board, limit, multipv, _, root_moves = request
+            request = plan.send(answers[(req_board.fen(), limit.depth, multipv, root_moves and tuple(root_moves))])
+    except StopIteration as stop:
+        return stop.value
+
+
+def collect_answers(morph, samples):
+    answers = {}
+    for prev_board, user_move, board in samples:
+        plan = morph._plan_move(board, 3.0, prev_board, user_move)
+        try:
+            request = next(plan)
+            while True:
+                req_board, limit, multipv, _, root_moves = request
+                key = (req_board.fen(), limit.depth, multipv, root_moves and tuple(root_moves))
+                if key not in answers:
+                    answers[key] = canned_info(req_board, limit, multipv, root_moves)
+                request = plan.send(answers[key])
+        except StopIteration:
+            pass
+    return answers
+
+
+def benchmark(args):
+    from morph_engine import MorphEngine
+
+    samples = sample_positions(args.positions, args.seed)
+    fens = [board.fen() for _, _, board in samples]
+    infos = [canned_info(board, chess.engine.Limit(time=0.1), 20) for _, _, board in samples]
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        morph = MorphEngine(pool_size=1)
+    try:
+        results["board_from_fen"] = time_ops(chess.Board, fens)
+        results["score_to_cp"] = time_ops(
+            lambda info: [morph._score_to_cp(line["score"].relative) for line in info], infos)
+        results["pick_mistake"] = time_ops(
+            lambda info: morph._pick_mistake(info, morph.MISTAKE_NATURAL_MIN, morph.MISTAKE_NATURAL_MAX), infos)
+        results["play_mistake"] = time_ops(lambda info: morph._play_mistake(info, morph.MISTAKE_SEVERE_MIN), infos)
+        results["log_move"] = time_ops(
+            lambda s: morph._log_move(s[2], s[1], 3.0, -120, -40, 80, False, {"difficulty": "Assist Mode", "depth": 12}, "e2e4"),
+            samples)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Persona prints are part of the real per-move cost; they just don't go to the terminal
+            answers = collect_answers(morph, samples)
+            results["plan_move"] = time_ops(lambda s: run_plan(morph, answers, s), samples)
+            ipc = samples[:args.ipc_positions]
+            results["get_move_ipc"] = time_ops(
+                lambda s: morph.get_move(s[2].fen(), 3.0, prev_fen=s[0].fen(), user_move_uci=s[1]), ipc, repeat=1)
+    finally:
+        morph.close()
+    return results
+
+
+def compare(results, baseline, max_regression):
+    regressions = []
+    print(f"\nVs baseline ({baseline['meta'].get('timestamp')}):")
+    for name, current in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        change = (current["us_per_op"] - old["us_per_op"]) / old["us_per_op"]
+        flag = "  REGRESSION" if change > max_regression else ""
+        print(f"  {name:<16} {old['us_per_op']:>10.2f} -> {current['us_per_op']:>10.2f} us ({change * 100:+.1f}%){flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark MorphEngine Python overhead with a fake UCI engine')
+    parser.add_argument('-n', '--positions', type=int, default=2000, help='Positions for the in-process benchmarks')
+    parser.add_argument('--ipc-positions', type=int, default=300, help='Positions for the full get_move (engine pipe) benchmark')
+    parser.add_argument('--seed', type=int, default=7, help='Seed for the sampled positions')
+    parser.add_argument('-o', '--out', type=str, default=None, help='Write the JSON report here')
+    parser.add_argument('--baseline', type=str, default=None, help='Earlier JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='Allowed slowdown vs baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # Fake engine, throwaway log and no book/cache hits: measure the decision code only
+    os.environ.setdefault('STOCKFISH_PATH', FAKE_ENGINE)
+    tmp_dir = tempfile.mkdtemp(prefix='morph_bench_')
+    os.environ['MOVE_LOG_PATH'] = os.path.join(tmp_dir, 'game_log.csv')
+    os.environ['MOVE_LOG_FORMAT'] = 'csv'
+    os.environ['OPENING_BOOK_PATH'] = os.path.join(tmp_dir, 'missing.bin')
+    os.environ['EVAL_CACHE_MB'] = '0'
+
+    results = benchmark(args)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "chess": chess.__version__,
+            "engine": os.environ['STOCKFISH_PATH'],
+            "positions": args.positions,
+            "ipc_positions": args.ipc_positions,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    print(f"--- MorphEngine micro-benchmarks ({args.positions} positions) ---")
+    for name, r in results.items():
+        print(f"  {name:<16} {r['us_per_op']:>10.2f} us/op  (n={r['ops']})")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"Slower than allowed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Compares MorphEngine's mistake-candidate modes (MISTAKE_CANDIDATES): multipv, widen, shortlist.
+
+For each sampled position and each persona band (Assist: natural, Mercy: severe), every
+mode runs its baseline search plus whatever extra searches it needs to pick a mistake.
+A reference search of all legal moves then scores the pick:
+
+  in_band    picked move's drop is inside the band (positions where the reference has one)
+  fallback   no candidate found, best move played instead
+  off_band   mean cp the picked drop falls outside the band
+  agree      same move as the multipv mode
+  cost       searches, MultiPV lines and engine ms per pick
+
+Uses $STOCKFISH_PATH (fake_uci_engine.py if unset); the fake engine scores every
+search the same way, so only Stockfish says anything about depth/time effects.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import chess
+import chess.engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+FAKE_ENGINE = os.path.join(BACKEND, 'fake_uci_engine.py')
+
+sys.path.append(BACKEND)
+
+from benchmark_engine import sample_positions
+
+MODES = ("multipv", "widen", "shortlist")
+
+
+def mistake_plan(morph, board, band):
+    # The part of _plan_move that differs between modes: baseline search, then the mistake
+    baseline = chess.engine.Limit(time=morph.BASELINE_TIME)
+    info = yield board, baseline, morph._baseline_multipv(), "baseline", None
+    move, _, _ = yield from morph._find_mistake(board, info, *band)
+    return move
+
+
+def drive(engine, plan, game):
+    cost = {"searches": 0, "lines": 0, "seconds": 0.0}
+    try:
+        request = next(plan)
+        while True:
+            board, limit, multipv, _, root_moves = request
+            start = time.perf_counter()
+            info = engine.analyse(board, limit, multipv=multipv, game=game, root_moves=root_moves)
+            cost["seconds"] += time.perf_counter() - start
+            cost["searches"] += 1
+            cost["lines"] += multipv
+            request = plan.send(info)
+    except StopIteration as stop:
+        return stop.value, cost
+
+
+def reference_drops(morph, engine, board, limit):
+    # Drop of every legal move from the best one, side to move's point of view
+    info = engine.analyse(board, limit, multipv=board.legal_moves.count(), game=("reference", board.fen()))
+    scores = {line["pv"][0].uci(): morph._score_to_cp(line["score"].relative) for line in info if line.get("pv")}
+    best = max(scores.values())
+    return {move: best - score for move, score in scores.items()}
+
+
+def off_band(drop, band):
+    low, high = band
+    if drop < low:
+        return low - drop
+    if high and drop > high:
+        return drop - high
+    return 0
+
+
+def benchmark(args):
+    from morph_engine import MorphEngine
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        morph = MorphEngine(pool_size=1)
+    bands = {
+        "natural": (morph.MISTAKE_NATURAL_MIN, morph.MISTAKE_NATURAL_MAX),
+        "severe": (morph.MISTAKE_SEVERE_MIN, None),
+    }
+    reference_limit = chess.engine.Limit(depth=args.reference_depth)
+    samples = [board for _, _, board in sample_positions(args.positions, args.seed)
+               if board.legal_moves.count() > 1]
+
+    rows = {(mode, band): [] for mode in MODES for band in bands}
+    try:
+        with morph.pool.acquire() as engine:
+            for i, board in enumerate(samples):
+                drops = reference_drops(morph, engine, board, reference_limit)
+                best = min(drops, key=drops.get)
+                for band_name, band in bands.items():
+                    reachable = any(off_band(d, band) == 0 for m, d in drops.items() if m != best)
+                    for mode in MODES:
+                        morph.MISTAKE_CANDIDATES = mode
+                        # New game per run: no transposition-table help from the previous mode
+                        move, cost = drive(engine, mistake_plan(morph, board, band), game=(mode, band_name, i))
+                        rows[(mode, band_name)].append({
+                            "move": move, "best": move == best, "reachable": reachable,
+                            "off_band": off_band(drops.get(move, 0), band), **cost,
+                        })
+    finally:
+        morph.close()
+
+    results = {}
+    for (mode, band_name), picks in rows.items():
+        base = rows[("multipv", band_name)]
+        reachable = [p for p in picks if p["reachable"]]
+        n = len(picks)
+        results[f"{mode}/{band_name}"] = {
+            "positions": n,
+            "in_band": round(sum(p["off_band"] == 0 and not p["best"] for p in reachable) / len(reachable), 3) if reachable else None,
+            "fallback": round(sum(p["best"] for p in picks) / n, 3),
+            "off_band": round(sum(p["off_band"] for p in picks) / n, 1),
+            "agree": round(sum(p["move"] == b["move"] for p, b in zip(picks, base)) / n, 3),
+            "searches": round(sum(p["searches"] for p in picks) / n, 2),
+            "lines": round(sum(p["lines"] for p in picks) / n, 2),
+            "ms": round(sum(p["seconds"] for p in picks) / n * 1000, 2),
+        }
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Compare mistake-candidate modes for selection quality and cost')
+    parser.add_argument('-n', '--positions', type=int, default=200, help='Sampled positions')
+    parser.add_argument('--seed', type=int, default=7, help='Seed for the sampled positions')
+    parser.add_argument('--reference-depth', type=int, default=10, help='Depth of the all-moves reference search')
+    parser.add_argument('-o', '--out', type=str, default=None, help='Write the JSON report here')
+    args = parser.parse_args()
+
+    os.environ.setdefault('STOCKFISH_PATH', FAKE_ENGINE)
+    os.environ['EVAL_CACHE_MB'] = '0'
+    os.environ['OPENING_BOOK_PATH'] = os.path.join(BACKEND, 'missing_book.bin')
+    os.environ['ENGINE_WARMUP_DEPTH'] = '0'
+
+    results = benchmark(args)
+
+    print(f"--- Mistake candidates ({args.positions} positions, reference depth {args.reference_depth}) ---")
+    print(f"  {'mode/band':<20} {'in_band':>8} {'fallback':>9} {'off_band':>9} {'agree':>6} {'searches':>9} {'lines':>6} {'ms':>8}")
+    for name, r in results.items():
+        in_band = f"{r['in_band']:.3f}" if r['in_band'] is not None else "-"
+        print(f"  {name:<20} {in_band:>8} {r['fallback']:>9.3f} {r['off_band']:>9.1f} {r['agree']:>6.3f} "
+              f"{r['searches']:>9.2f} {r['lines']:>6.2f} {r['ms']:>8.2f}")
+
+    if args.out:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "engine": os.environ['STOCKFISH_PATH'],
+                "positions": args.positions,
+                "seed": args.seed,
+                "reference_depth": args.reference_depth,
+            },
+            "results": results,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
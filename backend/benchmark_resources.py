@@ -0,0 +1,155 @@
+"""
+Measures the engine-resource planner (engine_resources.py): aggregate nps and move
+latency of a busy engine pool with and without it.
+
+Clients search sampled positions back to back through one AsyncEnginePool, the way
+concurrent /get-move requests do, for a fixed time per mode:
+
+  off       engines keep their defaults (Threads 1, Hash 16), no affinity
+  naive     every engine gets all CPUs as Threads, no affinity (hand-tuned oversubscription)
+  planned   the planner's slots: per-engine CPU slices, Threads, Hash, NUMA node
+
+  knps      nodes searched per second, all engines together
+  p50/p95   per-search latency, including the wait for a free engine
+
+Uses $STOCKFISH_PATH (fake_uci_engine.py if unset). The fake engine reports canned
+node counts and doesn't use CPU, so only Stockfish says anything about nps.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import chess.engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+FAKE_ENGINE = os.path.join(BACKEND, 'fake_uci_engine.py')
+
+sys.path.append(BACKEND)
+
+from benchmark_engine import sample_positions
+from engine_pool import AsyncEnginePool
+from engine_resources import ResourcePlanner, allowed_cpus, env_cpus
+
+MODES = ("off", "naive", "planned")
+
+
+def make_planner(mode, engines):
+    if mode == "off":
+        return None
+    if mode == "naive":
+        return ResourcePlanner(engines, cpus=env_cpus(), threads=len(env_cpus() or allowed_cpus()), pin=False)
+    return ResourcePlanner(engines, cpus=env_cpus())
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def run_mode(engine_path, mode, args, boards):
+    planner = make_planner(mode, args.engines)
+    pool = AsyncEnginePool(engine_path, size=args.engines, planner=planner)
+    limit = chess.engine.Limit(depth=args.depth) if args.depth else chess.engine.Limit(time=args.movetime)
+    latencies = []
+    nodes = 0
+    try:
+        # Spawned and warmed (network load, hash allocation) before the clock starts
+        await pool.warm(chess.engine.Limit(depth=1))
+        deadline = time.monotonic() + args.seconds
+
+        async def client(offset):
+            nonlocal nodes
+            i = offset
+            while time.monotonic() < deadline:
+                board = boards[i % len(boards)]
+                i += args.clients
+                start = time.perf_counter()
+                async with pool.acquire() as engine:
+                    info = await engine.analyse(board, limit)
+                latencies.append(time.perf_counter() - start)
+                nodes += info.get("nodes", 0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(k) for k in range(args.clients)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await pool.close()
+
+    slots = planner.slots if planner else []
+    return {
+        "engines": args.engines,
+        "threads": [slot.threads for slot in slots] or [1] * args.engines,
+        "hash_mb": [slot.hash_mb for slot in slots] or [16] * args.engines,
+        "pinned": [slot.as_dict()["cpus"] for slot in slots] if planner and planner.pin_engines else None,
+        "searches": len(latencies),
+        "searches_per_s": round(len(latencies) / elapsed, 2),
+        "knps": round(nodes / elapsed / 1000, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Aggregate nps and move latency with and without the engine-resource planner')
+    parser.add_argument('-e', '--engines', type=int, default=int(os.getenv('ENGINE_POOL_SIZE', '2')), help='Engines in the pool (default: $ENGINE_POOL_SIZE)')
+    parser.add_argument('-c', '--clients', type=int, default=None, help='Concurrent searches (default: one per engine)')
+    parser.add_argument('-s', '--seconds', type=float, default=10.0, help='Measured seconds per mode')
+    parser.add_argument('--movetime', type=float, default=0.1, help='Seconds per search (MorphEngine.BASELINE_TIME)')
+    parser.add_argument('--depth', type=int, default=None, help='Depth-limited searches instead (latency then shows the speedup)')
+    parser.add_argument('--modes', type=str, default=','.join(MODES), help='Modes to run, comma separated')
+    parser.add_argument('-n', '--positions', type=int, default=100, help='Sampled positions')
+    parser.add_argument('--seed', type=int, default=7, help='Seed for the sampled positions')
+    parser.add_argument('-o', '--out', type=str, default=None, help='Write the JSON report here')
+    args = parser.parse_args()
+    args.clients = args.clients or args.engines
+
+    engine_path = os.environ.setdefault('STOCKFISH_PATH', FAKE_ENGINE)
+    boards = [board for _, _, board in sample_positions(args.positions, args.seed)]
+    modes = [mode for mode in args.modes.split(',') if mode]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f'unknown mode {mode!r} (choose from {", ".join(MODES)})')
+
+    planner = ResourcePlanner(args.engines, cpus=env_cpus())
+    print(f"Topology: nodes {planner.stats()['nodes']}, {planner.cpu_count} CPU(s) for {args.engines} engine(s), "
+          f"{args.clients} client(s)")
+
+    results = {}
+    for mode in modes:
+        results[mode] = asyncio.run(run_mode(engine_path, mode, args, boards))
+
+    search = f"depth {args.depth}" if args.depth else f"{args.movetime}s"
+    print(f"--- Engine resources ({search} searches, {args.seconds}s per mode) ---")
+    print(f"  {'mode':<8} {'threads':>8} {'hash_mb':>8} {'searches/s':>11} {'knps':>10} {'p50_ms':>8} {'p95_ms':>8}")
+    for mode, r in results.items():
+        print(f"  {mode:<8} {sum(r['threads']):>8} {sum(r['hash_mb']):>8} {r['searches_per_s']:>11.2f} "
+              f"{r['knps']:>10.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+    if "planned" in results and results["planned"]["pinned"]:
+        print(f"  planned CPU slices: {results['planned']['pinned']}")
+
+    if args.out:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "engine": engine_path,
+                "topology": planner.stats()["nodes"],
+                "engines": args.engines,
+                "clients": args.clients,
+                "seconds": args.seconds,
+                "movetime": args.movetime,
+                "depth": args.depth,
+            },
+            "results": results,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+from collections import deque
+
+import chess
+import chess.engine
+import chess.pgn
+import chess.polyglot
+
+# Add current directory to path so we can import MorphEngine
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from morph_engine import MorphEngine
+from opening_book import write_book
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _lines(info):
+    lines = []
+    for line in info:
+        if not line.get("pv"):
+            continue
+        score = line["score"].relative
+        lines.append((line["pv"][0].uci(), score.score(), score.mate(), line.get("depth", 0)))
+    return lines
+
+
+def enumerate_positions(engine, plies, branch, search_time, multipv):
+    """
+    Breadth-first walk from the start position, following the engine's top `branch`
+    moves at each ply. Returns {zobrist_key: (board, baseline MultiPV info)}.
+    """
+    positions = {}
+    queue = deque([chess.Board()])
+    while queue:
+        board = queue.popleft()
+        key = chess.polyglot.zobrist_hash(board)
+        if key in positions or board.is_game_over():
+            continue
+        info = engine.analyse(board, chess.engine.Limit(time=search_time), multipv=multipv)
+        positions[key] = (board, info)
+        if len(positions) % 50 == 0:
+            print(f"  {len(positions)} positions searched...")
+        if board.ply() < plies:
+            for line in info[:branch]:
+                child = board.copy(stack=False)
+                child.push(line["pv"][0])
+                queue.append(child)
+    return positions
+
+
+def harvest_pgn(pgn_path, plies):
+    """Yield every position in the first `plies` of each game of a PGN file."""
+    with open(pgn_path) as f:
+        while True:
+            game = chess.pgn.read_game(f)
+            if game is None:
+                return
+            board = game.board()
+            yield board.copy(stack=False)
+            for move in list(game.mainline_moves())[:plies]:
+                board.push(move)
+                yield board.copy(stack=False)
+
+
+def build(out_path, plies, branch, search_time, pgn_path=None):
+    morph = MorphEngine(pool_size=1)
+    multipv = morph.BASELINE_MULTIPV
+    persona_depths = sorted({morph.DEFENSIVE_DEPTH, morph.BALANCED_DEPTH})
+    # The book answers baseline requests up to the time it was built with
+    search_time = max(search_time, morph.BASELINE_TIME)
+
+    start = time.time()
+    with morph.pool.acquire() as engine:
+        print(f"Enumerating top-{branch} lines to ply {plies}...")
+        positions = enumerate_positions(engine, plies, branch, search_time, multipv)
+
+        if pgn_path:
+            print(f"Harvesting positions from {pgn_path}...")
+            for board in harvest_pgn(pgn_path, plies):
+                key = chess.polyglot.zobrist_hash(board)
+                if key not in positions and not board.is_game_over():
+                    info = engine.analyse(board, chess.engine.Limit(time=search_time), multipv=multipv)
+                    positions[key] = (board, info)
+
+        print(f"Searching persona depths {persona_depths} for {len(positions)} positions...")
+        entries = {}
+        for key, (board, info) in positions.items():
+            depth_lines = []
+            for depth in persona_depths:
+                best = engine.analyse(board, chess.engine.Limit(depth=depth), multipv=1)[0]
+                score = best["score"].relative
+                depth_lines.append((best["pv"][0].uci(), score.score(), score.mate(), depth))
+            entries[key] = (_lines(info), depth_lines)
+
+    morph.close()
+
+    max_ply = max(board.ply() for board, _ in positions.values())
+    write_book(out_path, entries, search_time, multipv, max_ply)
+    size_kb = os.path.getsize(out_path) / 1024
+    print(f"Wrote {len(entries)} positions ({size_kb:.1f} KB) to {out_path} in {time.time() - start:.1f}s")
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Precompute the MorphEngine opening book')
+    parser.add_argument('-o', '--output', type=str, default=os.path.join(BASE_DIR, 'opening_book.bin'), help='Book file to write')
+    parser.add_argument('-p', '--plies', type=int, default=8, help='Depth of the opening tree in plies')
+    parser.add_argument('-b', '--branch', type=int, default=3, help='Engine moves followed per position')
+    parser.add_argument('-t', '--time', type=float, default=0.5, help='Seconds per baseline MultiPV search')
+    parser.add_argument('--pgn', type=str, default=None, help='Optional PGN file to harvest extra opening positions from')
+    args = parser.parse_args()
+
+    build(args.output, args.plies, args.branch, args.time, args.pgn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing.
+
+    After failure_threshold consecutive failures the breaker opens and allow()
+    returns False, so callers go straight to their fallback. Once reset_timeout
+    seconds have passed, a single probe call is let through (half-open): success
+    closes the breaker, failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+        self.trips = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        """Record a failure. Returns True if this call opened the breaker."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.trips += 1
+                return True
+            return False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+        }
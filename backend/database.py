@@ -2,31 +2,54 @@
 import uuid
 from datetime import datetime
 
+from circuit_breaker import CircuitBreaker
+from game_store import MemoryGameStore
+
+# Mongo settings and the in-memory fallback shared with async_database.AsyncGameStore,
+# which does all game persistence for the API
 # Configuration
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "chessmorph")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "2000"))
 
 # Global State
-db = None
 USE_MONGO = True
-games_memory = {}
+# Bounded fallback store (LRU + TTL), optionally spilling evicted games to SQLite
+games_memory = MemoryGameStore(
+    max_games=int(os.getenv("MEMORY_MAX_GAMES", "5000")),
+    idle_ttl=float(os.getenv("MEMORY_GAME_IDLE_TTL", "7200")),
+    finished_ttl=float(os.getenv("MEMORY_GAME_FINISHED_TTL", "600")),
+    spill_path=os.getenv("MEMORY_SPILL_PATH") or None,
+)
 
-# Try Connection
 try:
-    from pymongo import MongoClient
-    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
-    client.admin.command('ping')
-    db = client.chessmorph
-    print(f"Connected to MongoDB: {MONGO_URL}")
-except Exception as e:
-    print(f"MongoDB connection failed: {e}. Using In-Memory Fallback.")
+    from bson.objectid import ObjectId
+    from pymongo import UpdateOne
+except ImportError:
+    print("pymongo not installed. Using In-Memory Fallback.")
     USE_MONGO = False
-    db = None
 
-def get_database():
-    return db
+def make_breaker():
+    # After a few failures, skip Mongo entirely for a while instead of timing out on every request
+    return CircuitBreaker(
+        failure_threshold=int(os.getenv("MONGO_BREAKER_FAILURES", "3")),
+        reset_timeout=float(os.getenv("MONGO_BREAKER_RESET", "15")),
+    )
+
+def mongo_failed(breaker, action, e):
+    if breaker.failure():
+        print(f"Error {action} Mongo: {e}. Using In-Memory Fallback for {breaker.reset_timeout:.0f}s.")
+    else:
+        print(f"Error {action} Mongo: {e}")
 
-def create_game(guest_id, side, fen, orientation):
-    game = {
+def is_mongo_id(game_id):
+    # Memory games use uuid4 ids, Mongo games ObjectIds
+    return USE_MONGO and ObjectId.is_valid(game_id)
+
+def new_game(guest_id, side, fen, orientation):
+    return {
         "guest_id": guest_id,
         "side": side,
         "start_fen": fen,
@@ -36,38 +59,29 @@ def create_game(guest_id, side, fen, orientation):
         "created_at": datetime.utcnow(),
         "status": "active"
     }
-    
-    if USE_MONGO and db is not None:
-        try:
-            result = db.games.insert_one(game)
-            return str(result.inserted_id)
-        except Exception as e:
-            print(f"Error inserting to Mongo: {e}. Falling back to memory.")
-            
-    # Fallback / Memory
+
+def create_memory_game(game):
     game_id = str(uuid.uuid4())
-    game["_id"] = game_id
-    games_memory[game_id] = game
+    games_memory.create(game_id, game["guest_id"], game["side"], game["start_fen"],
+                        game["orientation"], created_at=game["created_at"])
     return game_id
 
-def update_game_move(game_id, fen, move_uci, is_bot=False):
-    update_data = {
-        "current_fen": fen,
-        "last_updated": datetime.utcnow()
-    }
-    
-    if USE_MONGO and db is not None:
-        try:
-            from bson.objectid import ObjectId
-            db.games.update_one(
-                {"_id": ObjectId(game_id)},
-                {"$set": update_data, "$push": {"moves": move_uci}}
-            )
-            return
-        except Exception as e:
-            print(f"Error updating Mongo: {e}")
-            
-    # Memory Fallback
-    if game_id in games_memory:
-        games_memory[game_id]["current_fen"] = fen
-        games_memory[game_id]["moves"].append(move_uci)
+def update_ops(grouped):
+    # One UpdateOne per game; bulk_write them ordered so a game's moves stay in order
+    ops = []
+    for game_id, (fields, moves) in grouped.items():
+        update = {"$set": fields}
+        if moves:
+            update["$push"] = {"moves": {"$each": [uci for _, uci in moves]}}
+        ops.append(UpdateOne({"_id": ObjectId(game_id)}, update))
+    return ops
+
+def apply_to_memory(grouped):
+    for game_id, (fields, moves) in grouped.items():
+        if game_id not in games_memory:
+            # Mongo game whose writes failed: keep at least its moves and position
+            games_memory.create(game_id, None, None, None, None)
+        for fen, uci in moves:
+            games_memory.add_move(game_id, fen, uci, updated_at=fields.get("last_updated"))
+        if "status" in fields:
+            games_memory.set_status(game_id, fields["status"], fields.get("result"))
@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import math
+import time
+
+import metrics
+from job_queue import TERMINAL, WORKER_TTL
+
+
+class NoEngineWorkers(RuntimeError):
+    """No live engine worker to send a move to."""
+
+
+class EngineWorkerError(RuntimeError):
+    """The worker failed to compute the move."""
+
+
+class _WorkerLost(Exception):
+    # The worker went away before answering; the job can be sent elsewhere
+    pass
+
+
+def _rendezvous_score(key, worker_id, capacity):
+    # Weighted rendezvous (highest random weight) hashing: uniform in (0, 1) per
+    # (game, worker), skewed by capacity so bigger workers take proportionally more games
+    digest = hashlib.blake2b(f"{key}\0{worker_id}".encode(), digest_size=8).digest()
+    u = (int.from_bytes(digest, "big") + 1) / (2 ** 64 + 2)
+    return capacity / -math.log(u)
+
+
+class EngineDispatcher:
+    """
+    The API's side of the engine workers: /get-move hands its board to get_move_for_board
+    and waits for the worker's reply.
+
+    Each game is routed to one worker by rendezvous hashing over the live workers, so it
+    stays on the same engines (warm hash, eval cache, carried evals, ponder) for as long
+    as that worker is up; when workers join or leave, only the games they gain or lose move.
+    A job whose worker stops sending heartbeats before answering is sent again, once.
+    """
+
+    def __init__(self, queue, timeout=30.0, refresh=1.0):
+        self.queue = queue
+        self.timeout = timeout
+        self.refresh = refresh
+        self._workers = {}
+        self._fetched = 0.0
+
+        self.dispatched = 0
+        self.rerouted = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def workers(self, force=False):
+        # Heartbeats are read at most every `refresh` seconds, not per move
+        if force or time.monotonic() - self._fetched > self.refresh:
+            self._workers = await self.queue.workers()
+            self._fetched = time.monotonic()
+        return self._workers
+
+    async def route(self, key, exclude=()):
+        workers = await self.workers()
+        if not any(w not in exclude for w in workers):
+            workers = await self.workers(force=True)
+        candidates = [(w, info) for w, info in workers.items() if w not in exclude]
+        if not candidates:
+            raise NoEngineWorkers("No engine workers available")
+        return max(candidates, key=lambda item: _rendezvous_score(key, item[0], item[1]["capacity"]))[0]
+
+    async def get_move_for_board(self, board, time_taken_seconds, game_id=None, on_event=None):
+        """Same contract as AsyncMorphEngine.get_move_for_board, served by a worker."""
+        job = {
+            "time_taken": time_taken_seconds,
+            "game_id": game_id,
+            "stream": on_event is not None,
+        }
+        if self.queue.in_process:
+            # The worker shares this process: hand it the live board (the caller holds the
+            # session lock) instead of a move list it would replay on every move
+            job["board"] = board
+        else:
+            job["root"] = board.root().fen()
+            job["moves"] = [move.uci() for move in board.move_stack]
+        key = game_id or board.fen()
+        worker = await self.route(key)
+        try:
+            return await self._run(worker, job, on_event)
+        except _WorkerLost:
+            self.rerouted += 1
+            metrics.ENGINE_JOBS.inc("rerouted")
+            self._fetched = 0.0
+            return await self._run(await self.route(key, exclude=(worker,)), job, on_event)
+
+    async def _run(self, worker, job, on_event):
+        job_id = await self.queue.submit(worker, job)
+        self.dispatched += 1
+        deadline = time.monotonic() + self.timeout
+        answered = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    metrics.ENGINE_JOBS.inc("timeout")
+                    raise asyncio.TimeoutError(f"Engine worker {worker} did not answer in {self.timeout}s")
+                try:
+                    name, data = await self.queue.receive(job_id, min(remaining, WORKER_TTL))
+                except asyncio.TimeoutError:
+                    if worker not in await self.workers(force=True):
+                        if answered:
+                            # Progress was already streamed; starting over elsewhere would repeat it
+                            raise EngineWorkerError(f"Engine worker {worker} went away mid-move")
+                        raise _WorkerLost()
+                    continue
+                answered = True
+                if name in TERMINAL:
+                    break
+                if on_event is not None:
+                    on_event(name, data)
+        except BaseException:
+            # Cancelled (client gone), timed out or lost: the worker stops on the mark
+            await asyncio.shield(self.queue.cancel(job_id))
+            raise
+        await self.queue.finish(job_id)
+
+        if name == "error":
+            self.errors += 1
+            metrics.ENGINE_JOBS.inc("error")
+            raise EngineWorkerError(data["detail"])
+        metrics.ENGINE_JOBS.inc("done")
+        return data["bot_move"], data["stats"]
+
+    async def update_config(self, config):
+        # Workers apply it before their next job
+        await self.queue.publish_config(config)
+
+    async def ready(self):
+        return any(info["stats"].get("ready") for info in (await self.workers()).values())
+
+    async def stats(self, details=True):
+        # details: each worker's own engine stats, as of its last heartbeat
+        workers = await self.workers()
+        return {
+            "workers": {w: {"capacity": info["capacity"], **(info["stats"] if details else {})}
+                        for w, info in workers.items()},
+            "dispatched": self.dispatched,
+            "rerouted": self.rerouted,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
@@ -0,0 +1,392 @@
+import asyncio
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import chess.engine
+
+
+class EnginePool:
+    """
+    Bounded pool of long-lived Stockfish processes.
+
+    Engines are spawned once (process start, UCI handshake, NNUE load) and then
+    checked out per request instead of being re-launched for every move.
+    Crashed or unresponsive engines are replaced transparently on checkout.
+    With a planner (engine_resources.py), each engine runs with its slot's Threads,
+    Hash and CPU affinity; a replacement takes over the slot of the engine it replaces.
+    """
+
+    def __init__(self, engine_path, size=2, acquire_timeout=10.0, planner=None):
+        self.engine_path = engine_path
+        self.size = max(1, int(size))
+        self.acquire_timeout = acquire_timeout
+        self.planner = planner
+        self._free_slots = list(planner.slots) if planner else []
+        self._slot_of = {}  # engine -> its EngineSlot
+
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._closed = False
+
+        # Counters exposed via /health
+        self.checkouts = 0
+        self.restarts = 0
+        self.spawn_failures = 0
+        self.warmed = 0
+
+    def _spawn(self):
+        with self._lock:
+            slot = self._free_slots.pop(0) if self._free_slots else None
+        try:
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+            if slot is not None:
+                try:
+                    # Pinned before Threads is set, so the search threads start on the slot's CPUs
+                    self.planner.pin(engine.transport.get_pid(), slot)
+                    engine.configure(slot.options(engine.options))
+                except Exception:
+                    engine.close()
+                    raise
+        except Exception:
+            with self._lock:
+                self._alive -= 1
+                self.spawn_failures += 1
+                if slot is not None:
+                    self._free_slots.append(slot)
+            raise
+        if slot is not None:
+            with self._lock:
+                self._slot_of[engine] = slot
+        return engine
+
+    def _is_healthy(self, engine):
+        try:
+            engine.ping()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, engine):
+        with self._lock:
+            self._alive -= 1
+            slot = self._slot_of.pop(engine, None)
+            if slot is not None:
+                self._free_slots.append(slot)
+        try:
+            engine.close()
+        except Exception:
+            pass
+
+    def warm(self, search_limit=None):
+        """
+        Start engines until the pool is full, so the first moves don't pay spawn latency.
+        With search_limit, each engine also runs one short search (network load, hash allocation).
+        """
+        started = 0
+        while True:
+            with self._lock:
+                if self._closed or self._alive >= self.size:
+                    break
+                self._alive += 1
+            engine = self._spawn()
+            if search_limit is not None:
+                try:
+                    engine.analyse(chess.Board(), search_limit)
+                except Exception:
+                    self._discard(engine)
+                    raise
+            with self._lock:
+                self.warmed += 1
+            self._idle.put(engine)
+            started += 1
+        return started
+
+    def _checkout(self):
+        if self._closed:
+            raise RuntimeError("Engine pool is closed")
+
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            engine = None
+            with self._lock:
+                grow = self._alive < self.size
+                if grow:
+                    self._alive += 1
+            if grow:
+                engine = self._spawn()
+            else:
+                try:
+                    engine = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No engine available after {self.acquire_timeout}s")
+
+        # Health check: replace engines whose process died while idle
+        if not self._is_healthy(engine):
+            print("Engine failed health check, restarting")
+            self._discard(engine)
+            with self._lock:
+                self._alive += 1
+                self.restarts += 1
+            engine = self._spawn()
+
+        with self._lock:
+            self.checkouts += 1
+        return engine
+
+    def _checkin(self, engine):
+        if self._closed:
+            self._discard(engine)
+            return
+        self._idle.put(engine)
+
+    @contextmanager
+    def acquire(self):
+        engine = self._checkout()
+        try:
+            yield engine
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError):
+            # The process is in an unknown state; drop it, a fresh one is spawned on demand
+            self._discard(engine)
+            with self._lock:
+                self.restarts += 1
+            engine = None
+            raise
+        finally:
+            if engine is not None:
+                self._checkin(engine)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "alive": self._alive,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "restarts": self.restarts,
+                "spawn_failures": self.spawn_failures,
+                "warmed": self.warmed,
+                "resources": self.planner.stats() if self.planner else None,
+            }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(engine)
+
+
+class AsyncEnginePool:
+    """
+    asyncio counterpart of EnginePool, built on chess.engine.popen_uci.
+    Waiting for an engine or a search result suspends the coroutine instead of a thread.
+    """
+
+    def __init__(self, engine_path, size=2, acquire_timeout=10.0, planner=None):
+        self.engine_path = engine_path
+        self.size = max(1, int(size))
+        self.acquire_timeout = acquire_timeout
+        self.planner = planner
+        self._free_slots = list(planner.slots) if planner else []
+        self._slot_of = {}
+
+        self._idle = None  # asyncio.LifoQueue, created inside the running loop
+        self._changed = None  # asyncio.Condition: an engine was checked in or a slot freed up
+        self._recovering = set()
+        self._alive = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.restarts = 0
+        self.spawn_failures = 0
+        self.warmed = 0
+
+    def _queue(self):
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue(maxsize=self.size)
+            self._changed = asyncio.Condition()
+        return self._idle
+
+    async def _notify(self):
+        # Wake one checkout waiting for an engine or a free slot
+        self._queue()
+        async with self._changed:
+            self._changed.notify()
+
+    async def _spawn(self):
+        slot = self._free_slots.pop(0) if self._free_slots else None
+        try:
+            transport, engine = await chess.engine.popen_uci(self.engine_path)
+            if slot is not None:
+                try:
+                    self.planner.pin(transport.get_pid(), slot)
+                    await engine.configure(slot.options(engine.options))
+                except Exception:
+                    transport.close()
+                    raise
+        except Exception:
+            self._alive -= 1
+            self.spawn_failures += 1
+            if slot is not None:
+                self._free_slots.append(slot)
+            await self._notify()
+            raise
+        if slot is not None:
+            self._slot_of[engine] = slot
+        return engine
+
+    async def _is_healthy(self, engine):
+        try:
+            await asyncio.wait_for(engine.ping(), timeout=self.acquire_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, engine):
+        self._alive -= 1
+        slot = self._slot_of.pop(engine, None)
+        if slot is not None:
+            self._free_slots.append(slot)
+        try:
+            await asyncio.wait_for(engine.quit(), timeout=2.0)
+        except Exception:
+            # Hung or already gone: kill it rather than leave the process behind
+            engine.transport.close()
+        await self._notify()
+
+    async def _warm_one(self, search_limit):
+        engine = await self._spawn()
+        try:
+            if search_limit is not None:
+                await engine.analyse(chess.Board(), search_limit)
+        except Exception:
+            await self._discard(engine)
+            raise
+        if self._closed:
+            await self._discard(engine)
+            return
+        self.warmed += 1
+        self._queue().put_nowait(engine)
+        await self._notify()
+
+    async def warm(self, search_limit=None):
+        """Same as EnginePool.warm, but engines start concurrently."""
+        tasks = []
+        while not self._closed and self._alive < self.size:
+            self._alive += 1
+            tasks.append(self._warm_one(search_limit))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return len(results) - len(errors)
+
+    async def _checkout(self):
+        if self._closed:
+            raise RuntimeError("Engine pool is closed")
+
+        idle = self._queue()
+        deadline = time.monotonic() + self.acquire_timeout
+        async with self._changed:
+            # An engine coming back or one being discarded (a slot to respawn) wakes a waiter
+            while idle.empty() and self._alive >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No engine available after {self.acquire_timeout}s")
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+                except asyncio.CancelledError:
+                    # Pass on a wakeup this waiter may have taken
+                    self._changed.notify()
+                    raise
+            engine = None
+            if not idle.empty():
+                engine = idle.get_nowait()
+            else:
+                self._alive += 1
+        if engine is None:
+            engine = await self._spawn()
+
+        if not await self._is_healthy(engine):
+            print("Engine failed health check, restarting")
+            # Its slot may go to a waiter woken by the discard; check out again like one
+            await self._discard(engine)
+            self.restarts += 1
+            return await self._checkout()
+
+        self.checkouts += 1
+        return engine
+
+    async def _checkin(self, engine):
+        if self._closed:
+            await self._discard(engine)
+            return
+        self._queue().put_nowait(engine)
+        await self._notify()
+
+    async def _recover(self, engine):
+        # The ping goes out after the cancelled search has been stopped and its bestmove read,
+        # so an engine that answers is idle again; one that doesn't is replaced
+        if await self._is_healthy(engine):
+            await self._checkin(engine)
+        else:
+            await self._discard(engine)
+            self.restarts += 1
+
+    @asynccontextmanager
+    async def acquire(self):
+        engine = await self._checkout()
+        try:
+            yield engine
+        except (chess.engine.EngineTerminatedError, chess.engine.EngineError):
+            await self._discard(engine)
+            self.restarts += 1
+            engine = None
+            raise
+        except asyncio.CancelledError:
+            # The engine may still be mid-"go": stop and drain it in the background, then hand
+            # it back warm instead of respawning. The cancellation isn't held up meanwhile.
+            task = asyncio.ensure_future(self._recover(engine))
+            self._recovering.add(task)
+            task.add_done_callback(self._recovering.discard)
+            engine = None
+            raise
+        finally:
+            if engine is not None:
+                await self._checkin(engine)
+
+    @property
+    def available(self):
+        """Engines a checkout gets without waiting: idle ones plus slots not spawned yet."""
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return idle + self.size - self._alive
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "alive": self._alive,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "checkouts": self.checkouts,
+            "restarts": self.restarts,
+            "spawn_failures": self.spawn_failures,
+            "warmed": self.warmed,
+            "resources": self.planner.stats() if self.planner else None,
+        }
+
+    async def close(self):
+        self._closed = True
+        if self._recovering:
+            # Recovered engines are discarded on check-in now that the pool is closed
+            await asyncio.gather(*self._recovering, return_exceptions=True)
+        if self._idle is None:
+            return
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
@@ -0,0 +1,304 @@
+"""
+Engine resource planner: Threads, Hash and CPU affinity for pooled engines.
+
+Every engine in a pool gets its own slice of the CPUs this process may use, so
+concurrent searches don't fight over cores. Slices never straddle a NUMA node:
+engines are spread over the nodes in proportion to their CPU counts, which keeps
+each engine's threads, hash and network on one node's memory (first touch).
+Within a node, SMT siblings stay together so engines don't share physical cores.
+
+The topology is read the way Stockfish's numa.h does it on Linux:
+/sys/devices/system/node/online and nodeN/cpulist, restricted to the process
+affinity. Elsewhere (or without sysfs) all CPUs form one node and nothing is pinned.
+Engines that have to share CPUs (more engines than CPUs) are not pinned either.
+
+Configuration (per deployment):
+    ENGINE_PLANNER=off|auto        off (default): engines keep their default options, no pinning
+    ENGINE_CPUS=0-7                CPUs to plan over (default: the process affinity)
+    ENGINE_RESERVED_CPUS=1         CPUs left to the API / OS, taken from the end (default 1)
+    ENGINE_THREADS=2               Threads per engine (default: its slice size)
+    ENGINE_HASH_MB=64              Hash per engine (default: sized from the budget)
+    ENGINE_HASH_BUDGET_MB=1024     Hash for all engines together (default: RAM / 4)
+"""
+import os
+
+NODE_ROOT = "/sys/devices/system/node"
+CPU_ROOT = "/sys/devices/system/cpu"
+# Stockfish's default; smaller tables only cost strength
+MIN_HASH_MB = 16
+# Moves search for ~0.1s, so a bigger table mostly adds to the clear on every
+# ucinewgame (a pooled engine switching games) without adding hits
+HASH_PER_THREAD_MB = 64
+
+
+def parse_cpulist(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11] (the sysfs / taskset format)."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def format_cpulist(cpus):
+    """Inverse of parse_cpulist: [0, 1, 2, 3, 8] -> '0-3,8'."""
+    parts = []
+    cpus = sorted(cpus)
+    i = 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        parts.append(str(cpus[i]) if i == j else f"{cpus[i]}-{cpus[j]}")
+        i = j + 1
+    return ",".join(parts)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def allowed_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+
+def _core_order(cpus):
+    # SMT siblings next to each other, so a contiguous slice takes whole cores
+    def core(cpu):
+        siblings = _read(f"{CPU_ROOT}/cpu{cpu}/topology/thread_siblings_list")
+        return (parse_cpulist(siblings)[0] if siblings else cpu, cpu)
+    return sorted(cpus, key=core)
+
+
+def read_topology(cpus=None):
+    """
+    CPUs per NUMA node, as lists in core order, restricted to `cpus` (default: the
+    process affinity). Nodes without usable CPUs are left out.
+    """
+    allowed = allowed_cpus() if cpus is None else set(cpus)
+    nodes = []
+    online = _read(f"{NODE_ROOT}/online")
+    for node in parse_cpulist(online) if online else []:
+        node_cpus = _read(f"{NODE_ROOT}/node{node}/cpulist")
+        usable = allowed.intersection(parse_cpulist(node_cpus)) if node_cpus else set()
+        if usable:
+            nodes.append(_core_order(usable))
+    assigned = {cpu for node in nodes for cpu in node}
+    if not nodes:
+        nodes = [_core_order(allowed)]
+    elif allowed - assigned:
+        # CPUs sysfs doesn't place on a node still count; same fallback as numa.h
+        nodes[0] = _core_order(set(nodes[0]) | (allowed - assigned))
+    return nodes
+
+
+def total_memory_mb():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _apportion(total, weights):
+    # Largest remainder: `total` split in proportion to weights, summing exactly to total
+    weight_sum = sum(weights)
+    shares = [total * w / weight_sum for w in weights]
+    counts = [int(s) for s in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda i: (counts[i] - shares[i], -weights[i]))
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _slices(cpus, count):
+    # count contiguous slices whose sizes differ by at most one; with more engines than
+    # CPUs, engines share single CPUs round-robin
+    if count > len(cpus):
+        return [[cpus[k % len(cpus)]] for k in range(count)]
+    size, extra = divmod(len(cpus), count)
+    slices, start = [], 0
+    for k in range(count):
+        end = start + size + (1 if k < extra else 0)
+        slices.append(cpus[start:end])
+        start = end
+    return slices
+
+
+def _power_of_two_floor(n):
+    return 1 << (max(1, int(n)).bit_length() - 1)
+
+
+class EngineSlot:
+    """What one pooled engine runs with: its NUMA node, CPUs, Threads and Hash."""
+
+    def __init__(self, index, node, cpus, threads, hash_mb, shared=False):
+        self.index = index
+        self.node = node
+        self.cpus = cpus
+        self.threads = threads
+        self.hash_mb = hash_mb
+        self.shared = shared  # CPUs also given to another engine (more engines than CPUs)
+
+    def options(self, engine_options=None):
+        """UCI options to configure, limited to the ones the engine declares."""
+        options = {"Threads": self.threads, "Hash": self.hash_mb}
+        if self.cpus:
+            # Stockfish binds its search threads to a custom NumaPolicy; without it the
+            # process affinity set by pin() still holds
+            options["NumaPolicy"] = format_cpulist(self.cpus)
+        if engine_options is not None:
+            options = {name: value for name, value in options.items() if name in engine_options}
+        return options
+
+    def as_dict(self):
+        return {
+            "node": self.node,
+            "cpus": format_cpulist(self.cpus) if self.cpus else None,
+            "threads": self.threads,
+            "hash_mb": self.hash_mb,
+            "shared": self.shared,
+        }
+
+
+class ResourcePlanner:
+    """
+    Splits the machine between `engines` engines. plan() gives one EngineSlot per engine;
+    pools hand a free slot to each engine they spawn and return it when it is discarded.
+    """
+
+    def __init__(self, engines, cpus=None, reserved_cpus=0, threads=None, hash_mb=None,
+                 hash_budget_mb=None, pin=True):
+        self.engines = max(1, int(engines))
+        self.pin_engines = pin and hasattr(os, "sched_setaffinity")
+        self.threads = threads
+        self.hash_mb = hash_mb
+        if hash_budget_mb is None:
+            memory = total_memory_mb()
+            hash_budget_mb = memory // 4 if memory else MIN_HASH_MB * self.engines
+        self.hash_budget_mb = hash_budget_mb
+
+        self.nodes = _reserve(read_topology(cpus), reserved_cpus)
+        self.slots = self.plan()
+
+    @property
+    def cpu_count(self):
+        return sum(len(node) for node in self.nodes)
+
+    def plan(self):
+        slots = []
+        counts = _apportion(self.engines, [len(node) for node in self.nodes])
+        for node, (cpus, count) in enumerate(zip(self.nodes, counts)):
+            if count == 0:
+                continue
+            shared = count > len(cpus)
+            # Pinning shared slices would only stop the scheduler moving engines to idle CPUs
+            pin = self.pin_engines and not shared
+            for slice_ in _slices(cpus, count):
+                threads = self.threads or len(slice_)
+                slots.append(EngineSlot(len(slots), node, slice_ if pin else None,
+                                        threads, self._hash_for(threads), shared))
+        return slots
+
+    def _hash_for(self, threads):
+        if self.hash_mb:
+            return self.hash_mb
+        per_engine = min(self.hash_budget_mb // self.engines, HASH_PER_THREAD_MB * threads)
+        return max(MIN_HASH_MB, _power_of_two_floor(per_engine))
+
+    def pin(self, pid, slot):
+        """Restrict every thread of engine process `pid` to the slot's CPUs."""
+        if not self.pin_engines or not slot.cpus:
+            return False
+        try:
+            tasks = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            tasks = [pid]
+        for tid in tasks:
+            try:
+                os.sched_setaffinity(tid, slot.cpus)
+            except ProcessLookupError:
+                pass  # thread exited meanwhile
+        return True
+
+    def stats(self):
+        return {
+            "nodes": [format_cpulist(node) for node in self.nodes],
+            "engines": self.engines,
+            "cpus": self.cpu_count,
+            "oversubscribed": sum(slot.threads for slot in self.slots) > self.cpu_count,
+            "hash_budget_mb": self.hash_budget_mb,
+            "slots": [slot.as_dict() for slot in self.slots],
+        }
+
+
+def _reserve(nodes, reserved_cpus):
+    """The nodes without their last `reserved_cpus` CPUs (at least one CPU stays for the engines)."""
+    if not reserved_cpus:
+        return nodes
+    reserved = set([cpu for node in nodes for cpu in node][-reserved_cpus:])
+    trimmed = [[cpu for cpu in node if cpu not in reserved] for node in nodes]
+    return [node for node in trimmed if node] if any(trimmed) else nodes
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def planner_enabled():
+    return os.getenv("ENGINE_PLANNER", "off") != "off"
+
+
+def env_cpus():
+    """ENGINE_CPUS within the process affinity, or None to use the whole affinity."""
+    cpus = os.getenv("ENGINE_CPUS")
+    return allowed_cpus().intersection(parse_cpulist(cpus)) if cpus else None
+
+
+def reserved_from_env():
+    return _env_int("ENGINE_RESERVED_CPUS", 1)
+
+
+def engine_cpus():
+    """The CPUs engines may use after ENGINE_CPUS and ENGINE_RESERVED_CPUS, for split_cpus."""
+    return [cpu for node in _reserve(read_topology(env_cpus()), reserved_from_env()) for cpu in node]
+
+
+def planner_from_env(engines):
+    """ResourcePlanner configured from the ENGINE_* variables, or None with ENGINE_PLANNER=off."""
+    if not planner_enabled():
+        return None
+    return ResourcePlanner(
+        engines,
+        cpus=env_cpus(),
+        reserved_cpus=reserved_from_env(),
+        threads=_env_int("ENGINE_THREADS"),
+        hash_mb=_env_int("ENGINE_HASH_MB"),
+        hash_budget_mb=_env_int("ENGINE_HASH_BUDGET_MB"),
+    )
+
+
+def split_cpus(parts, cpus=None):
+    """
+    The usable CPUs cut into `parts` groups along node boundaries where possible, for
+    several worker processes planning side by side on one machine.
+    """
+    nodes = read_topology(cpus)
+    if parts >= len(nodes):
+        groups = []
+        for node, count in zip(nodes, _apportion(parts, [len(node) for node in nodes])):
+            groups.extend(_slices(node, count) if count else [])
+        return groups
+    # Fewer processes than nodes: whole nodes per process
+    return [[cpu for node in group for cpu in node] for group in _slices(nodes, parts)]
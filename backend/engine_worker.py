@@ -0,0 +1,238 @@
+"""
+Engine worker: serves bot-move jobs from the job queue with its own engine pool.
+
+The API dispatches each game to one worker (see engine_dispatch.py), so a game's
+positions keep hitting the same engines' hash, eval cache, carried evals and
+ponder results. Start as many workers as the cores allow; each one announces
+itself through heartbeats and takes games as soon as it is seen. The SQLite
+queue is a local file, so the API and its workers run on one host; serving
+from several machines needs a networked queue behind the same interface.
+
+    ENGINE_QUEUE=sqlite:////data/jobs.db python engine_worker.py -p 4
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from contextlib import suppress
+
+import chess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from engine_resources import engine_cpus, planner_enabled, split_cpus
+from job_queue import make_job_queue
+
+HEARTBEAT_INTERVAL = 1.0
+# Jobs served at once. Far more than the engines: the pool rations engine time, and a move
+# waiting for an engine has to count as in flight for the search budget (or may need none)
+JOB_CONCURRENCY = int(os.getenv("ENGINE_WORKER_CONCURRENCY", "64"))
+# How often running jobs are checked for cancellation by the dispatcher
+CANCEL_POLL = 0.05
+
+
+class EngineWorker:
+    """
+    Claims jobs addressed to worker_id and answers each with engine.get_move_for_board.
+
+    Up to `concurrency` jobs run at once (default: ENGINE_WORKER_CONCURRENCY); its engine
+    pool size is the capacity it announces for routing. "persona"/"info" progress is
+    forwarded for streaming jobs, then a "move" or "error" reply ends the job.
+    Config published by the API is applied before the next job starts.
+    """
+
+    def __init__(self, queue, engine, worker_id=None, concurrency=None):
+        self.queue = queue
+        self.engine = engine
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency or JOB_CONCURRENCY
+        self._running = {}  # job id -> task
+        self._config_version = 0
+        self._main = None
+
+        self.jobs = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    async def start(self):
+        """Serve in the background (in-process worker next to the API)."""
+        if self._main is None:
+            self._main = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._main is not None:
+            self._main.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._main
+            self._main = None
+
+    async def run(self):
+        await self.engine.start()
+        await self.queue.heartbeat(self.worker_id, self.engine.pool.size, self.stats())
+        background = [asyncio.create_task(self._heartbeat()), asyncio.create_task(self._watch_cancellations())]
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            while True:
+                await slots.acquire()
+                claimed = await self.queue.claim(self.worker_id, timeout=HEARTBEAT_INTERVAL)
+                if claimed is None:
+                    slots.release()
+                    continue
+                job_id, job = claimed
+                task = asyncio.create_task(self._serve(job_id, job))
+                self._running[job_id] = task
+                task.add_done_callback(functools.partial(self._job_done, job_id, slots))
+        finally:
+            for task in background + list(self._running.values()):
+                task.cancel()
+            await asyncio.gather(*background, *self._running.values(), return_exceptions=True)
+            with suppress(Exception):
+                await self.queue.unregister(self.worker_id)
+
+    def _job_done(self, job_id, slots, _task):
+        self._running.pop(job_id, None)
+        slots.release()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await self.queue.heartbeat(self.worker_id, self.engine.pool.size, self.stats())
+            except Exception as e:
+                print(f"Worker {self.worker_id}: heartbeat failed: {e}")
+
+    async def _watch_cancellations(self):
+        # Client gone: stop the job (and its search) the same way a disconnect does in-process
+        while True:
+            await asyncio.sleep(CANCEL_POLL)
+            if not self._running:
+                continue
+            try:
+                cancelled = await self.queue.cancelled(list(self._running))
+            except Exception as e:
+                print(f"Worker {self.worker_id}: cancellation check failed: {e}")
+                continue
+            for job_id in cancelled:
+                task = self._running.get(job_id)
+                if task is not None:
+                    task.cancel()
+
+    async def _sync_config(self):
+        version, config = await self.queue.config()
+        if version != self._config_version:
+            self.engine.update_config(config)
+            self._config_version = version
+
+    async def _serve(self, job_id, job):
+        # Replies go out in order through one forwarder, so "move" never overtakes an "info"
+        replies = asyncio.Queue()
+        forwarder = asyncio.create_task(self._forward(job_id, replies))
+        on_event = (lambda name, data: replies.put_nowait((name, data))) if job.get("stream") else None
+        try:
+            await self._sync_config()
+            board = job.get("board")
+            if board is None:
+                board = chess.Board(job["root"])
+                for uci in job["moves"]:
+                    board.push_uci(uci)
+            bot_move, stats = await self.engine.get_move_for_board(
+                board, job["time_taken"], game_id=job.get("game_id"), on_event=on_event)
+            replies.put_nowait(("move", {"bot_move": bot_move, "stats": stats}))
+            self.jobs += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            forwarder.cancel()
+            raise
+        except Exception as e:
+            print(f"Worker {self.worker_id}: job {job_id} failed: {e}")
+            replies.put_nowait(("error", {"detail": str(e)}))
+            self.failed += 1
+        replies.put_nowait(None)
+        await forwarder
+
+    async def _forward(self, job_id, replies):
+        while True:
+            item = await replies.get()
+            if item is None:
+                return
+            await self.queue.send(job_id, *item)
+
+    def stats(self):
+        engine = self.engine
+        return {
+            "ready": engine.ready,
+            "running": len(self._running),
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "engine_pool": engine.pool.stats(),
+            "eval_cache": engine.eval_cache.stats(),
+            "search_budget": engine.budget.stats(),
+            "ponder": engine.ponder.stats(),
+        }
+
+
+async def serve(queue_url, worker_id=None, pool_size=None):
+    from morph_engine import AsyncMorphEngine
+
+    queue = make_job_queue(queue_url)
+    await queue.start()
+    engine = AsyncMorphEngine(pool_size=pool_size)
+    worker = EngineWorker(queue, engine, worker_id)
+    print(f"Engine worker {worker.worker_id}: {engine.pool.size} engine(s), up to {worker.concurrency} "
+          f"concurrent job(s) from {queue_url}")
+    try:
+        await worker.run()
+    finally:
+        await engine.close()
+        await queue.close()
+
+
+def _run_process(queue_url, worker_id, pool_size, cpus=None):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        # This process's share of the machine; its engine planner splits it further
+        os.sched_setaffinity(0, cpus)
+    with suppress(KeyboardInterrupt):
+        asyncio.run(serve(queue_url, worker_id, pool_size))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve bot-move jobs from the engine job queue')
+    parser.add_argument('--queue', type=str, default=os.getenv('ENGINE_QUEUE', ''), help='Job queue URL (default: $ENGINE_QUEUE), e.g. sqlite:////data/jobs.db')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Worker processes to start on this machine')
+    parser.add_argument('--pool-size', type=int, default=None, help='Engines per worker (default: $ENGINE_POOL_SIZE)')
+    parser.add_argument('--id', type=str, default=None, help='Worker id prefix (default: hostname-pid)')
+    args = parser.parse_args()
+
+    if not args.queue or args.queue == 'local':
+        parser.error('workers need a shared queue: set --queue or ENGINE_QUEUE (e.g. sqlite:////data/jobs.db)')
+
+    def worker_id(i):
+        return f"{args.id}-{i}" if args.id else None
+
+    if args.processes == 1:
+        _run_process(args.queue, args.id, args.pool_size)
+        return
+    # Workers on one machine get disjoint CPU groups (whole NUMA nodes where they fit)
+    groups = [None] * args.processes
+    if planner_enabled():
+        groups = split_cpus(args.processes, engine_cpus())
+        # The reserve is taken once for the machine, not again in every process
+        os.environ["ENGINE_RESERVED_CPUS"] = "0"
+    processes = [multiprocessing.Process(target=_run_process, args=(args.queue, worker_id(i), args.pool_size, groups[i]))
+                 for i in range(args.processes)]
+    for process in processes:
+        process.start()
+        # Staggered so engines don't all spawn and warm at the same moment
+        time.sleep(0.2)
+    with suppress(KeyboardInterrupt):
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
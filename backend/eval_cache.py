@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.engine
+import chess.polyglot
+
+# Rough per-object costs used to keep the cache inside its memory budget
+ENTRY_OVERHEAD_BYTES = 240
+LINE_BYTES = 120
+
+
+class EvalCache:
+    """
+    LRU cache of MultiPV search results, shared across games.
+
+    Keyed by the Polyglot Zobrist hash of the position. An entry stores the
+    depth reached, the MultiPV count and, per line, the first move and score.
+    It only answers a request it is at least as good as: enough lines, and
+    depth (or time budget) >= what was asked for.
+
+    Fixed-depth searches are cached under their own depth: persona depths are
+    strength caps (depth=1 for Balanced Challenger), so a deeper result must
+    not stand in for them.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(board, limit):
+        return chess.polyglot.zobrist_hash(board), limit.depth
+
+    @staticmethod
+    def _entry_size(lines):
+        return ENTRY_OVERHEAD_BYTES + LINE_BYTES * len(lines)
+
+    @staticmethod
+    def _satisfies(entry, limit, multipv):
+        # Compare requested MultiPV, not line count: positions with few legal moves return fewer lines
+        depth, time, entry_multipv, lines = entry
+        if entry_multipv < multipv:
+            return False
+        if limit.depth is not None:
+            return depth >= limit.depth
+        if limit.time is not None:
+            return time is not None and time >= limit.time
+        return False
+
+    @staticmethod
+    def _covers(new, old):
+        depth, time, multipv, _ = new
+        old_depth, old_time, old_multipv, _ = old
+        if depth < old_depth or multipv < old_multipv:
+            return False
+        return old_time is None or (time is not None and time >= old_time)
+
+    def get(self, board, limit, multipv=1):
+        key = self.key(board, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._satisfies(entry, limit, multipv):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            depth, _, _, lines = entry
+
+        # Rehydrate into the shape engine.analyse(..., multipv=N) returns
+        info = []
+        for move_uci, cp, mate, line_depth in lines[:multipv]:
+            score = chess.engine.Mate(mate) if mate is not None else chess.engine.Cp(cp)
+            info.append({
+                "score": chess.engine.PovScore(score, board.turn),
+                "pv": [chess.Move.from_uci(move_uci)],
+                "depth": line_depth,
+            })
+        return info
+
+    def put(self, board, limit, info, multipv=1):
+        lines = []
+        for line in info:
+            if not line.get("pv") or "score" not in line:
+                continue
+            score = line["score"].relative
+            lines.append((line["pv"][0].uci(), score.score(), score.mate(), line.get("depth", 0)))
+        if not lines:
+            return
+
+        depth = max(line[3] for line in lines)
+        entry = (depth, limit.time if limit.depth is None else None, multipv, tuple(lines))
+        key = self.key(board, limit)
+
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                # Only a result at least as deep, as wide and as long replaces one: a deeper
+                # multipv=1 search must not cost later wide lookups their lines
+                if not self._covers(entry, old):
+                    self._entries.move_to_end(key)
+                    return
+                self._bytes -= self._entry_size(old[3])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._bytes += self._entry_size(entry[3])
+
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(evicted[3])
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Stand-in UCI engine for benchmarks and local runs without Stockfish.
+
+It does not search. Every `go` answers at once with canned MultiPV info lines:
+material balance plus capture gain plus deterministic noise seeded by the
+position, so the same position always gets the same lines, mates in one are
+reported as mates, and there is a spread of good and bad moves for the personas.
+
+    STOCKFISH_PATH=backend/fake_uci_engine.py uvicorn main:app
+    fake_uci_engine.py --delay 0.05     # pretend each search takes 50ms (capped by movetime, cut short by "stop")
+    FAKE_UCI_DELAY=0.05 ...             # same, when the path is all you can configure
+"""
+import os
+import random
+import select
+import sys
+import time
+
+import chess
+import chess.polyglot
+
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 320, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+DEFAULT_DEPTH = 12
+
+
+def material(board):
+    """Material balance from the side to move's point of view."""
+    total = 0
+    for piece_type, value in PIECE_VALUES.items():
+        total += value * (len(board.pieces(piece_type, board.turn)) - len(board.pieces(piece_type, not board.turn)))
+    return total
+
+
+def canned_lines(board, multipv=1, searchmoves=None):
+    """Best-first [(move, cp, mate)] for the side to move; exactly one of cp/mate is set."""
+    rnd = random.Random(chess.polyglot.zobrist_hash(board))
+    base = material(board)
+    scored = []
+    for move in searchmoves or board.legal_moves:
+        board.push(move)
+        mate = board.is_checkmate()
+        board.pop()
+        if mate:
+            scored.append((100000, move, None, 1))
+            continue
+        gain = 0
+        if board.is_capture(move):
+            captured = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+            gain = PIECE_VALUES[captured]
+        cp = base + gain + rnd.randint(-500, 100)
+        scored.append((cp, move, cp, None))
+    scored.sort(key=lambda t: -t[0])
+    return [(move, cp, mate) for _, move, cp, mate in scored[:multipv]]
+
+
+def _position(tokens):
+    i = tokens.index("moves") if "moves" in tokens else len(tokens)
+    board = chess.Board() if tokens[1] == "startpos" else chess.Board(" ".join(tokens[2:i]))
+    for uci in tokens[i + 1:]:
+        board.push_uci(uci)
+    return board
+
+
+def _go_options(tokens):
+    opts = {"searchmoves": []}
+    i = 1
+    while i < len(tokens):
+        key = tokens[i]
+        if key == "searchmoves":
+            i += 1
+            while i < len(tokens) and len(tokens[i]) in (4, 5) and tokens[i][0] in "abcdefgh":
+                opts["searchmoves"].append(chess.Move.from_uci(tokens[i]))
+                i += 1
+            continue
+        if key == "infinite":
+            opts["infinite"] = True
+        elif i + 1 < len(tokens) and tokens[i + 1].lstrip("-").isdigit():
+            opts[key] = int(tokens[i + 1])
+            i += 1
+        i += 1
+    return opts
+
+
+class _LineReader:
+    """stdin lines with an optional timeout, so a "stop" can end a pretend search early (POSIX select)."""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buffer = b""
+
+    def readline(self, timeout=None):
+        # None on timeout, "" at EOF
+        while b"\n" not in self.buffer:
+            if timeout is not None and not select.select([self.fd], [], [], timeout)[0]:
+                return None
+            chunk = os.read(self.fd, 4096)
+            if not chunk:
+                line, self.buffer = self.buffer, b""
+                return line.decode()
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode() + "\n"
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Canned-output UCI engine")
+    parser.add_argument("--delay", type=float, default=float(os.getenv("FAKE_UCI_DELAY", "0")),
+                        help="Seconds each search pretends to take (default: $FAKE_UCI_DELAY or 0)")
+    args = parser.parse_args(argv)
+
+    def out(line):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    board = chess.Board()
+    multipv = 1
+    pending_bestmove = None
+    deadline = None  # when a delayed search's bestmove is due
+
+    reader = _LineReader(sys.stdin.fileno())
+    while True:
+        line = reader.readline(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if line is None:
+            out(pending_bestmove)
+            pending_bestmove = deadline = None
+            continue
+        if not line:
+            break
+        tokens = line.split()
+        if not tokens:
+            continue
+        cmd = tokens[0]
+
+        if cmd == "uci":
+            out("id name FakeUCI")
+            out("id author chess-morph")
+            out("option name MultiPV type spin default 1 min 1 max 500")
+            out("option name Threads type spin default 1 min 1 max 1024")
+            out("option name Hash type spin default 16 min 1 max 33554432")
+            out("option name Skill Level type spin default 20 min 0 max 20")
+            out("uciok")
+        elif cmd == "isready":
+            out("readyok")
+        elif cmd == "setoption" and "name" in tokens and "value" in tokens:
+            name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+            if name.lower() == "multipv":
+                multipv = int(tokens[-1])
+        elif cmd == "ucinewgame":
+            board = chess.Board()
+        elif cmd == "position":
+            board = _position(tokens)
+        elif cmd == "go":
+            opts = _go_options(tokens)
+            depth = opts.get("depth", DEFAULT_DEPTH)
+            lines = canned_lines(board, multipv, opts["searchmoves"] or None)
+            if not lines:
+                out("info depth 0 score " + ("mate 0" if board.is_checkmate() else "cp 0"))
+                bestmove = "bestmove (none)"
+            else:
+                nodes = 1000 * depth * len(lines)
+                for k, (move, cp, mate) in enumerate(lines, 1):
+                    score = f"mate {mate}" if mate is not None else f"cp {cp}"
+                    out(f"info depth {depth} seldepth {depth} multipv {k} score {score} "
+                        f"nodes {nodes} nps 1000000 time {max(1, nodes // 1000)} pv {move.uci()}")
+                bestmove = f"bestmove {lines[0][0].uci()}"
+
+            if opts.get("infinite"):
+                # Analysis mode: python-chess sends "stop" when it is done
+                pending_bestmove = bestmove
+                continue
+            if args.delay:
+                movetime = opts.get("movetime")
+                pending_bestmove = bestmove
+                deadline = time.monotonic() + (min(args.delay, movetime / 1000) if movetime else args.delay)
+                continue
+            out(bestmove)
+        elif cmd == "stop":
+            if pending_bestmove:
+                out(pending_bestmove)
+                pending_bestmove = deadline = None
+        elif cmd == "quit":
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import chess
+
+# Centipawn values for the static evaluation (king captures never happen in legal play)
+PIECE_VALUES = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 320, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+# Same clamp MorphEngine uses for mate scores
+MATE_SCORE = 10000
+
+EXCHANGE_ORDER = (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING)
+KING_EXCHANGE_VALUE = 100000
+
+
+def forced_move(board):
+    """The only legal move, or None if there are zero or several."""
+    moves = iter(board.legal_moves)
+    first = next(moves, None)
+    if first is not None and next(moves, None) is None:
+        return first
+    return None
+
+
+def mate_in_one(board):
+    """A move that checkmates right away, or None."""
+    king = board.king(not board.turn)
+    if king is None:
+        return None
+    # Squares a piece would give check from, and the lines a moving piece could uncover a check on
+    occupied = board.occupied
+    diagonal = chess.BB_DIAG_ATTACKS[king][chess.BB_DIAG_MASKS[king] & occupied]
+    straight = (chess.BB_RANK_ATTACKS[king][chess.BB_RANK_MASKS[king] & occupied]
+                | chess.BB_FILE_ATTACKS[king][chess.BB_FILE_MASKS[king] & occupied])
+    checks = {
+        chess.PAWN: chess.BB_PAWN_ATTACKS[not board.turn][king],
+        chess.KNIGHT: chess.BB_KNIGHT_ATTACKS[king],
+        chess.BISHOP: diagonal,
+        chess.ROOK: straight,
+        chess.QUEEN: diagonal | straight,
+        chess.KING: 0,
+    }
+    lines = diagonal | straight
+
+    # Filter pseudo-legal moves first: the legality test is the expensive part
+    for move in board.generate_pseudo_legal_moves():
+        piece_type = move.promotion or board.piece_type_at(move.from_square)
+        if not (checks[piece_type] & chess.BB_SQUARES[move.to_square] or lines & chess.BB_SQUARES[move.from_square]
+                or board.is_castling(move) or board.is_en_passant(move)):
+            continue
+        if not board.is_legal(move):
+            continue
+        board.push(move)
+        mate = board.is_checkmate()
+        board.pop()
+        if mate:
+            return move
+    return None
+
+
+def material(board):
+    """Material balance from the side to move's point of view."""
+    total = 0
+    for piece_type, value in PIECE_VALUES.items():
+        total += value * (len(board.pieces(piece_type, board.turn)) - len(board.pieces(piece_type, not board.turn)))
+    return total
+
+
+def capture_gain(board, move):
+    """Material won by the move itself: the captured piece plus any promotion."""
+    gain = 0
+    if board.is_en_passant(move):
+        gain = PIECE_VALUES[chess.PAWN]
+    elif board.piece_type_at(move.to_square):
+        gain = PIECE_VALUES[board.piece_type_at(move.to_square)]
+    if move.promotion:
+        gain += PIECE_VALUES[move.promotion] - PIECE_VALUES[chess.PAWN]
+    return gain
+
+
+def exchange(board, square):
+    """
+    Static exchange evaluation: the most the side to move wins by capturing on square,
+    least valuable attacker first, either side free to stop. 0 if capturing doesn't pay.
+    Works on attack bitboards (x-rays appear as pieces leave), so pins are ignored.
+    """
+    target = board.piece_type_at(square)
+    if target is None:
+        return 0
+    occupied = board.occupied
+    color = board.turn
+    by_type = (board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings)
+    gains = []
+    value = PIECE_VALUES[target]
+    while True:
+        attackers = board.attackers_mask(color, square, occupied) & occupied
+        if not attackers:
+            break
+        for piece_type, pieces in zip(EXCHANGE_ORDER, by_type):
+            candidates = attackers & pieces
+            if candidates:
+                break
+        gains.append(value)
+        # A king may only take last: whatever recaptures it "wins" everything
+        value = KING_EXCHANGE_VALUE if piece_type == chess.KING else PIECE_VALUES[piece_type]
+        occupied &= ~chess.BB_SQUARES[chess.lsb(candidates)]
+        color = not color
+
+    # Negamax back from the last capture: each side only continues if it gains
+    result = 0
+    for gain in reversed(gains):
+        result = max(0, gain - result)
+    return result
+
+
+def static_score(board, move, watch=None):
+    """
+    One-ply score of a move for the side to move: what it captures minus the best exchange
+    the opponent then has against one of our pieces. Mates win, stalemates throw away the
+    material lead.
+
+    Exchanges are only worked out on the destination square and on watch: our pieces already
+    attacked, and those the move might uncover (static_best_move computes both once).
+    """
+    if watch is None:
+        watch = attacked_pieces(board) | discovered_lines(board, move.from_square)
+    gain = capture_gain(board, move)
+    board.push(move)
+    try:
+        them = board.turn
+        if board.is_check() or chess.popcount(board.occupied_co[them]) <= 3:
+            # Mate and stalemate checks cost a move generation, so only where they are plausible
+            if not any(board.generate_legal_moves()):
+                return MATE_SCORE if board.is_check() else -material(board) - gain
+        targets = board.occupied_co[not them] & (watch | chess.BB_SQUARES[move.to_square])
+        threat = 0
+        for square in chess.scan_reversed(targets):
+            if board.attackers_mask(them, square):
+                threat = max(threat, exchange(board, square))
+        return gain - threat
+    finally:
+        board.pop()
+
+
+def attacked_pieces(board):
+    """Bitboard of the side to move's pieces the opponent attacks."""
+    mask = 0
+    for square in chess.scan_reversed(board.occupied_co[board.turn]):
+        if board.attackers_mask(not board.turn, square):
+            mask |= chess.BB_SQUARES[square]
+    return mask
+
+
+def discovered_lines(board, square):
+    """Lines through square from enemy sliders that hit it: moving off it may expose what is behind."""
+    them = not board.turn
+    sliders = board.attackers_mask(them, square) & (board.bishops | board.rooks | board.queens)
+    mask = 0
+    for slider in chess.scan_reversed(sliders):
+        mask |= chess.BB_RAYS[slider][square]
+    return mask
+
+
+def static_scores(board):
+    """{move: static_score} for every legal move."""
+    en_prise = attacked_pieces(board)
+    lines = {}
+    scores = {}
+    for move in board.legal_moves:
+        if move.from_square not in lines:
+            lines[move.from_square] = discovered_lines(board, move.from_square)
+        scores[move] = static_score(board, move, en_prise | lines[move.from_square])
+    return scores
+
+
+def static_best_move(board):
+    """(move, score) with the best static_score; ties go to the more central destination."""
+    scores = static_scores(board)
+    if not scores:
+        return None, 0
+    move = max(scores, key=lambda m: (scores[m], -_center_distance(m.to_square)))
+    return move, scores[move]
+
+
+def _center_distance(square):
+    return max(abs(chess.square_file(square) * 2 - 7), abs(chess.square_rank(square) * 2 - 7))
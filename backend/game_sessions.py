@@ -0,0 +1,77 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class GameSession:
+    __slots__ = ("game_id", "board", "lock", "last_seen")
+
+    def __init__(self, game_id, board):
+        self.game_id = game_id
+        self.board = board
+        # Serializes moves of one game; the board is mutated across awaits
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    """
+    Live chess.Board objects keyed by game_id, so /get-move can reuse the
+    board (and its move stack) instead of re-parsing a client FEN each move.
+    Sessions idle longer than idle_ttl are evicted, and the least recently used
+    session is dropped once max_sessions is exceeded.
+    """
+
+    def __init__(self, max_sessions=10000, idle_ttl=3600.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+
+        self.created = 0
+        self.restored = 0
+        self.evicted = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first: stop at the first session that is still fresh
+        while self._sessions:
+            game_id, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.last_seen < self.idle_ttl:
+                break
+            if session.lock.locked():
+                # Mid-move; keep it and look again on the next access
+                self._sessions.move_to_end(game_id)
+                break
+            del self._sessions[game_id]
+            self.evicted += 1
+
+    def create(self, game_id, board, restored=False):
+        session = GameSession(game_id, board)
+        self._sessions[game_id] = session
+        if restored:
+            self.restored += 1
+        else:
+            self.created += 1
+        self._evict()
+        return session
+
+    def get(self, game_id):
+        session = self._sessions.get(game_id)
+        if session is None:
+            return None
+        session.last_seen = time.monotonic()
+        self._sessions.move_to_end(game_id)
+        self._evict()
+        return session
+
+    def discard(self, game_id):
+        self._sessions.pop(game_id, None)
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "restored": self.restored,
+            "evicted": self.evicted,
+        }
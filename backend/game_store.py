@@ -0,0 +1,225 @@
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import datetime
+
+import chess
+
+from move_codec import decode_move, encode_move
+
+
+class GameRecord:
+    """Compact in-memory game: slotted fields, moves packed as 16-bit codes."""
+
+    __slots__ = ("guest_id", "side", "start_fen", "current_fen", "orientation",
+                 "moves", "created_at", "last_updated", "status", "result", "touched")
+
+    def __init__(self, guest_id, side, start_fen, orientation, created_at=None, status="active", result=None):
+        self.guest_id = guest_id
+        self.side = side
+        self.start_fen = start_fen
+        self.current_fen = start_fen
+        self.orientation = orientation
+        self.moves = array("H")
+        self.created_at = created_at or datetime.utcnow()
+        self.last_updated = self.created_at
+        self.status = status
+        self.result = result
+        self.touched = time.monotonic()
+
+    def to_dict(self, game_id):
+        # Same shape as the Mongo document
+        return {
+            "_id": game_id,
+            "guest_id": self.guest_id,
+            "side": self.side,
+            "start_fen": self.start_fen,
+            "current_fen": self.current_fen,
+            "orientation": self.orientation,
+            "moves": [decode_move(code).uci() for code in self.moves],
+            "created_at": self.created_at,
+            "last_updated": self.last_updated,
+            "status": self.status,
+            "result": self.result,
+        }
+
+
+class MemoryGameStore:
+    """
+    Bounded fallback store used when Mongo is unavailable.
+
+    Keeps at most max_games records in LRU order; finished games expire after
+    finished_ttl seconds and untouched active games after idle_ttl seconds.
+    If spill_path is set, evicted games are written to a local SQLite file and
+    transparently loaded back when they are touched again.
+    """
+
+    def __init__(self, max_games=5000, idle_ttl=2 * 3600.0, finished_ttl=600.0, spill_path=None):
+        self.max_games = max_games
+        self.idle_ttl = idle_ttl
+        self.finished_ttl = finished_ttl
+        self.spill_path = spill_path
+
+        self._games = OrderedDict()
+        # Game ids per TTL class, in touch order: expired games sit at the front of
+        # their own list even when a fresher game of the other class heads the LRU
+        self._active = OrderedDict()
+        self._ended = OrderedDict()
+        self._lock = threading.Lock()
+        self._spill = None
+
+        self.evicted = 0
+        self.spilled = 0
+        self.reloaded = 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._games or self._spilled_row(game_id) is not None
+
+    # --- SQLite spill ---
+
+    def _spill_db(self):
+        if self._spill is None and self.spill_path:
+            self._spill = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._spill.execute(
+                "CREATE TABLE IF NOT EXISTS games ("
+                "id TEXT PRIMARY KEY, guest_id TEXT, side TEXT, start_fen TEXT, current_fen TEXT, "
+                "orientation TEXT, moves BLOB, created_at TEXT, last_updated TEXT, status TEXT, result TEXT)"
+            )
+            with suppress(sqlite3.OperationalError):
+                # Spill files written before games kept their result
+                self._spill.execute("ALTER TABLE games ADD COLUMN result TEXT")
+        return self._spill
+
+    def _spill_record(self, game_id, record):
+        db = self._spill_db()
+        if db is None:
+            return
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO games (id, guest_id, side, start_fen, current_fen, orientation, moves, "
+                "created_at, last_updated, status, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (game_id, record.guest_id, record.side, record.start_fen, record.current_fen,
+                 record.orientation, record.moves.tobytes(), record.created_at.isoformat(),
+                 record.last_updated.isoformat(), record.status, record.result),
+            )
+            db.commit()
+            self.spilled += 1
+        except sqlite3.Error as e:
+            print(f"Error spilling game {game_id}: {e}")
+
+    def _spilled_row(self, game_id):
+        db = self._spill_db()
+        if db is None:
+            return None
+        return db.execute(
+            "SELECT guest_id, side, start_fen, current_fen, orientation, moves, created_at, last_updated, status, result "
+            "FROM games WHERE id = ?", (game_id,)
+        ).fetchone()
+
+    def _reload(self, game_id):
+        row = self._spilled_row(game_id)
+        if row is None:
+            return None
+        guest_id, side, start_fen, current_fen, orientation, moves, created_at, last_updated, status, result = row
+        record = GameRecord(guest_id, side, start_fen, orientation,
+                            created_at=datetime.fromisoformat(created_at), status=status, result=result)
+        record.current_fen = current_fen
+        record.moves.frombytes(moves)
+        record.last_updated = datetime.fromisoformat(last_updated)
+        self._spill.execute("DELETE FROM games WHERE id = ?", (game_id,))
+        self._spill.commit()
+        self._games[game_id] = record
+        self.reloaded += 1
+        return record
+
+    # --- Eviction ---
+
+    def _track(self, game_id, record):
+        # (Re)queue the game at the back of its TTL class after a touch or status change
+        self._active.pop(game_id, None)
+        self._ended.pop(game_id, None)
+        (self._active if record.status == "active" else self._ended)[game_id] = None
+
+    def _drop(self, game_id):
+        record = self._games.pop(game_id)
+        self._active.pop(game_id, None)
+        self._ended.pop(game_id, None)
+        self.evicted += 1
+        self._spill_record(game_id, record)
+
+    def _evict(self):
+        now = time.monotonic()
+        for order, ttl in ((self._active, self.idle_ttl), (self._ended, self.finished_ttl)):
+            while order:
+                game_id = next(iter(order))
+                if now - self._games[game_id].touched <= ttl:
+                    break
+                self._drop(game_id)
+        while len(self._games) > self.max_games:
+            self._drop(next(iter(self._games)))
+
+    def _get(self, game_id):
+        record = self._games.get(game_id)
+        if record is None:
+            record = self._reload(game_id)
+        if record is not None:
+            record.touched = time.monotonic()
+            self._games.move_to_end(game_id)
+            self._track(game_id, record)
+        return record
+
+    # --- Public API ---
+
+    def create(self, game_id, guest_id, side, fen, orientation, created_at=None):
+        with self._lock:
+            record = GameRecord(guest_id, side, fen, orientation, created_at)
+            self._games[game_id] = record
+            self._games.move_to_end(game_id)
+            self._track(game_id, record)
+            self._evict()
+
+    def add_move(self, game_id, fen, move_uci, updated_at=None):
+        with self._lock:
+            record = self._get(game_id)
+            if record is None:
+                return False
+            record.current_fen = fen
+            record.moves.append(encode_move(chess.Move.from_uci(move_uci)))
+            record.last_updated = updated_at or datetime.utcnow()
+            self._evict()
+            return True
+
+    def set_status(self, game_id, status, result=None):
+        with self._lock:
+            record = self._get(game_id)
+            if record is None:
+                return False
+            record.status = status
+            if result is not None:
+                record.result = result
+            self._track(game_id, record)
+            self._evict()
+            return True
+
+    def get(self, game_id):
+        with self._lock:
+            self._evict()
+            record = self._get(game_id)
+            return record.to_dict(game_id) if record is not None else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "games": len(self._games),
+                "max_games": self.max_games,
+                "evicted": self.evicted,
+                "spilled": self.spilled,
+                "reloaded": self.reloaded,
+            }
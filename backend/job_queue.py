@@ -0,0 +1,299 @@
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# A worker that hasn't sent a heartbeat for this long is considered gone
+WORKER_TTL = float(os.getenv("ENGINE_WORKER_TTL", "5"))
+# Jobs nobody finished (worker died, dispatcher gave up) are purged after this long
+JOB_TTL = 600.0
+# Reply names that end a job
+TERMINAL = ("move", "error")
+
+
+def make_job_queue(url):
+    """ENGINE_QUEUE value -> job queue: "local" or "sqlite:///path/to/jobs.db"."""
+    if url in ("", "local"):
+        return LocalJobQueue()
+    if url.startswith("sqlite:///"):
+        return SqliteJobQueue(url[len("sqlite:///"):], poll_interval=float(os.getenv("ENGINE_QUEUE_POLL", "0.005")))
+    raise ValueError(f"Unsupported ENGINE_QUEUE: {url}")
+
+
+class LocalJobQueue:
+    """
+    Job queue inside one process: the API and its engine worker share the event loop.
+
+    Same interface as SqliteJobQueue. Jobs go to a named worker (the dispatcher picks it),
+    replies come back per job as (name, data) messages, the last one named "move" or "error".
+    Config updates are versioned so workers can apply them before their next job.
+    """
+
+    # Jobs stay Python objects, so they may carry the live board
+    in_process = True
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._jobs = {}      # worker id -> asyncio.Queue of (job id, job)
+        self._replies = {}   # job id -> asyncio.Queue of (name, data)
+        self._workers = {}   # worker id -> {"capacity", "stats", "seen"}
+        self._cancelled = set()
+        self._config = (0, {})
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def _inbox(self, worker_id):
+        if worker_id not in self._jobs:
+            self._jobs[worker_id] = asyncio.Queue()
+        return self._jobs[worker_id]
+
+    # --- workers ---
+
+    async def heartbeat(self, worker_id, capacity, stats):
+        self._workers[worker_id] = {"capacity": capacity, "stats": stats, "seen": time.time()}
+
+    async def unregister(self, worker_id):
+        self._workers.pop(worker_id, None)
+
+    async def workers(self):
+        now = time.time()
+        return {w: info for w, info in self._workers.items() if now - info["seen"] < WORKER_TTL}
+
+    async def claim(self, worker_id, timeout):
+        """Next job for worker_id as (job id, job), or None after timeout seconds."""
+        inbox = self._inbox(worker_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                job_id, job = await asyncio.wait_for(inbox.get(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return None
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                continue
+            return job_id, job
+
+    async def cancelled(self, job_ids):
+        return {job_id for job_id in job_ids if job_id in self._cancelled}
+
+    async def send(self, job_id, name, data):
+        replies = self._replies.get(job_id)
+        if replies is not None:
+            replies.put_nowait((name, data))
+        if name in TERMINAL:
+            self._cancelled.discard(job_id)
+
+    # --- dispatchers ---
+
+    async def submit(self, worker_id, job):
+        job_id = next(self._ids)
+        self._replies[job_id] = asyncio.Queue()
+        self._inbox(worker_id).put_nowait((job_id, job))
+        return job_id
+
+    async def receive(self, job_id, timeout):
+        """Next reply for job_id; raises asyncio.TimeoutError after timeout seconds."""
+        return await asyncio.wait_for(self._replies[job_id].get(), timeout)
+
+    async def finish(self, job_id):
+        self._replies.pop(job_id, None)
+
+    async def cancel(self, job_id):
+        self._cancelled.add(job_id)
+        await self.finish(job_id)
+
+    # --- config ---
+
+    async def publish_config(self, config):
+        version, current = self._config
+        self._config = (version + 1, {**current, **config})
+
+    async def config(self):
+        return self._config
+
+
+class SqliteJobQueue:
+    """
+    Job queue in a SQLite file, for API and engine worker processes on one machine.
+
+    Every call runs on one background thread with its own connection (WAL, so readers
+    don't block the writer). Workers poll for jobs; a dispatcher polls replies for all of
+    its waiting jobs with a single query, using the global reply sequence as a high-water mark.
+    All processes must share the file, so they run on one host.
+    """
+
+    in_process = False
+
+    def __init__(self, path, poll_interval=0.005):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-queue")
+        self._conn = None
+        self._waiting = {}   # job id -> asyncio.Queue of replies
+        self._seq = 0
+        self._poller = None
+        self._last_purge = 0.0
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, worker TEXT, payload TEXT, state TEXT, created REAL);
+            CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (worker, state, id);
+            CREATE TABLE IF NOT EXISTS replies (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, job INTEGER, name TEXT, data TEXT);
+            CREATE INDEX IF NOT EXISTS replies_job ON replies (job);
+            CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, capacity INTEGER, stats TEXT, seen REAL);
+            CREATE TABLE IF NOT EXISTS config (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, data TEXT);
+        """)
+        self._conn = conn
+        self._seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM replies").fetchone()[0]
+
+    async def start(self):
+        if self._conn is None:
+            await self._call(self._connect)
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+        if self._conn is not None:
+            await self._call(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+    # --- workers ---
+
+    def _heartbeat(self, worker_id, capacity, stats):
+        now = time.time()
+        self._conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?)",
+                           (worker_id, capacity, json.dumps(stats), now))
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            self._conn.execute("DELETE FROM jobs WHERE created < ?", (now - JOB_TTL,))
+            self._conn.execute("DELETE FROM replies WHERE job NOT IN (SELECT id FROM jobs)")
+            self._conn.execute("DELETE FROM workers WHERE seen < ?", (now - JOB_TTL,))
+
+    async def heartbeat(self, worker_id, capacity, stats):
+        await self._call(self._heartbeat, worker_id, capacity, stats)
+
+    async def unregister(self, worker_id):
+        await self._call(self._conn.execute, "DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def _workers(self):
+        rows = self._conn.execute("SELECT id, capacity, stats, seen FROM workers WHERE seen > ?",
+                                  (time.time() - WORKER_TTL,)).fetchall()
+        return {w: {"capacity": capacity, "stats": json.loads(stats), "seen": seen} for w, capacity, stats, seen in rows}
+
+    async def workers(self):
+        return await self._call(self._workers)
+
+    def _claim(self, worker_id):
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT id, payload FROM jobs WHERE worker = ? AND state = 'queued' ORDER BY id LIMIT 1",
+                                     (worker_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET state = 'running' WHERE id = ?", (row[0],))
+        return row[0], json.loads(row[1])
+
+    async def claim(self, worker_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            claimed = await self._call(self._claim, worker_id)
+            if claimed is not None or time.monotonic() >= deadline:
+                return claimed
+            await asyncio.sleep(self.poll_interval)
+
+    def _cancelled(self, job_ids):
+        marks = ",".join("?" * len(job_ids))
+        rows = self._conn.execute(f"SELECT id FROM jobs WHERE state = 'cancelled' AND id IN ({marks})", job_ids)
+        return {row[0] for row in rows}
+
+    async def cancelled(self, job_ids):
+        job_ids = list(job_ids)
+        return await self._call(self._cancelled, job_ids) if job_ids else set()
+
+    def _send(self, job_id, name, data):
+        self._conn.execute("INSERT INTO replies (job, name, data) VALUES (?, ?, ?)", (job_id, name, json.dumps(data)))
+
+    async def send(self, job_id, name, data):
+        await self._call(self._send, job_id, name, data)
+
+    # --- dispatchers ---
+
+    def _submit(self, worker_id, job):
+        cursor = self._conn.execute("INSERT INTO jobs (worker, payload, state, created) VALUES (?, ?, 'queued', ?)",
+                                    (worker_id, json.dumps(job), time.time()))
+        return cursor.lastrowid
+
+    async def submit(self, worker_id, job):
+        job_id = await self._call(self._submit, worker_id, job)
+        self._waiting[job_id] = asyncio.Queue()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_replies())
+        return job_id
+
+    def _fetch_replies(self, job_ids):
+        marks = ",".join("?" * len(job_ids))
+        return self._conn.execute(
+            f"SELECT seq, job, name, data FROM replies WHERE seq > ? AND job IN ({marks}) ORDER BY seq",
+            [self._seq, *job_ids]).fetchall()
+
+    async def _poll_replies(self):
+        # One query per interval for every job this process waits on
+        while self._waiting:
+            for seq, job_id, name, data in await self._call(self._fetch_replies, list(self._waiting)):
+                self._seq = max(self._seq, seq)
+                replies = self._waiting.get(job_id)
+                if replies is not None:
+                    replies.put_nowait((name, json.loads(data)))
+            await asyncio.sleep(self.poll_interval)
+
+    async def receive(self, job_id, timeout):
+        return await asyncio.wait_for(self._waiting[job_id].get(), timeout)
+
+    def _delete(self, job_id):
+        self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._conn.execute("DELETE FROM replies WHERE job = ?", (job_id,))
+
+    async def finish(self, job_id):
+        self._waiting.pop(job_id, None)
+        await self._call(self._delete, job_id)
+
+    async def cancel(self, job_id):
+        # The worker sees the mark, stops, and leaves the rows to the purge
+        self._waiting.pop(job_id, None)
+        await self._call(self._conn.execute, "UPDATE jobs SET state = 'cancelled' WHERE id = ?", (job_id,))
+
+    # --- config ---
+
+    def _publish_config(self, config):
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT version, data FROM config WHERE id = 1").fetchone()
+            version, current = (row[0], json.loads(row[1])) if row else (0, {})
+            self._conn.execute("INSERT OR REPLACE INTO config VALUES (1, ?, ?)",
+                               (version + 1, json.dumps({**current, **config})))
+
+    async def publish_config(self, config):
+        await self._call(self._publish_config, config)
+
+    def _config(self):
+        row = self._conn.execute("SELECT version, data FROM config WHERE id = 1").fetchone()
+        return (row[0], json.loads(row[1])) if row else (0, {})
+
+    async def config(self):
+        return await self._call(self._config)
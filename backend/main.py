@@ -1,20 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Literal, Optional
+import asyncio
 import chess
+import json
+import os
 import random
+import time
 import uuid
 
-from database import create_game, update_game_move
-from morph_engine import MorphEngine
+import metrics
+from async_database import AsyncGameStore
+from database import games_memory
+from engine_dispatch import EngineDispatcher, EngineWorkerError, NoEngineWorkers
+from engine_worker import EngineWorker
+from job_queue import make_job_queue
+from morph_engine import AsyncMorphEngine
+from game_sessions import SessionStore
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Returns immediately: engines spawn and warm, and Mongo connects, in the background.
+    # /health/ready reports when moves can be served without spawn latency.
+    await job_queue.start()
+    if worker is not None:
+        await worker.start()
+    await store.start()
+    yield
+    if worker is not None:
+        await worker.close()
+        await engine.close()
+    await job_queue.close()
+    await store.close()
 
-API_VERSION = "1.0.1 (Debug Fix)"
+app = FastAPI(lifespan=lifespan)
 
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "version": API_VERSION}
+API_VERSION = "1.0.1 (Debug Fix)"
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,7 +48,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-engine = MorphEngine()
+# Moves are computed by engine workers fed from a job queue; /get-move only dispatches.
+# ENGINE_QUEUE=local (default): one worker inside this process, on this process's engines.
+# Anything else (e.g. sqlite:////data/jobs.db): engine_worker.py processes serve the queue
+# and this process runs no engines at all.
+ENGINE_QUEUE = os.getenv("ENGINE_QUEUE", "local")
+job_queue = make_job_queue(ENGINE_QUEUE)
+engine = AsyncMorphEngine() if ENGINE_QUEUE in ("", "local") else None
+worker = EngineWorker(job_queue, engine) if engine is not None else None
+dispatcher = EngineDispatcher(job_queue, timeout=float(os.getenv("ENGINE_JOB_TIMEOUT", "30")))
+
+# Async Mongo (Motor) with memory fallback; connects on first use
+store = AsyncGameStore(
+    batch_size=int(os.getenv("MONGO_FLUSH_BATCH", "500")),
+    flush_interval=float(os.getenv("MONGO_FLUSH_INTERVAL", "0.5")),
+)
+
+# Live boards per game: the server, not the client FEN, is the source of truth
+sessions = SessionStore(
+    max_sessions=int(os.getenv("MAX_GAME_SESSIONS", "10000")),
+    idle_ttl=float(os.getenv("GAME_SESSION_TTL", "3600")),
+)
+
+def _engine_health():
+    # Only when the engines run in this process; remote workers report through dispatch
+    if engine is None:
+        return {}
+    return {
+        "startup": engine.startup_stats(),
+        "engine_pool": engine.pool.stats(),
+        "eval_cache": engine.eval_cache.stats(),
+        "opening_book": engine.book.stats(),
+        "move_log": engine.log_sink.stats(),
+        "search_budget": engine.budget.stats(),
+        "single_flight": engine.single_flight.stats(),
+        "ponder": engine.ponder.stats(),
+    }
+
+@app.get("/health")
+async def health_check():
+    # Liveness: the process answers. Readiness is reported separately (see /health/ready).
+    return {
+        "status": "ok",
+        "version": API_VERSION,
+        **_engine_health(),
+        "dispatch": await dispatcher.stats(details=engine is None),
+        "sessions": sessions.stats(),
+        "memory_store": games_memory.stats(),
+        "database": store.stats(),
+    }
+
+# Latency is recorded for the game API only, not for health checks or metric scrapes
+TIMED_PATHS = {"/get-move", "/get-move/stream", "/start-game"}
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    if request.url.path not in TIMED_PATHS:
+        return await call_next(request)
+    start = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, request.url.path)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    if engine is not None:
+        alive = engine.pool.stats()["alive"]
+    else:
+        alive = sum(w["engine_pool"]["alive"] for w in (await dispatcher.stats())["workers"].values())
+    metrics.ENGINES_ALIVE.set(alive)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health/ready")
+async def readiness_check():
+    # For load balancer / platform readiness probes: 503 until a warm engine exists
+    # (here, or in at least one engine worker)
+    if engine is not None:
+        ready, details = engine.ready, engine.startup_stats()
+    else:
+        ready, details = await dispatcher.ready(), {"workers": len(await dispatcher.workers())}
+    if not ready:
+        return JSONResponse(status_code=503, content={"ready": False, **details})
+    return {"ready": True, **details}
 
 class StartGameRequest(BaseModel):
     guest_id: str
@@ -33,7 +139,7 @@ class StartGameRequest(BaseModel):
 class MoveRequest(BaseModel):
     game_id: str
     user_move: str # UCI
-    fen: str # FEN before user move (or we can reconstruct, but passing current FEN is easier)
+    fen: Optional[str] = None # FEN before user move; only used to restore an evicted/unknown session
     time_taken: float
 
 class ConfigRequest(BaseModel):
@@ -43,15 +149,19 @@ class ConfigRequest(BaseModel):
     MISTAKE_SEVERE_MIN: int = None
     MISTAKE_NATURAL_MIN: int = None
     MISTAKE_NATURAL_MAX: int = None
+    # On: mate in one on sight, without a search, even in Mercy Mode (default off)
+    PLAY_MATE_IN_ONE: bool = None
+    MISTAKE_CANDIDATES: Literal["multipv", "widen", "shortlist"] = None
 
 @app.post("/update-config")
-def update_config(req: ConfigRequest):
+async def update_config(req: ConfigRequest):
     config = req.dict(exclude_none=True)
-    engine.update_config(config)
+    # Every worker picks it up before its next move
+    await dispatcher.update_config(config)
     return {"status": "updated", "config": config}
 
 @app.post("/start-game")
-def start_game(req: StartGameRequest):
+async def start_game(req: StartGameRequest):
     try:
         side = req.side
         if side == "random":
@@ -63,7 +173,8 @@ def start_game(req: StartGameRequest):
 
         fen = board.fen()
         
-        game_id = create_game(req.guest_id, side, fen, side)
+        game_id = await store.create_game(req.guest_id, side, fen, side)
+        sessions.create(game_id, board)
         
         # If user is black, bot needs to make first move? 
         # For MVP simplicity, let's assume user triggers bot move if they are black via frontend logic 
@@ -79,52 +190,134 @@ def start_game(req: StartGameRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Start Game Error: {str(e)}")
 
-@app.post("/get-move")
-def get_move(req: MoveRequest):
-    # 1. Update DB with user move
-    # We need to apply user move to FEN to get new FEN
-    board = chess.Board(req.fen)
-    try:
-        if req.user_move == "0000":
-             # Dummy move for bot start
-             pass
-        else:
-            move = chess.Move.from_uci(req.user_move)
-            if move in board.legal_moves:
-                board.push(move)
-            else:
+def _session_for(req: MoveRequest):
+    session = sessions.get(req.game_id)
+    if session is None:
+        # Unknown here (evicted, restarted, another worker): rebuild from the client's FEN
+        if not req.fen:
+            raise HTTPException(status_code=404, detail="Unknown or expired game")
+        try:
+            session = sessions.create(req.game_id, chess.Board(req.fen), restored=True)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid FEN")
+    return session
+
+async def _finish_game(game_id, board):
+    # A finished game has nothing left to play: drop its live board instead of waiting for the TTL
+    await store.finish_game(game_id, board.result(claim_draw=True))
+    sessions.discard(game_id)
+
+async def _play_move(session, req: MoveRequest, on_event=None):
+    async with session.lock:
+        board = session.board
+        if req.fen and board.board_fen() != req.fen.split(" ", 1)[0]:
+            raise HTTPException(status_code=409, detail={"error": "Position out of sync", "fen": board.fen()})
+
+        # 1. Apply the user move (stored once the bot has answered)
+        user_move = None
+        if req.user_move != "0000": # "0000": dummy move for bot start
+            try:
+                move = chess.Move.from_uci(req.user_move)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid UCI")
+            if not board.is_legal(move):
                 raise HTTPException(status_code=400, detail="Illegal move")
-    except ValueError:
-        if req.user_move == "0000":
-             pass
+            board.push(move)
+            user_move = req.user_move
+
+        new_fen = board.fen()
+
+        # 2. Call Engine
+        # The live board has the full move stack, so repetition and 50-move draws are detected
+        if board.is_game_over(claim_draw=True):
+            if user_move:
+                await store.update_game_move(req.game_id, new_fen, user_move, is_bot=False)
+            await _finish_game(req.game_id, board)
+            return {"bot_move": None, "fen": new_fen, "game_over": True}
+
+        try:
+            bot_move_uci, stats = await dispatcher.get_move_for_board(board, req.time_taken, game_id=req.game_id, on_event=on_event)
+        except BaseException as e:
+            # No bot move (failed, timed out, or cancelled because the stream's client left):
+            # take the user move back so the client can simply resend it
+            if user_move:
+                board.pop()
+            if isinstance(e, NoEngineWorkers):
+                raise HTTPException(status_code=503, detail="No engine workers available")
+            if isinstance(e, asyncio.TimeoutError):
+                raise HTTPException(status_code=504, detail="Engine worker timed out")
+            if isinstance(e, EngineWorkerError):
+                raise HTTPException(status_code=502, detail=f"Engine worker failed: {e}")
+            raise
+
+        # The user move is stored only now, together with its answer
+        if user_move:
+            await store.update_game_move(req.game_id, new_fen, user_move, is_bot=False)
+
+        if bot_move_uci:
+            board.push(chess.Move.from_uci(bot_move_uci))
+            final_fen = board.fen()
+            await store.update_game_move(req.game_id, final_fen, bot_move_uci, is_bot=True)
+            game_over = board.is_game_over(claim_draw=True)
+            if game_over:
+                await _finish_game(req.game_id, board)
+            return {
+                "bot_move": bot_move_uci,
+                "fen": final_fen,
+                "game_over": game_over,
+                "stats": stats
+            }
         else:
-             raise HTTPException(status_code=400, detail="Invalid UCI")
-
-    new_fen = board.fen()
-    if req.user_move != "0000":
-        update_game_move(req.game_id, new_fen, req.user_move, is_bot=False)
-    
-    # 2. Call Engine
-    if board.is_game_over():
-        return {"bot_move": None, "fen": new_fen, "game_over": True}
-
-    prev_fen = req.fen if req.user_move != "0000" else None
-    user_move = req.user_move if req.user_move != "0000" else None
-
-    bot_move_uci, stats = engine.get_move(new_fen, req.time_taken, prev_fen=prev_fen, user_move_uci=user_move)
-    
-    if bot_move_uci:
-        board.push(chess.Move.from_uci(bot_move_uci))
-        final_fen = board.fen()
-        update_game_move(req.game_id, final_fen, bot_move_uci, is_bot=True)
-        return {
-            "bot_move": bot_move_uci,
-            "fen": final_fen,
-            "game_over": board.is_game_over(),
-            "stats": stats
-        }
-    else:
-        return {"bot_move": None, "fen": new_fen, "game_over": True}
+            await _finish_game(req.game_id, board)
+            return {"bot_move": None, "fen": new_fen, "game_over": True}
+
+@app.post("/get-move")
+async def get_move(req: MoveRequest):
+    return await _play_move(_session_for(req), req)
+
+@app.post("/get-move/stream")
+async def get_move_stream(req: MoveRequest):
+    """
+    Server-Sent Events version of /get-move: "persona" and "info" (depth, score, pv) events
+    while the bot thinks, then "move" with the /get-move response body, or "error".
+    Closing the connection cancels the move and stops the engine's search; the user move is
+    taken back too, so the client can resend it after reconnecting.
+    """
+    session = _session_for(req)  # 404/400 as plain HTTP errors, before the stream starts
+    events = asyncio.Queue()
+
+    async def produce():
+        try:
+            result = await _play_move(session, req, on_event=lambda name, data: events.put_nowait((name, data)))
+            events.put_nowait(("move", result))
+        except HTTPException as e:
+            events.put_nowait(("error", {"status": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            events.put_nowait(("error", {"status": 500, "detail": str(e)}))
+        finally:
+            events.put_nowait(None)
+
+    async def stream():
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                name, data = item
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            if not task.done():
+                # Client went away mid-move: cancelling stops the search, and the engine goes
+                # back to the pool once it has stopped
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics (exposition format 0.0.4), no client library needed.
+# Metrics register themselves on creation; render() produces the /metrics body.
+REGISTRY = []
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels, value):
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, *labels):
+        labels = self._check(labels)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # [per-bucket counts, sum, count]; buckets are made cumulative at render time
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _samples(self, labels, entry):
+        counts, total, count = entry
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = _labels(self.labelnames, labels, [f'le="{_number(bound)}"'])
+            lines.append(f"{self.name}_bucket{le} {cumulative}")
+        base = _labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{base} {_number(total)}")
+        lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Chess Morph metrics ---
+
+REQUEST_SECONDS = Histogram(
+    "chessmorph_request_seconds", "End-to-end API request latency.", ["path"])
+PHASE_SECONDS = Histogram(
+    "chessmorph_phase_seconds",
+    "Time spent per move phase (engine_acquire, baseline, prev_position, mistake_search, persona_search, "
+    "db_write, db_flush, log_write).",
+    ["phase"])
+SEARCHES = Counter(
+    "chessmorph_searches_total", "Search requests by phase and where they were answered.", ["phase", "source"])
+BOT_MOVES = Counter(
+    "chessmorph_bot_moves_total", "Bot moves played per persona.", ["persona"])
+MOVE_PATHS = Counter(
+    "chessmorph_move_paths_total",
+    "Bot moves by how they were decided (forced, mate_in_one, static, book, cache, engine).", ["path"])
+NODES = Counter(
+    "chessmorph_engine_nodes_total", "Nodes searched by the engine.", ["phase"])
+NPS = Histogram(
+    "chessmorph_engine_nps", "Engine nodes per second reported per search.", ["phase"],
+    buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7))
+PONDER = Counter(
+    "chessmorph_ponder_total", "Speculations resolved by the user's real move.", ["result"])
+PONDER_SECONDS = Counter(
+    "chessmorph_ponder_engine_seconds_total", "Engine time spent speculating, by whether it was used.", ["outcome"])
+ENGINE_JOBS = Counter(
+    "chessmorph_engine_jobs_total", "Move jobs dispatched to engine workers, by outcome.", ["outcome"])
+ENGINES_ALIVE = Gauge(
+    "chessmorph_engines_alive", "Engine processes currently alive in the pool.")
@@ -1,14 +1,29 @@
+import asyncio
 import chess
 import chess.engine
+import chess.polyglot
 import math
 
 import os
+import time
 
-import csv
+from collections import OrderedDict
+from contextlib import AsyncExitStack, ExitStack, suppress
 from datetime import datetime
 
+import fast_path
+import metrics
+from engine_pool import EnginePool, AsyncEnginePool
+from engine_resources import planner_from_env
+from eval_cache import EvalCache
+from opening_book import OpeningBook
+from ponder import Ponderer
+from move_log import MoveLogSink, ParquetMoveLogSink
+from search_budget import SearchBudget
+from single_flight import SingleFlight
+
 class MorphEngine:
-    def __init__(self):
+    def __init__(self, pool_size=None):
         # Define base_dir globally for the class scope
         base_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -21,11 +36,39 @@ class MorphEngine:
             if not os.path.exists(self.engine_path):
                  self.engine_path = "/usr/bin/stockfish" # Alternative path
 
+        # Explicit override (custom builds, local dev)
+        self.engine_path = os.getenv("STOCKFISH_PATH", self.engine_path)
+
         if not os.path.exists(self.engine_path) and os.name == 'nt':
             print(f"WARNING: Stockfish engine not found at {self.engine_path}")
 
+        # --- ENGINE POOL ---
+        # Long-lived Stockfish processes reused across moves instead of one popen per request
+        if pool_size is None:
+            pool_size = int(os.getenv("ENGINE_POOL_SIZE", "2"))
+        # Threads, Hash and CPU slice per engine (ENGINE_PLANNER=off keeps engine defaults)
+        self.resources = planner_from_env(pool_size)
+        self.pool = self._make_pool(pool_size)
+
+        # --- SEARCH BUDGET ---
+        # Scales search limits to hold the p95 move latency target under load
+        target_p95 = float(os.getenv("MOVE_LATENCY_SLO_P95", "0.5"))
+        self.budget = SearchBudget(target_p95=target_p95, capacity=self.pool.size)
+
+        # --- EVALUATION CACHE ---
+        # Search results shared across games (openings repeat constantly)
+        cache_mb = int(os.getenv("EVAL_CACHE_MB", "32"))
+        self.eval_cache = EvalCache(max_bytes=cache_mb * 1024 * 1024)
+
+        # --- OPENING BOOK ---
+        # Precomputed searches for the first plies (build_opening_book.py); mapped lazily
+        book_path = os.getenv("OPENING_BOOK_PATH", os.path.join(base_dir, "opening_book.bin"))
+        self.book = OpeningBook(book_path)
+
         # --- LOGGING SETUP ---
-        self.log_file = os.path.join(base_dir, "..", "game_log.csv")
+        self.log_file = os.getenv("MOVE_LOG_PATH", os.path.join(base_dir, "..", "game_log.csv"))
+        # Columnar log (MOVE_LOG_FORMAT=parquet): date/tag partitioned Parquet files
+        self.log_dir = os.getenv("MOVE_LOG_DIR", os.path.join(base_dir, "..", "game_log"))
         self._init_log()
 
         # --- ENGAGEMENT TUNING PARAMETERS ---
@@ -46,6 +89,34 @@ class MorphEngine:
         self.MISTAKE_NATURAL_MIN = 200
         self.MISTAKE_NATURAL_MAX = 400
 
+        # 4. Engine-free fast path
+        # On: a mate in one is played on sight, even when Mercy Mode would rather rescue a
+        # losing user. Off by default, so the persona decides as it always has.
+        self.PLAY_MATE_IN_ONE = False
+
+        # --- SEARCH PLAN ---
+        # One MultiPV search per position gives both the baseline score (line 1)
+        # and the mistake candidates (lines 2..N).
+        self.BASELINE_TIME = 0.1
+        self.BASELINE_MULTIPV = 20
+        # Where mistake candidates come from (see _find_mistake): "multipv" (the baseline's lines),
+        # "widen" (few baseline lines, doubled on demand) or "shortlist" (static ranking + searchmoves)
+        self.MISTAKE_CANDIDATES = os.getenv("MISTAKE_CANDIDATES", "multipv")
+        self.WIDEN_START_MULTIPV = 4
+        self.SHORTLIST_SIZE = 6
+        # The baseline is time-limited, so its line count costs depth, not time; the extra
+        # searches those modes add are depth-limited to stay short
+        self.MISTAKE_SEARCH_DEPTH = 8
+        # Fixed persona depths double as strength caps
+        self.DEFENSIVE_DEPTH = 6
+        self.BALANCED_DEPTH = 1
+
+        # Eval of the position handed to the user, carried to the next turn per game
+        # so the pre-move position doesn't have to be searched again for CP loss.
+        # game_id -> (position key, best score for the side to move)
+        self._carried_evals = OrderedDict()
+        self._max_carried_evals = 10000
+
     def update_config(self, config: dict):
         """
         Update tuning parameters dynamically.
@@ -58,195 +129,461 @@ class MorphEngine:
         if "MISTAKE_SEVERE_MIN" in config: self.MISTAKE_SEVERE_MIN = config["MISTAKE_SEVERE_MIN"]
         if "MISTAKE_NATURAL_MIN" in config: self.MISTAKE_NATURAL_MIN = config["MISTAKE_NATURAL_MIN"]
         if "MISTAKE_NATURAL_MAX" in config: self.MISTAKE_NATURAL_MAX = config["MISTAKE_NATURAL_MAX"]
+        if "PLAY_MATE_IN_ONE" in config: self.PLAY_MATE_IN_ONE = config["PLAY_MATE_IN_ONE"]
+        if "MISTAKE_CANDIDATES" in config: self.MISTAKE_CANDIDATES = config["MISTAKE_CANDIDATES"]
+
+    def _make_pool(self, pool_size):
+        pool = EnginePool(self.engine_path, size=pool_size, planner=self.resources)
+        try:
+            pool.warm(self._warmup_limit())
+        except Exception as e:
+            print(f"WARNING: Could not pre-warm engine pool: {e}")
+        return pool
+
+    @staticmethod
+    def _warmup_limit():
+        # Short search per engine at startup so the first real move doesn't pay NNUE load (0 disables)
+        depth = int(os.getenv("ENGINE_WARMUP_DEPTH", "10"))
+        return chess.engine.Limit(depth=depth) if depth > 0 else None
+
+    def close(self):
+        self.pool.close()
+        self.log_sink.close()
 
     def _init_log(self):
-        # Initialize CSV with headers if it doesn't exist
-        if not os.path.exists(self.log_file):
-            with open(self.log_file, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    "timestamp", "move_number", "user_move_uci", "time_taken", 
-                    "user_eval", "best_eval", "cp_loss", "is_blunder", 
-                    "bot_persona", "bot_move", "bot_depth"
-                ])
-
-    def get_move(self, fen, time_taken_seconds, prev_fen=None, user_move_uci=None):
+        # Rows are queued and written in batches by a background thread, off the request path.
+        if os.getenv("MOVE_LOG_FORMAT", "csv").lower() == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+                self.log_sink = ParquetMoveLogSink(self.log_dir, tag=os.getenv("MOVE_LOG_TAG", "live"))
+                return
+            except ImportError:
+                print("WARNING: pyarrow not installed, falling back to CSV move log")
+
+        # The sink creates the CSV with headers if it doesn't exist.
+        self.log_sink = MoveLogSink(self.log_file, [
+            "timestamp", "move_number", "user_move_uci", "time_taken", 
+            "user_eval", "best_eval", "cp_loss", "is_blunder", 
+            "bot_persona", "bot_move", "bot_depth"
+        ])
+
+    def get_move(self, fen, time_taken_seconds, prev_fen=None, user_move_uci=None, game_id=None):
         board = chess.Board(fen)
-        
-        # If game is over, return None
-        if board.is_game_over():
+        prev_board = chess.Board(prev_fen) if prev_fen else None
+        return self._get_move(board, time_taken_seconds, prev_board, user_move_uci, game_id)
+
+    def get_move_for_board(self, board, time_taken_seconds, game_id=None):
+        """Like get_move, but for a live board whose last move (if any) is the user's."""
+        return self._get_move(board, time_taken_seconds, *self._previous(board), game_id)
+
+    @staticmethod
+    def _previous(board):
+        # (position before the user's move, user's move) straight from the move stack
+        if not board.move_stack:
+            return None, None
+        prev_board = board.copy(stack=1)
+        user_move = prev_board.pop()
+        return prev_board, user_move.uci()
+
+    def _get_move(self, board, time_taken_seconds, prev_board=None, user_move_uci=None, game_id=None):
+        # If game is over (claimable draws included, like the API), return None
+        if board.is_game_over(claim_draw=True):
             return None, {}
 
-        with chess.engine.SimpleEngine.popen_uci(self.engine_path) as engine:
-            # 1. Analyze position to get current score (from User's perspective)
-            # We assume the board is set to the position AFTER the user moved, so it is BOT's turn.
-            
-            # Analyze with a small depth/time to get a baseline evaluation
-            info = engine.analyse(board, chess.engine.Limit(time=0.1))
-            score = info["score"].relative
-            
-            # Score is relative to the side to move (Bot).
-            # User Score = -Bot Score
-            if score.is_mate():
-                user_cp = -10000 if score.mate() > 0 else 10000
-            else:
-                user_cp = -score.score()
-
-            # --- PERFORMANCE TRACKING ---
-            cp_loss = 0
-            best_val = user_cp # Default if we can't calc
-            is_blunder = False
-            
-            if prev_fen and user_move_uci:
-                try:
-                    # Analyze the position BEFORE user moved to find what the best score WAS
-                    prev_board = chess.Board(prev_fen)
-                    # We want score relative to the side that was about to move (User)
-                    prev_info = engine.analyse(prev_board, chess.engine.Limit(time=0.1))
-                    prev_score = prev_info["score"].relative
-                    
-                    if prev_score.is_mate():
-                        best_val = 10000 if prev_score.mate() > 0 else -10000
+        with self.budget.track():
+            plan = self._plan_move(board, time_taken_seconds, prev_board, user_move_uci, game_id)
+            return self._run_plan(plan, game_id)
+
+    def _lookup(self, request):
+        # Answer a search request without the engine: opening book first, then eval cache.
+        # Returns (MultiPV list or None, where it came from).
+        board, limit, multipv, phase, root_moves = request
+        if root_moves is not None:
+            # Restricted (searchmoves) results are never stored, so can't be looked up either
+            return None, None
+        result = self.book.get(board, limit, multipv)
+        if result is not None:
+            metrics.SEARCHES.inc(phase, "book")
+            return result, "book"
+        result = self.eval_cache.get(board, limit, multipv)
+        if result is not None:
+            metrics.SEARCHES.inc(phase, "cache")
+            return result, "cache"
+        return None, None
+
+    @staticmethod
+    def _finish(result, sources):
+        # stats["path"]: how the move was decided. The plan sets it when no search was needed
+        # (forced, mate_in_one) or the persona move was static; otherwise it is the slowest
+        # place any of its searches was answered from.
+        bot_move, stats = result
+        if stats:
+            if "path" not in stats:
+                stats["path"] = next((s for s in ("engine", "cache", "book") if s in sources), "engine")
+            metrics.MOVE_PATHS.inc(stats["path"])
+        return result
+
+    @staticmethod
+    def _observe_search(phase, info, seconds):
+        metrics.SEARCHES.inc(phase, "engine")
+        metrics.PHASE_SECONDS.observe(seconds, phase)
+        if info:
+            nodes = info[0].get("nodes")
+            if nodes:
+                metrics.NODES.inc(phase, amount=nodes)
+            nps = info[0].get("nps")
+            if nps:
+                metrics.NPS.observe(nps, phase)
+
+    def _run_plan(self, plan, game_id=None):
+        # Drive a _plan_move generator: every yielded (board, limit, multipv, phase, root_moves)
+        # is answered from the book/eval cache or searched, and the MultiPV list is sent back.
+        # An engine is only checked out once something actually needs searching.
+        # Engine errors are raised inside the plan.
+        with ExitStack() as stack:
+            engine = None
+            sources = set()
+            try:
+                request = next(plan)
+                while True:
+                    result, source = self._lookup(request)
+                    if result is not None:
+                        sources.add(source)
+                        request = plan.send(result)
+                        continue
+                    try:
+                        if engine is None:
+                            with metrics.PHASE_SECONDS.time("engine_acquire"):
+                                engine = stack.enter_context(self.pool.acquire())
+                        board, limit, multipv, phase, root_moves = request
+                        start = time.perf_counter()
+                        # game lets python-chess send ucinewgame whenever a pooled engine switches games
+                        result = engine.analyse(board, limit, multipv=multipv, game=game_id, root_moves=root_moves)
+                    except Exception as e:
+                        request = plan.throw(e)
                     else:
-                        best_val = prev_score.score()
-                    
-                    # CP Loss = (Score of Best Move) - (Score of Actual Move)
-                    # Note: user_cp is the score of the actual move
-                    cp_loss = best_val - user_cp
-                    
-                    # Simple blunder classification
-                    if cp_loss > 200:
-                        is_blunder = True
-                        
-                except Exception as e:
-                    print(f"Error calculating CP loss: {e}")
-
-            # 2. Rubber Band & Time Heuristic Logic
-            bot_move = None
-            stats = {}
-            
-            common_stats = {
-                "user_cp": user_cp,
-                "time_taken": time_taken_seconds,
-                "cp_loss": cp_loss,
-                "is_blunder": is_blunder
-            }
-            
-            # Case A: User is Winning (Score > Threshold)
-            if user_cp > self.USER_WINNING_MARGIN:
-                move, depth = self._play_best_move(engine, board, depth=6)
-                bot_move = move
-                stats = {
-                    "difficulty": "Defensive Master", 
-                    "depth": depth, 
-                    "blunder_prob": "0% (Trying to hold)",
-                    **common_stats
-                }
-
-            # Case B: User is Losing (Score < Threshold)
-            elif user_cp < self.USER_LOSING_MARGIN:
-                # If losing badly (<-300), force severe mistake regardless of time
-                if user_cp < -300:
-                    move, depth = self._play_mistake(engine, board, min_drop=self.MISTAKE_SEVERE_MIN)
-                    stats = {
-                        "difficulty": "Mercy Mode (Rescue)", 
-                        "depth": depth, 
-                        "blunder_prob": "Critical (Rescue)",
-                        **common_stats
-                    }
-                    bot_move = move
-                elif time_taken_seconds < self.FAST_PLAY_LIMIT:
-                    move, depth = self._play_mistake(engine, board, min_drop=self.MISTAKE_SEVERE_MIN)
-                    bot_move = move
-                    stats = {
-                        "difficulty": "Mercy Mode (Speed)", 
-                        "depth": depth, 
-                        "blunder_prob": "High (Giving chance)",
-                        **common_stats
-                    }
-                else:
-                    move, depth = self._play_mistake(engine, board, min_drop=self.MISTAKE_NATURAL_MIN, max_drop=self.MISTAKE_NATURAL_MAX)
-                    bot_move = move
-                    stats = {
-                        "difficulty": "Assist Mode", 
-                        "depth": depth, 
-                        "blunder_prob": "Medium (Positional error)",
-                        **common_stats
-                    }
-
-            # Case C: Game is Even
-            else:
-                # Weaken the balanced mode significantly (depth 8 is approx 1200-1400 Elo)
-                move, depth = self._play_best_move(engine, board, depth=1)
-                bot_move = move
-                stats = {
-                    "difficulty": "Balanced Challenger", 
-                    "depth": depth, 
-                    "blunder_prob": "Low",
-                    **common_stats
-                }
-            
-            # --- REALTIME STATS ---
-            print(f"[{stats.get('difficulty')}] User CP: {user_cp} | Loss: {cp_loss} | Time: {time_taken_seconds}s | Bot Move: {bot_move}")
+                        self._observe_search(phase, result, time.perf_counter() - start)
+                        if root_moves is None:
+                            self.eval_cache.put(board, limit, result, multipv=multipv)
+                        sources.add("engine")
+                        request = plan.send(result)
+            except StopIteration as stop:
+                return self._finish(stop.value, sources)
+
+    @staticmethod
+    def _position_key(board):
+        # Zobrist: placement, side to move, castling, en passant; move counters don't change the eval
+        return chess.polyglot.zobrist_hash(board)
+
+    def _carry_eval(self, game_id, board, bot_move, info):
+        # Remember the user's best score in the position after the bot's move.
+        # It is exactly the (negated) score of the bot's chosen line in our MultiPV search.
+        if game_id is None or bot_move is None:
+            return
+        for line in info:
+            if line.get("pv") and line["pv"][0].uci() == bot_move:
+                after = board.copy(stack=False)
+                after.push(line["pv"][0])
+                best_val = -self._score_to_cp(line["score"].relative)
+                self._carried_evals[game_id] = (self._position_key(after), best_val)
+                self._carried_evals.move_to_end(game_id)
+                while len(self._carried_evals) > self._max_carried_evals:
+                    self._carried_evals.popitem(last=False)
+                return
+        # Chosen move not in our lines (deeper persona search); next turn searches it
+        self._carried_evals.pop(game_id, None)
+
+    def _carried_eval(self, game_id, prev_board):
+        entry = self._carried_evals.get(game_id)
+        if entry and entry[0] == self._position_key(prev_board):
+            return entry[1]
+        return None
+
+    @staticmethod
+    def _score_to_cp(score):
+        # Relative PovScore -> centipawns for the side to move (mates clamp to +-10000)
+        if score.is_mate():
+            return 10000 if score.mate() > 0 else -10000
+        return score.score()
+
+    def _plan_move(self, board, time_taken_seconds, prev_board=None, user_move_uci=None, game_id=None, on_event=None):
+        """
+        Persona decision logic, independent of how the engine is driven.
+        Yields search requests (board, limit, multipv, phase, root_moves) and receives the MultiPV
+        info list. phase only labels the request for metrics; root_moves (searchmoves) restricts
+        the search to those moves, None searches all.
+        on_event(name, data), if given, is told the persona as soon as it is chosen.
+        Returns (bot_move, stats).
+        """
+        # 0. Engine-free fast path: a forced reply or a mate in one needs no search at all
+        move = fast_path.forced_move(board)
+        path = "forced"
+        if move is None and self.PLAY_MATE_IN_ONE:
+            move = fast_path.mate_in_one(board)
+            path = "mate_in_one"
+        if move is not None:
+            return self._play_without_search(board, move, path, time_taken_seconds, user_move_uci, game_id)
+
+        # 1. Analyze position to get current score (from User's perspective)
+        # We assume the board is set to the position AFTER the user moved, so it is BOT's turn.
+        
+        # Search limits for this move, scaled down by the budget controller under load
+        budget = self._search_limits()
+
+        # Analyze with a small time budget to get a baseline evaluation.
+        # MultiPV so the same search also provides the mistake candidates.
+        baseline = chess.engine.Limit(time=budget["baseline_time"])
+        info = yield board, baseline, self._baseline_multipv(), "baseline", None
+        
+        # Score is relative to the side to move (Bot).
+        # User Score = -Bot Score
+        user_cp = -self._score_to_cp(info[0]["score"].relative)
 
-            # --- LOG TO CSV ---
+        # --- PERFORMANCE TRACKING ---
+        cp_loss = 0
+        best_val = user_cp # Default if we can't calc
+        is_blunder = False
+        
+        if prev_board is not None and user_move_uci:
             try:
-                with open(self.log_file, "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([
-                        datetime.now().isoformat(),
-                        board.fullmove_number,
-                        user_move_uci or "start",
-                        time_taken_seconds,
-                        user_cp,
-                        best_val,
-                        cp_loss,
-                        is_blunder,
-                        stats.get("difficulty", "Unknown"),
-                        bot_move,
-                        stats.get("depth", 0)
-                    ])
+                # Best score the user had BEFORE moving: carried from our own search last turn,
+                # otherwise analyze the previous position (first move of a session, no game_id)
+                carried = self._carried_eval(game_id, prev_board)
+                if carried is not None:
+                    best_val = carried
+                else:
+                    # We want score relative to the side that was about to move (User)
+                    prev_info = yield prev_board, baseline, 1, "prev_position", None
+                    best_val = self._score_to_cp(prev_info[0]["score"].relative)
+                
+                # CP Loss = (Score of Best Move) - (Score of Actual Move)
+                # Note: user_cp is the score of the actual move
+                cp_loss = best_val - user_cp
+                
+                # Simple blunder classification
+                if cp_loss > 200:
+                    is_blunder = True
+                    
             except Exception as e:
-                print(f"Logging error: {e}")
+                print(f"Error calculating CP loss: {e}")
+
+        # 2. Rubber Band & Time Heuristic Logic
+        common_stats = {
+            "user_cp": user_cp,
+            "time_taken": time_taken_seconds,
+            "cp_loss": cp_loss,
+            "is_blunder": is_blunder,
+            "budget": budget
+        }
+        
+        difficulty, blunder_prob = self._choose_persona(user_cp, time_taken_seconds)
+        if on_event is not None:
+            # Announced before the persona's own search so clients can show it right away
+            on_event("persona", {"persona": difficulty, "blunder_prob": blunder_prob, **common_stats})
+
+        if self._static_persona(difficulty):
+            # A depth-1 search is a material/exchange check; do that here without the engine
+            bot_move, depth = self._play_static_move(board)
+            common_stats["path"] = "static"
+        else:
+            bot_move, depth, info = yield from self._persona_move(board, info, difficulty, budget)
 
-            return bot_move, stats
+        stats = {
+            "difficulty": difficulty,
+            "depth": depth,
+            "blunder_prob": blunder_prob,
+            **common_stats
+        }
 
-    def _play_best_move(self, engine, board, depth=None):
+        # --- REALTIME STATS ---
+        metrics.BOT_MOVES.inc(stats["difficulty"])
+        print(f"[{stats.get('difficulty')}] User CP: {user_cp} | Loss: {cp_loss} | Time: {time_taken_seconds}s | Bot Move: {bot_move}")
+
+        self._carry_eval(game_id, board, bot_move, info)
+
+        self._log_move(board, user_move_uci, time_taken_seconds, user_cp, best_val, cp_loss, is_blunder, stats, bot_move)
+
+        return bot_move, stats
+
+    def _static_persona(self, difficulty):
+        return difficulty == "Balanced Challenger" and self.BALANCED_DEPTH <= 1
+
+    def _persona_move(self, board, info, difficulty, budget):
+        """
+        Searches for the persona's move, given the baseline lines in info; yields requests like
+        _plan_move. Returns (bot_move, depth, lines the move was picked from).
+        """
+        if difficulty == "Defensive Master":
+            bot_move, depth = yield from self._play_best_move(board, depth=budget["defensive_depth"])
+        elif difficulty == "Assist Mode":
+            bot_move, depth, info = yield from self._find_mistake(
+                board, info, min_drop=self.MISTAKE_NATURAL_MIN, max_drop=self.MISTAKE_NATURAL_MAX, budget=budget)
+        elif difficulty.startswith("Mercy Mode"):
+            bot_move, depth, info = yield from self._find_mistake(
+                board, info, min_drop=self.MISTAKE_SEVERE_MIN, budget=budget)
+        else:
+            # Weaken the balanced mode significantly (depth 8 is approx 1200-1400 Elo)
+            bot_move, depth = yield from self._play_best_move(board, depth=self.BALANCED_DEPTH)
+        return bot_move, depth, info
+
+    def _play_without_search(self, board, move, path, time_taken_seconds, user_move_uci, game_id):
+        # Nothing was searched: user_cp is exact for a mate, a material count otherwise,
+        # and the user's CP loss isn't measured this turn
+        user_cp = -fast_path.MATE_SCORE if path == "mate_in_one" else -fast_path.material(board)
+        stats = {
+            "difficulty": "Checkmate" if path == "mate_in_one" else "Forced Move",
+            "depth": 0,
+            "blunder_prob": "N/A",
+            "user_cp": user_cp,
+            "time_taken": time_taken_seconds,
+            "cp_loss": 0,
+            "is_blunder": False,
+            "path": path,
+        }
+        bot_move = move.uci()
+
+        metrics.BOT_MOVES.inc(stats["difficulty"])
+        print(f"[{stats['difficulty']}] User CP: {user_cp} | Time: {time_taken_seconds}s | Bot Move: {bot_move}")
+
+        # No lines to carry; next turn searches the user's position itself
+        self._carried_evals.pop(game_id, None)
+        self._log_move(board, user_move_uci, time_taken_seconds, user_cp, user_cp, 0, False, stats, bot_move)
+        return bot_move, stats
+
+    def _choose_persona(self, user_cp, time_taken_seconds):
+        """Rubber band & time heuristic: (persona, blunder probability label)."""
+        # Case A: User is Winning (Score > Threshold)
+        if user_cp > self.USER_WINNING_MARGIN:
+            return "Defensive Master", "0% (Trying to hold)"
+
+        # Case B: User is Losing (Score < Threshold)
+        if user_cp < self.USER_LOSING_MARGIN:
+            # If losing badly (<-300), force severe mistake regardless of time
+            if user_cp < -300:
+                return "Mercy Mode (Rescue)", "Critical (Rescue)"
+            if time_taken_seconds < self.FAST_PLAY_LIMIT:
+                return "Mercy Mode (Speed)", "High (Giving chance)"
+            return "Assist Mode", "Medium (Positional error)"
+
+        # Case C: Game is Even
+        return "Balanced Challenger", "Low"
+
+    def _log_move(self, board, user_move_uci, time_taken_seconds, user_cp, best_val, cp_loss, is_blunder, stats, bot_move):
+        # --- LOG TO CSV ---
+        with metrics.PHASE_SECONDS.time("log_write"):
+            self.log_sink.write([
+                datetime.now().isoformat(),
+                board.fullmove_number,
+                user_move_uci or "start",
+                time_taken_seconds,
+                user_cp,
+                best_val,
+                cp_loss,
+                is_blunder,
+                stats.get("difficulty", "Unknown"),
+                bot_move,
+                stats.get("depth", 0)
+            ])
+
+    def _play_best_move(self, board, depth=None):
         # Skill 20 is default for Stockfish
         # Use analyse to get depth info
         limit = chess.engine.Limit(depth=depth) if depth else chess.engine.Limit(time=0.5)
-        info = engine.analyse(board, limit, multipv=1)
+        info = yield board, limit, 1, "persona_search", None
         if not info:
              return None, 0
         best_line = info[0]
         return best_line["pv"][0].uci(), best_line["depth"]
 
-    def _play_mistake(self, engine, board, min_drop, max_drop=None):
-        # Use MultiPV to find suboptimal moves
-        limit = chess.engine.Limit(depth=4)
-        # Get top 20 moves to find a suitable mistake
-        info = engine.analyse(board, limit, multipv=20)
-        
+    def _play_static_move(self, board):
+        # Best move by material and static exchange (fast_path), depth reported as 1
+        metrics.SEARCHES.inc("persona_search", "static")
+        with metrics.PHASE_SECONDS.time("persona_search"):
+            move, _ = fast_path.static_best_move(board)
+        return (move.uci() if move else None), 1
+
+    def _search_limits(self):
+        # Search limits for the next move, scaled down by the budget controller under load
+        lines = self.SHORTLIST_SIZE if self.MISTAKE_CANDIDATES == "shortlist" else self.BASELINE_MULTIPV
+        return self.budget.limits(self.BASELINE_TIME, self.DEFENSIVE_DEPTH, self.MISTAKE_SEARCH_DEPTH, lines)
+
+    def _baseline_multipv(self):
+        # The cheaper candidate modes only pay for more lines when a mistake is actually needed
+        if self.MISTAKE_CANDIDATES == "widen":
+            return self.WIDEN_START_MULTIPV
+        if self.MISTAKE_CANDIDATES == "shortlist":
+            return 1
+        return self.BASELINE_MULTIPV
+
+    def _find_mistake(self, board, info, min_drop, max_drop=None, budget=None):
+        """
+        Mistake move for the Assist/Mercy personas, by MISTAKE_CANDIDATES:
+          multipv   - first in-band line of the baseline search (no extra search)
+          widen     - double the lines while none is in band, up to BASELINE_MULTIPV
+          shortlist - rank legal moves by a one-ply static eval and verify the SHORTLIST_SIZE
+                      closest to the band, plus the best move, with one searchmoves search
+        The extra searches' depth and line count come from budget (_search_limits), so they
+        shrink under load like the rest of the move.
+        Drops are always measured against the best line of the same search.
+        Returns (bot_move, depth, lines the move was picked from).
+        """
+        if budget is None:
+            budget = self._search_limits()
+        limit = chess.engine.Limit(depth=budget["mistake_depth"])
+        if self.MISTAKE_CANDIDATES == "widen":
+            multipv = len(info)
+            most = min(budget["mistake_lines"], board.legal_moves.count())
+            while self._pick_mistake(info, min_drop, max_drop) is None and multipv < most:
+                multipv = min(multipv * 2, most)
+                info = yield board, limit, multipv, "mistake_search", None
+        elif self.MISTAKE_CANDIDATES == "shortlist" and info:
+            best_move = info[0]["pv"][0]
+            shortlist = self._mistake_shortlist(board, best_move, budget["mistake_lines"], min_drop, max_drop)
+            if shortlist:
+                root_moves = [best_move] + shortlist
+                info = yield board, limit, len(root_moves), "mistake_search", root_moves
+
+        bot_move, depth = self._play_mistake(info, min_drop, max_drop)
+        return bot_move, depth, info
+
+    def _mistake_shortlist(self, board, best_move, size, min_drop, max_drop=None):
+        # Static drop estimate per move (captures, pieces left en prise), closest to the band first
+        scores = fast_path.static_scores(board)
+        reference = scores.pop(best_move, max(scores.values(), default=0))
+
+        def distance(move):
+            drop = reference - scores[move]
+            if drop < min_drop:
+                return min_drop - drop
+            if max_drop and drop > max_drop:
+                return drop - max_drop
+            return 0
+
+        return sorted(scores, key=distance)[:size]
+
+    def _play_mistake(self, info, min_drop, max_drop=None):
+        # Pick a suboptimal move from the baseline MultiPV lines (no extra search)
         if not info:
-            return self._play_best_move(engine, board)
+            return None, 0
 
+        move = self._pick_mistake(info, min_drop, max_drop)
+        if move:
+            return move.uci(), info[0]["depth"]
+        
+        # If no suitable mistake found (e.g. forced moves), play best move or random legal?
+        # Fallback to the baseline best move to avoid crashing
+        return info[0]["pv"][0].uci(), info[0]["depth"]
+
+    def _pick_mistake(self, info, min_drop, max_drop=None):
         # Best move score (Bot's perspective)
-        best_score = info[0]["score"].relative
-        if best_score.is_mate():
-            best_val = 10000 if best_score.mate() > 0 else -10000
-        else:
-            best_val = best_score.score()
+        best_val = self._score_to_cp(info[0]["score"].relative)
 
         candidates = []
 
         for i, line in enumerate(info):
             if i == 0: continue # Skip best move
             
-            move_score = line["score"].relative
-            if move_score.is_mate():
-                move_val = 10000 if move_score.mate() > 0 else -10000
-            else:
-                move_val = move_score.score()
+            move_val = self._score_to_cp(line["score"].relative)
             
             drop = best_val - move_val
             
@@ -255,10 +592,256 @@ class MorphEngine:
                     continue
                 candidates.append(line["pv"][0])
 
-        if candidates:
-            # Return the first matching candidate (usually the best of the bad moves)
-            return candidates[0].uci(), info[0]["depth"]
-        
-        # If no suitable mistake found (e.g. forced moves), play best move or random legal?
-        # Fallback to best move to avoid crashing
-        return self._play_best_move(engine, board)
+        # Return the first matching candidate (usually the best of the bad moves)
+        return candidates[0] if candidates else None
+
+
+class AsyncMorphEngine(MorphEngine):
+    """
+    asyncio-native MorphEngine for the API server.
+    Same persona logic, but engines are driven through python-chess's async protocol
+    so a request awaiting a search never holds a threadpool thread.
+    """
+
+    def _make_pool(self, pool_size):
+        # Concurrent requests for the same (position, limit, multipv) share one search
+        self.single_flight = SingleFlight()
+        # While the user thinks, idle engines precompute the next move for their likely replies
+        self.ponder = Ponderer()
+        self.PONDER_MOVES = int(os.getenv("PONDER_MOVES", "3"))
+        self._warmup = None
+        self.warmup_seconds = None
+        return AsyncEnginePool(self.engine_path, size=pool_size, planner=self.resources)
+
+    @staticmethod
+    def _search_key(board, limit, multipv, root_moves=None):
+        # Time limits differ slightly between concurrent moves (load-scaled budget), so they
+        # are not part of the key: a request joins any in-flight search with at least its time
+        return chess.polyglot.zobrist_hash(board), limit.depth, multipv, tuple(root_moves or ())
+
+    async def start(self):
+        # Engines spawn and warm in the background so the server answers right away.
+        # Moves arriving meanwhile wait for the first warm engine instead of spawning their own.
+        if self._warmup is None:
+            self._warmup = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            started = await self.pool.warm(self._warmup_limit())
+        except Exception as e:
+            print(f"WARNING: Could not pre-warm engine pool: {e}")
+            return
+        self.warmup_seconds = round(time.perf_counter() - start, 3)
+        print(f"Engine pool warm: {started} engine(s) in {self.warmup_seconds}s")
+
+    @property
+    def ready(self):
+        """At least one engine has been spawned and warmed."""
+        return self.pool.warmed > 0
+
+    def startup_stats(self):
+        return {
+            "ready": self.ready,
+            "warming": self._warmup is not None and not self._warmup.done(),
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+    async def close(self):
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._warmup
+        await self.ponder.close()
+        await self.pool.close()
+        self.log_sink.close()
+
+    async def get_move(self, fen, time_taken_seconds, prev_fen=None, user_move_uci=None, game_id=None):
+        board = chess.Board(fen)
+        prev_board = chess.Board(prev_fen) if prev_fen else None
+        return await self._get_move(board, time_taken_seconds, prev_board, user_move_uci, game_id)
+
+    async def get_move_for_board(self, board, time_taken_seconds, game_id=None, on_event=None):
+        """
+        on_event(name, data) receives progress while the move is computed: "persona" once it is
+        chosen and "info" for main-line search updates (depth, score, pv) from the engine.
+        """
+        return await self._get_move(board, time_taken_seconds, *self._previous(board), game_id, on_event)
+
+    async def _get_move(self, board, time_taken_seconds, prev_board=None, user_move_uci=None, game_id=None, on_event=None):
+        # If game is over (claimable draws included, like the API), return None
+        if board.is_game_over(claim_draw=True):
+            return None, {}
+
+        with self.budget.track():
+            # Real move is here: stop speculating; on a hit its baseline is already in the eval cache
+            speculation = None
+            if game_id is not None and prev_board is not None:
+                speculation = self.ponder.claim(game_id, self._position_key(prev_board), user_move_uci)
+            served = set()
+            verdict = None
+            try:
+                plan = self._plan_move(board, time_taken_seconds, prev_board, user_move_uci, game_id, on_event)
+                bot_move, stats = await self._run_plan_async(plan, game_id, on_event, served=served)
+            finally:
+                if speculation is not None:
+                    verdict = self.ponder.settle(speculation, served)
+
+        if verdict is not None:
+            stats["ponder"] = verdict
+        if bot_move and game_id is not None and self.PONDER_MOVES > 0:
+            after = board.copy(stack=False)
+            after.push_uci(bot_move)
+            if not after.is_game_over(claim_draw=True):
+                self.ponder.start(game_id, self._position_key(after),
+                                  lambda speculation: self._speculate(speculation, after, game_id))
+        return bot_move, stats
+
+    async def _speculate(self, speculation, board, game_id):
+        """
+        Runs the searches _plan_move will request for the user's most likely replies in board
+        and leaves them in the eval cache. Each search takes an engine nobody is waiting for
+        and gives it back right after, so real moves never queue behind a whole speculation.
+
+        The baseline is time-limited and a longer search answers a shorter request, so it runs
+        at the full BASELINE_TIME and covers whatever the budget grants the real move. Persona
+        searches only answer their own depth: they use today's limits and the persona of a
+        reply that took the user a while, and serve the real move when those still hold.
+        """
+        if self.pool.available == 0:
+            self.ponder.skipped += 1
+            return
+        budget = self._search_limits()
+        baseline = chess.engine.Limit(time=self.BASELINE_TIME)
+        # Also answers next turn's "prev_position" search if no eval gets carried
+        lines = await self._search_speculative(speculation, board, baseline, self.PONDER_MOVES, game_id)
+
+        for line in lines or []:
+            if speculation.stopped or not line.get("pv"):
+                break
+            reply = line["pv"][0]
+            child = board.copy(stack=False)
+            child.push(reply)
+            if child.is_game_over(claim_draw=True) or fast_path.forced_move(child) is not None or (
+                    self.PLAY_MATE_IN_ONE and fast_path.mate_in_one(child)):
+                continue  # answered without a search
+            info = await self._search_speculative(speculation, child, baseline, self._baseline_multipv(), game_id)
+            if info is None:
+                break
+            speculation.replies[reply.uci()] = self.eval_cache.key(child, baseline)
+            persona, _ = self._choose_persona(-self._score_to_cp(info[0]["score"].relative), self.FAST_PLAY_LIMIT)
+            if self._static_persona(persona):
+                continue
+            plan = self._persona_move(child, info, persona, budget)
+            try:
+                request = next(plan)
+                # Restricted (searchmoves) results are never cached, so aren't worth pondering
+                while request[4] is None:
+                    _, limit, multipv, _, _ = request
+                    info = await self._search_speculative(speculation, child, limit, multipv, game_id)
+                    if info is None:
+                        return
+                    request = plan.send(info)
+            except StopIteration:
+                pass
+
+    async def _search_speculative(self, speculation, board, limit, multipv, game_id):
+        # One search on an idle engine, None once there is none or the speculation is stopped.
+        # Speculation.stop() ends it early through the AnalysisResult, so the engine goes back
+        # to the pool ready; stopped searches are incomplete, so only finished ones are cached.
+        if speculation.stopped or self.pool.available == 0:
+            return None
+        async with self.pool.acquire() as engine:
+            start = time.perf_counter()
+            with await engine.analysis(board, limit, multipv=multipv, game=game_id) as analysis:
+                speculation.analysis = analysis
+                try:
+                    await analysis.wait()
+                finally:
+                    speculation.analysis = None
+                    seconds = time.perf_counter() - start
+                    speculation.engine_seconds += seconds
+        if speculation.stopped:
+            return None
+        info = list(analysis.multipv)
+        metrics.SEARCHES.inc("ponder", "engine")
+        self.eval_cache.put(board, limit, info, multipv=multipv)
+        speculation.record(self.eval_cache.key(board, limit), seconds)
+        return info
+
+    @staticmethod
+    def _info_event(board, phase, info):
+        score = info["score"].white()
+        return {
+            "phase": phase,
+            "depth": info.get("depth"),
+            "cp": score.score(),  # White's point of view, like a normal eval bar
+            "mate": score.mate(),
+            "pv": [move.uci() for move in info["pv"][:8]],
+            "nodes": info.get("nodes"),
+            "fen": board.fen(),
+        }
+
+    async def _analyse_streaming(self, engine, board, limit, multipv, phase, game_id, on_event, root_moves=None):
+        # Same result as engine.analyse, but main-line updates are forwarded as they arrive.
+        # Cancelling (client gone) leaves the with-block, which sends "stop" to the engine; the pool
+        # checks it back in once the search has ended.
+        with await engine.analysis(board, limit, multipv=multipv, game=game_id, root_moves=root_moves) as analysis:
+            async for info in analysis:
+                if info.get("multipv", 1) == 1 and "pv" in info and "score" in info:
+                    on_event("info", self._info_event(board, phase, info))
+            return list(analysis.multipv)
+
+    async def _run_plan_async(self, plan, game_id=None, on_event=None, served=None):
+        # served, if given, collects the eval-cache keys of the searches answered from the cache
+        # (also when the plan fails)
+        async with AsyncExitStack() as stack:
+            engine = None
+            sources = set()
+            try:
+                request = next(plan)
+                while True:
+                    result, source = self._lookup(request)
+                    if result is not None:
+                        sources.add(source)
+                        if source == "cache" and served is not None:
+                            served.add(self.eval_cache.key(request[0], request[1]))
+                        request = plan.send(result)
+                        continue
+                    board, limit, multipv, phase, root_moves = request
+
+                    async def take_engine():
+                        # Before leading a search, never inside it: a leader waiting for an engine
+                        # could wait on a follower that holds the only one
+                        nonlocal engine
+                        if engine is None:
+                            if self.pool.available == 0:
+                                # Speculation gives way: its engines come back after one "stop"
+                                self.ponder.preempt()
+                            with metrics.PHASE_SECONDS.time("engine_acquire"):
+                                engine = await stack.enter_async_context(self.pool.acquire())
+
+                    async def search():
+                        start = time.perf_counter()
+                        if on_event is None:
+                            info = await engine.analyse(board, limit, multipv=multipv, game=game_id, root_moves=root_moves)
+                        else:
+                            info = await self._analyse_streaming(
+                                engine, board, limit, multipv, phase, game_id, on_event, root_moves)
+                        self._observe_search(phase, info, time.perf_counter() - start)
+                        if root_moves is None:
+                            self.eval_cache.put(board, limit, info, multipv=multipv)
+                        return info
+
+                    try:
+                        result = await self.single_flight.run(
+                            self._search_key(board, limit, multipv, root_moves), search,
+                            strength=limit.time or 0, prepare=take_engine)
+                    except Exception as e:
+                        request = plan.throw(e)
+                    else:
+                        # Joining another request's search still counts as an engine search
+                        sources.add("engine")
+                        request = plan.send(result)
+            except StopIteration as stop:
+                return self._finish(stop.value, sources)
@@ -0,0 +1,11 @@
+import chess
+
+
+def encode_move(move):
+    # 6 bits from, 6 bits to, 3 bits promotion piece type -> fits in 16 bits
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def decode_move(code):
+    promotion = (code >> 12) & 0x7
+    return chess.Move(code & 0x3F, (code >> 6) & 0x3F, promotion=promotion or None)
@@ -0,0 +1,224 @@
+import atexit
+import csv
+import io
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Queue marker telling the writer thread to flush and exit
+_STOP = object()
+
+
+class MoveLogSink:
+    """
+    Non-blocking CSV logger for per-move rows.
+
+    write() only enqueues; a background thread batches rows and flushes them
+    when batch_size rows are pending or flush_interval seconds have passed.
+    Each flush is a single os.write on an O_APPEND descriptor, so several
+    uvicorn workers (or simulation processes) can share one file without
+    interleaving rows.
+    """
+
+    def __init__(self, path, header, batch_size=200, flush_interval=1.0, max_pending=10000):
+        self.path = path
+        self.header = header
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+
+        self._write_header()
+        self._thread = threading.Thread(target=self._run, name="move-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _write_header(self):
+        # O_EXCL: exactly one process creates the file and writes the header
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return
+        except OSError as e:
+            print(f"Logging error: {e}")
+            return
+        try:
+            os.write(fd, self._encode([self.header]))
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _encode(rows):
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+    def write(self, row):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Never block a request on logging
+            self.dropped += 1
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, self._encode(rows))
+            finally:
+                os.close(fd)
+            self.written += len(rows)
+        except OSError as e:
+            print(f"Logging error: {e}")
+
+    def _run(self):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                break
+            if row is not None:
+                pending.append(row)
+
+            if len(pending) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush(pending)
+                pending = []
+                last_flush = time.monotonic()
+
+        # Drain whatever arrived before the stop marker
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                pending.append(row)
+        self._flush(pending)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+# Typed columns for the columnar log, in CSV header order
+LOG_COLUMNS = [
+    ("timestamp", "timestamp"),
+    ("move_number", "int16"),
+    ("user_move_uci", "string"),
+    ("time_taken", "float64"),
+    ("user_eval", "int32"),
+    ("best_eval", "int32"),
+    ("cp_loss", "int32"),
+    ("is_blunder", "bool"),
+    ("bot_persona", "string"),
+    ("bot_move", "string"),
+    ("bot_depth", "int16"),
+]
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {
+        "timestamp": pa.timestamp("us"),
+        "int16": pa.int16(),
+        "int32": pa.int32(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+        "string": pa.string(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in LOG_COLUMNS])
+
+
+def rows_to_table(rows):
+    """Convert CSV-ordered rows (timestamp as ISO string) into a typed Arrow table."""
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    data = {}
+    for (name, kind), values in zip(LOG_COLUMNS, columns):
+        if kind == "timestamp":
+            values = [datetime.fromisoformat(v) if isinstance(v, str) else v for v in values]
+        elif kind == "bool":
+            values = [v if isinstance(v, bool) else str(v) == "True" for v in values]
+        elif kind.startswith("int"):
+            values = [None if v in (None, "") else int(float(v)) for v in values]
+        elif kind == "float64":
+            values = [None if v in (None, "") else float(v) for v in values]
+        else:
+            values = [None if v is None else str(v) for v in values]
+        data[name] = values
+    return pa.Table.from_pydict(data, schema=arrow_schema())
+
+
+def write_partitions(log_dir, table, tag):
+    """Write a table as Parquet files under log_dir/date=YYYY-MM-DD/tag=<tag>/."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    dates = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+    written = []
+    for date in sorted(set(dates.to_pylist())):
+        part = table.filter(pc.equal(dates, date))
+        part_dir = os.path.join(log_dir, f"date={date}", f"tag={tag}")
+        os.makedirs(part_dir, exist_ok=True)
+        # One file per flush and process: concurrent writers never share a file
+        name = f"part-{os.getpid()}-{time.time_ns()}.parquet"
+        tmp_path = os.path.join(part_dir, "." + name + ".tmp")
+        pq.write_table(part, tmp_path)
+        os.replace(tmp_path, os.path.join(part_dir, name))
+        written.append(os.path.join(part_dir, name))
+    return written
+
+
+class ParquetMoveLogSink(MoveLogSink):
+    """
+    Columnar variant of MoveLogSink: every flush becomes a Parquet file
+    partitioned by date and batch tag (e.g. a simulation batch). Flushes are
+    larger and rarer than the CSV sink since each one is a separate file.
+    """
+
+    def __init__(self, log_dir, tag="live", batch_size=5000, flush_interval=30.0, max_pending=50000):
+        self.tag = tag
+        super().__init__(log_dir, [name for name, _ in LOG_COLUMNS], batch_size=batch_size,
+                         flush_interval=flush_interval, max_pending=max_pending)
+
+    def _write_header(self):
+        os.makedirs(self.path, exist_ok=True)
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            write_partitions(self.path, rows_to_table(rows), self.tag)
+            self.written += len(rows)
+        except Exception as e:
+            print(f"Logging error: {e}")
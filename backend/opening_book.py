@@ -0,0 +1,157 @@
+import mmap
+import os
+import struct
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from move_codec import decode_move, encode_move
+
+# File layout (little endian):
+#   header  : magic, version, entry count, baseline time, baseline multipv, max ply
+#   index   : one record per position, sorted by Zobrist key -> binary search
+#   lines   : fixed-size (move, flags, depth, score) records referenced by the index
+# Each position holds its baseline MultiPV lines followed by one line per persona depth.
+MAGIC = b"CMBOOK1\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIfHH")
+INDEX = struct.Struct("<QIBBH")   # key, first line, baseline lines, depth lines, pad
+LINE = struct.Struct("<HBBi")     # move, flags, depth, score
+FLAG_MATE = 1
+
+
+def _pack_line(move_uci, cp, mate, depth):
+    move = encode_move(chess.Move.from_uci(move_uci))
+    if mate is not None:
+        return LINE.pack(move, FLAG_MATE, depth, mate)
+    return LINE.pack(move, 0, depth, cp)
+
+
+def write_book(path, entries, baseline_time, multipv, max_ply):
+    """
+    entries: {zobrist_key: (baseline_lines, depth_lines)}
+    Each line is (move_uci, cp, mate, depth); for depth_lines depth is the persona's depth limit.
+    """
+    keys = sorted(entries)
+    index = bytearray()
+    data = bytearray()
+    line_no = 0
+    for key in keys:
+        baseline_lines, depth_lines = entries[key]
+        index += INDEX.pack(key, line_no, len(baseline_lines), len(depth_lines), 0)
+        for line in list(baseline_lines) + list(depth_lines):
+            data += _pack_line(*line)
+            line_no += 1
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), baseline_time, multipv, max_ply))
+        f.write(index)
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class OpeningBook:
+    """
+    Read-only, memory-mapped book of precomputed searches for early positions.
+    Built offline by build_opening_book.py. The file is opened on first lookup,
+    so a missing or large book costs nothing at server startup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mm = None
+        self._loaded = False
+        self.count = 0
+        self.baseline_time = 0.0
+        self.multipv = 0
+        self.max_ply = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            print(f"Opening book not found at {self.path}. Running without book.")
+            return
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count, baseline_time, multipv, max_ply = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION:
+                print(f"Opening book at {self.path} has an unknown format. Ignoring it.")
+                mm.close()
+                return
+        except Exception as e:
+            print(f"Could not load opening book: {e}")
+            return
+        self._mm = mm
+        self.count = count
+        self.baseline_time = baseline_time
+        self.multipv = multipv
+        self.max_ply = max_ply
+        print(f"Loaded opening book: {count} positions, up to ply {max_ply}")
+
+    def _find(self, key):
+        lo, hi = 0, self.count - 1
+        base = HEADER.size
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            mid_key = struct.unpack_from("<Q", self._mm, base + mid * INDEX.size)[0]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid - 1
+            else:
+                return INDEX.unpack_from(self._mm, base + mid * INDEX.size)
+        return None
+
+    def _read_lines(self, board, first, count):
+        data_start = HEADER.size + self.count * INDEX.size
+        lines = []
+        for i in range(first, first + count):
+            move, flags, depth, value = LINE.unpack_from(self._mm, data_start + i * LINE.size)
+            score = chess.engine.Mate(value) if flags & FLAG_MATE else chess.engine.Cp(value)
+            lines.append({
+                "score": chess.engine.PovScore(score, board.turn),
+                "pv": [decode_move(move)],
+                "depth": depth,
+            })
+        return lines
+
+    def get(self, board, limit, multipv=1):
+        """Return an engine.analyse-shaped MultiPV list, or None if the book can't answer."""
+        if not self._loaded:
+            self._load()
+        if self._mm is None or board.ply() > self.max_ply:
+            return None
+
+        record = self._find(chess.polyglot.zobrist_hash(board))
+        if record is None:
+            self.misses += 1
+            return None
+        _, first, n_baseline, n_depth, _ = record
+
+        if limit.depth is not None:
+            # Persona searches: only the exact depths that were precomputed
+            for line in self._read_lines(board, first + n_baseline, n_depth):
+                if line["depth"] == limit.depth and multipv == 1:
+                    self.hits += 1
+                    return [line]
+        elif limit.time is not None and limit.time <= self.baseline_time + 1e-6 and multipv <= self.multipv:
+            self.hits += 1
+            return self._read_lines(board, first, min(n_baseline, multipv))
+
+        self.misses += 1
+        return None
+
+    def stats(self):
+        return {
+            "loaded": self._mm is not None,
+            "positions": self.count,
+            "max_ply": self.max_ply,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,152 @@
+import asyncio
+from collections import OrderedDict
+
+import metrics
+
+
+class Speculation:
+    """Background searches for one game, for the position handed to the user."""
+
+    __slots__ = ("position", "searches", "replies", "played", "task", "analysis", "stopped", "engine_seconds")
+
+    def __init__(self, position):
+        self.position = position
+        # eval-cache key -> engine seconds, for every finished search left in the cache
+        self.searches = {}
+        # user move (uci) -> eval-cache key of its baseline search, the one that settles a hit
+        self.replies = {}
+        # The user's move, once claimed, if it is one of the replies
+        self.played = None
+        self.task = None
+        # In-flight AnalysisResult; stopping it ends the search early and keeps the engine usable
+        self.analysis = None
+        self.stopped = False
+        self.engine_seconds = 0.0
+
+    def record(self, key, seconds):
+        # A finished search, now in the eval cache under key
+        self.searches[key] = self.searches.get(key, 0.0) + seconds
+
+    def stop(self):
+        self.stopped = True
+        if self.analysis is not None:
+            self.analysis.stop()
+
+
+class Ponderer:
+    """
+    Speculative work while users think, one Speculation per game.
+
+    start() runs work(speculation) in the background; the work caches its results
+    and records which searches it made for which user reply. claim() is called when
+    the real move arrives and stops whatever is still running; settle() is called once
+    the move is made and reports a hit only if the played reply's baseline was read
+    from its pondered entry. The move plans with its own limits and persona; the
+    persona searches it shares with the speculation are a bonus, not the verdict.
+    preempt() stops every speculation, so real moves never queue behind one.
+
+    Engine time on entries the real move didn't read (and on stopped searches) is wasted.
+    """
+
+    def __init__(self, max_games=10000):
+        self.max_games = max_games
+        self._games = OrderedDict()
+
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.preempted = 0
+        self.engine_seconds = 0.0
+        self.wasted_seconds = 0.0
+
+    def start(self, game_id, position, work):
+        self._drop(game_id)
+        speculation = Speculation(position)
+        speculation.task = asyncio.create_task(self._run(speculation, work))
+        self._games[game_id] = speculation
+        self.started += 1
+        while len(self._games) > self.max_games:
+            # Games whose user never came back
+            self._drop(next(iter(self._games)))
+
+    async def _run(self, speculation, work):
+        try:
+            await work(speculation)
+        except Exception as e:
+            print(f"Speculation failed: {e}")
+
+    def _drop(self, game_id):
+        speculation = self._games.pop(game_id, None)
+        if speculation is None:
+            return
+        speculation.stop()
+        # The stopped search still reports its time; account once the task is done
+        speculation.task.add_done_callback(lambda _: self._account(speculation, 0.0))
+
+    def _account(self, speculation, used_seconds):
+        wasted = max(0.0, speculation.engine_seconds - used_seconds)
+        self.engine_seconds += speculation.engine_seconds
+        self.wasted_seconds += wasted
+        metrics.PONDER_SECONDS.inc("used", amount=speculation.engine_seconds - wasted)
+        metrics.PONDER_SECONDS.inc("wasted", amount=wasted)
+
+    def claim(self, game_id, position, user_move):
+        """
+        The user played user_move in position (Zobrist key). Stops the game's speculation and
+        returns it for settle(), or None if nothing ran.
+        """
+        speculation = self._games.pop(game_id, None)
+        if speculation is None:
+            return None
+        speculation.stop()
+        if speculation.position == position and user_move in speculation.replies:
+            speculation.played = user_move
+        return speculation
+
+    def settle(self, speculation, served):
+        """
+        The claimed speculation's move is made: served holds the eval-cache keys its searches
+        were answered from. Returns "hit" if that includes the baseline pondered for the played
+        reply, "miss" otherwise. Only the engine time of entries that were read counts as used.
+        """
+        used = served.intersection(speculation.searches)
+        hit = speculation.played is not None and speculation.replies[speculation.played] in used
+        used_seconds = sum(speculation.searches[key] for key in used)
+        # The stopped search still reports its time; account once the task is done
+        speculation.task.add_done_callback(lambda _: self._account(speculation, used_seconds))
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.PONDER.inc("hit" if hit else "miss")
+        return "hit" if hit else "miss"
+
+    def preempt(self):
+        """Stop all running speculations; searches they already finished stay cached."""
+        for speculation in self._games.values():
+            if not speculation.task.done() and not speculation.stopped:
+                speculation.stop()
+                self.preempted += 1
+
+    async def close(self):
+        tasks = [s.task for s in self._games.values()]
+        for game_id in list(self._games):
+            self._drop(game_id)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        resolved = self.hits + self.misses
+        return {
+            "games": len(self._games),
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / resolved, 3) if resolved else None,
+            "skipped": self.skipped,
+            "preempted": self.preempted,
+            "engine_seconds": round(self.engine_seconds, 3),
+            "wasted_seconds": round(self.wasted_seconds, 3),
+            "wasted_share": round(self.wasted_seconds / self.engine_seconds, 3) if self.engine_seconds else None,
+        }
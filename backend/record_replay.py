@@ -0,0 +1,166 @@
+"""
+Records a replay dataset for tune_replay.py: plays simulated games like
+run_batch_simulations.py and keeps, for every bot decision, the baseline search
+(score and all MultiPV lines) plus what the user did. Thresholds can then be
+swept over the recording without running the engine again.
+
+    python record_replay.py -n 200 -o replay.npz
+"""
+import os
+import sys
+import random
+import multiprocessing
+from multiprocessing.util import Finalize
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+sys.path.append(BACKEND)
+
+import fast_path
+from move_codec import encode_move
+from morph_engine import MorphEngine
+from replay_dataset import PERSONAS, build_dataset, save_dataset
+
+TUNED_PARAMS = ("USER_WINNING_MARGIN", "USER_LOSING_MARGIN", "FAST_PLAY_LIMIT",
+                "MISTAKE_SEVERE_MIN", "MISTAKE_NATURAL_MIN", "MISTAKE_NATURAL_MAX")
+
+
+class RecordingMorphEngine(MorphEngine):
+    """MorphEngine that keeps a replay row for every move decided from a baseline search."""
+
+    def __init__(self, pool_size=None):
+        super().__init__(pool_size)
+        # The tuner needs every baseline line, whatever mode the server runs in
+        self.MISTAKE_CANDIDATES = "multipv"
+        self.rows = []
+        self._baseline = None
+
+    def _plan_move(self, board, *args, **kwargs):
+        # Pass the plan through unchanged, keeping the baseline search's lines on the way
+        self._baseline = None
+        plan = super()._plan_move(board, *args, **kwargs)
+        try:
+            request = next(plan)
+            while True:
+                try:
+                    info = yield request
+                except Exception as e:
+                    request = plan.throw(e)
+                    continue
+                if request[3] == "baseline" and request[0] is board:
+                    self._baseline = info
+                request = plan.send(info)
+        except StopIteration as stop:
+            return stop.value
+
+    def _log_move(self, board, user_move_uci, time_taken_seconds, user_cp, best_val, cp_loss, is_blunder, stats, bot_move):
+        super()._log_move(board, user_move_uci, time_taken_seconds, user_cp, best_val, cp_loss, is_blunder, stats, bot_move)
+        info, self._baseline = self._baseline, None
+        if not info or stats.get("difficulty") not in PERSONAS:
+            return
+        lines = [line for line in info if line.get("pv")]
+        scores = [self._score_to_cp(line["score"].relative) for line in lines]
+        moves = [line["pv"][0] for line in lines]
+        static_move, _ = fast_path.static_best_move(board)
+        static_drop = scores[0] - scores[moves.index(static_move)] if static_move in moves else -1
+        self.rows.append({
+            "ply": board.fullmove_number,
+            "time_taken": time_taken_seconds,
+            "user_cp": user_cp,
+            "cp_loss": cp_loss,
+            "is_blunder": is_blunder,
+            "persona": PERSONAS.index(stats["difficulty"]),
+            "n_lines": len(lines),
+            "static_drop": static_drop,
+            "scores": scores,
+            "moves": [encode_move(move) for move in moves],
+        })
+
+    def config(self):
+        return {name: getattr(self, name) for name in TUNED_PARAMS}
+
+
+# --- Worker process state (same layout as run_batch_simulations.py) ---
+_worker = {}
+
+def _close_worker():
+    user_engine = _worker.pop('user_engine', None)
+    if user_engine is not None:
+        user_engine.quit()
+    morph = _worker.pop('morph', None)
+    if morph is not None:
+        morph.close()
+
+def _init_worker():
+    import chess.engine
+
+    # One process per core already: the planner must not give each engine every core
+    os.environ.setdefault("ENGINE_THREADS", "1")
+    morph = RecordingMorphEngine(pool_size=1)
+    _worker['morph'] = morph
+    _worker['user_engine'] = chess.engine.SimpleEngine.popen_uci(morph.engine_path)
+    Finalize(None, _close_worker, exitpriority=10)
+
+def record_one_game(args):
+    i, seed = args
+    from simulate_tuning import play_game
+
+    morph = _worker['morph']
+    morph.rows = []
+    try:
+        play_game(morph, _worker['user_engine'], random.Random(seed), verbose=False)
+    except Exception as e:
+        return i, [], repr(e)
+    for row in morph.rows:
+        row["game"] = i
+    return i, morph.rows, None
+
+def worker_meta():
+    # Thresholds and search settings the games are played with, for the tuner's reference row
+    morph = _worker['morph']
+    return {
+        "engine": morph.engine_path,
+        "baseline_time": morph.BASELINE_TIME,
+        "baseline_multipv": morph.BASELINE_MULTIPV,
+        "balanced_depth": morph.BALANCED_DEPTH,
+        "config": morph.config(),
+    }
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Record baseline searches of simulated games for the replay tuner')
+    parser.add_argument('-n', '--num-games', type=int, default=200, help='Number of full games to simulate')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='Parallel worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None, help='Base seed; game i uses seed+i, so the simulated user replays (MorphEngine searches by time and can still vary)')
+    parser.add_argument('-o', '--output', type=str, default=os.path.join(ROOT, 'replay.npz'), help='Dataset file to write')
+    args = parser.parse_args()
+
+    os.environ.setdefault('MOVE_LOG_TAG', 'replay')
+    base_seed = args.seed if args.seed is not None else random.randrange(2**31)
+    workers = max(1, min(args.workers, args.num_games))
+    print(f"Recording {args.num_games} games on {workers} workers (base seed {base_seed})")
+
+    rows = []
+    failed = 0
+    jobs = [(i, base_seed + i) for i in range(args.num_games)]
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        meta = {"timestamp": datetime.now().isoformat(), "games": args.num_games, "seed": base_seed,
+                **pool.apply(worker_meta)}
+        for done, (i, game_rows, error) in enumerate(pool.imap_unordered(record_one_game, jobs), 1):
+            if error:
+                failed += 1
+                print(f"[{done}/{args.num_games}] Game {i + 1} failed: {error}")
+                continue
+            rows.extend(game_rows)
+            print(f"[{done}/{args.num_games}] Game {i + 1}: {len(game_rows)} decisions")
+        pool.close()
+        pool.join()
+
+    rows.sort(key=lambda row: (row["game"], row["ply"]))
+    save_dataset(args.output, build_dataset(rows, meta))
+    print(f"Saved {len(rows)} decisions from {args.num_games - failed} games to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+# Replay dataset: one row per bot decision that ran a baseline search (forced moves and
+# mates in one don't depend on the thresholds). Written by record_replay.py, read by
+# tune_replay.py. Stored as a compressed .npz; line arrays are padded to the widest row.
+#
+#   game, ply        int32   recording game index, fullmove number
+#   time_taken       float32 seconds the user took
+#   user_cp          int32   baseline score for the user (what _choose_persona sees)
+#   cp_loss          int32   user's CP loss on the move that led here
+#   is_blunder       bool
+#   persona          int8    index into PERSONAS of the recorded decision
+#   scores           int32   (rows, lines) baseline MultiPV scores for the bot, best first
+#   moves            uint16  (rows, lines) first move of each line (move_codec)
+#   n_lines          int16   valid lines per row; padding is NO_LINE / 0
+#   static_drop      int32   drop of the static (Balanced) move from line 1, -1 if not in the lines
+PERSONAS = ("Defensive Master", "Balanced Challenger", "Assist Mode", "Mercy Mode (Speed)", "Mercy Mode (Rescue)")
+NO_LINE = np.iinfo(np.int32).min
+
+ROW_COLUMNS = {
+    "game": np.int32,
+    "ply": np.int32,
+    "time_taken": np.float32,
+    "user_cp": np.int32,
+    "cp_loss": np.int32,
+    "is_blunder": np.bool_,
+    "persona": np.int8,
+    "n_lines": np.int16,
+    "static_drop": np.int32,
+}
+
+
+def build_dataset(rows, meta):
+    """rows: dicts with ROW_COLUMNS plus "scores"/"moves" lists of equal length."""
+    width = max((len(row["scores"]) for row in rows), default=0)
+    data = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in ROW_COLUMNS.items()}
+    data["scores"] = np.full((len(rows), width), NO_LINE, dtype=np.int32)
+    data["moves"] = np.zeros((len(rows), width), dtype=np.uint16)
+    for i, row in enumerate(rows):
+        data["scores"][i, :len(row["scores"])] = row["scores"]
+        data["moves"][i, :len(row["moves"])] = row["moves"]
+    data["meta"] = meta
+    return data
+
+
+def save_dataset(path, data):
+    arrays = {name: value for name, value in data.items() if name != "meta"}
+    np.savez_compressed(path, meta=np.array(json.dumps(data["meta"])), **arrays)
+
+
+def load_dataset(*paths):
+    """Load and concatenate datasets; meta comes from the first, game indexes are kept distinct."""
+    parts = []
+    for path in paths:
+        with np.load(path) as npz:
+            part = {name: npz[name] for name in npz.files if name != "meta"}
+            part["meta"] = json.loads(str(npz["meta"]))
+        parts.append(part)
+    if len(parts) == 1:
+        return parts[0]
+
+    width = max(part["scores"].shape[1] for part in parts)
+    offset = 0
+    for part in parts:
+        pad = width - part["scores"].shape[1]
+        part["scores"] = np.pad(part["scores"], ((0, 0), (0, pad)), constant_values=NO_LINE)
+        part["moves"] = np.pad(part["moves"], ((0, 0), (0, pad)))
+        part["game"] = part["game"] + offset
+        offset = int(part["game"].max()) + 1 if len(part["game"]) else offset
+    data = {name: np.concatenate([part[name] for part in parts]) for name in parts[0] if name != "meta"}
+    data["meta"] = parts[0]["meta"]
+    return data
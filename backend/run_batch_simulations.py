@@ -1,14 +1,20 @@
 import os
 import sys
+import json
 import time
+import random
 import subprocess
 import shutil
+import multiprocessing
+from multiprocessing.util import Finalize
 from datetime import datetime
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BACKEND = os.path.join(ROOT, 'backend')
 LOG_PATH = os.path.join(ROOT, 'game_log.csv')
 
+sys.path.append(BACKEND)
+
 def ensure_backend_env():
     req = os.path.join(BACKEND, 'requirements.txt')
     if os.path.exists(req):
@@ -22,11 +28,38 @@ def rotate_log(tag: str):
         # Clear log to start fresh for batch
         os.remove(LOG_PATH)
 
-def run_one_game(i: int):
-    print(f"\n=== Running game {i+1} ===")
-    result = subprocess.run([sys.executable, os.path.join(BACKEND, 'simulate_tuning.py')], cwd=BACKEND)
-    if result.returncode != 0:
-        print(f"Game {i+1} failed with code {result.returncode}")
+# --- Worker process state ---
+# Each worker keeps one MorphEngine (single pooled Stockfish) and one user engine for all its games.
+_worker = {}
+
+def _close_worker():
+    user_engine = _worker.pop('user_engine', None)
+    if user_engine is not None:
+        user_engine.quit()
+    morph = _worker.pop('morph', None)
+    if morph is not None:
+        morph.close()
+
+def _init_worker():
+    import chess.engine
+    from morph_engine import MorphEngine
+
+    # One process per core already: the planner must not give each engine every core
+    os.environ.setdefault("ENGINE_THREADS", "1")
+    morph = MorphEngine(pool_size=1)
+    _worker['morph'] = morph
+    _worker['user_engine'] = chess.engine.SimpleEngine.popen_uci(morph.engine_path)
+    Finalize(None, _close_worker, exitpriority=10)
+
+def run_one_game(args):
+    i, seed = args
+    from simulate_tuning import play_game
+
+    try:
+        summary = play_game(_worker['morph'], _worker['user_engine'], random.Random(seed), verbose=False)
+    except Exception as e:
+        return {"game": i, "seed": seed, "error": repr(e)}
+    return {"game": i, "seed": seed, **summary}
 
 def analyze():
     print("\n=== Analysis after batch ===")
@@ -36,17 +69,41 @@ def main():
     import argparse
     parser = argparse.ArgumentParser(description='Run batch MorphEngine simulations')
     parser.add_argument('-n', '--num-games', type=int, default=1000, help='Number of full games to simulate')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='Parallel worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=None, help='Base seed; game i uses seed+i, so the simulated user replays (MorphEngine searches by time and can still vary)')
     parser.add_argument('--rotate-tag', type=str, default=datetime.now().strftime('%Y%m%d_%H%M%S'), help='Tag to rotate previous log file')
+    parser.add_argument('--results', type=str, default=None, help='JSONL file for per-game results (default: batch_results_<tag>.jsonl)')
     args = parser.parse_args()
 
     ensure_backend_env()
     rotate_log(args.rotate_tag)
 
+    base_seed = args.seed if args.seed is not None else random.randrange(2**31)
+    results_path = args.results or os.path.join(ROOT, f"batch_results_{args.rotate_tag}.jsonl")
+    workers = max(1, min(args.workers, args.num_games))
+    print(f"Running {args.num_games} games on {workers} workers (base seed {base_seed})")
+    print(f"Streaming per-game results to {results_path}")
+
+    # Columnar log (MOVE_LOG_FORMAT=parquet) partitions this batch under its tag
+    os.environ.setdefault('MOVE_LOG_TAG', args.rotate_tag)
+
     start = time.time()
-    for i in range(args.num_games):
-        run_one_game(i)
+    failed = 0
+    jobs = [(i, base_seed + i) for i in range(args.num_games)]
+    with open(results_path, 'w') as out, multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for done, result in enumerate(pool.imap_unordered(run_one_game, jobs), 1):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+                print(f"[{done}/{args.num_games}] Game {result['game'] + 1} failed: {result['error']}")
+            else:
+                print(f"[{done}/{args.num_games}] Game {result['game'] + 1}: {result['result']} "
+                      f"({result['termination']}, {result['moves']} moves, {result['duration']}s)")
+        pool.close()
+        pool.join()
     dur = time.time() - start
-    print(f"\nBatch completed: {args.num_games} games in {dur/60:.1f} min")
+    print(f"\nBatch completed: {args.num_games} games in {dur/60:.1f} min ({failed} failed)")
 
     analyze()
 
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class SearchBudget:
+    """
+    Scales MorphEngine's search limits to keep move latency inside an SLO.
+
+    Two signals drive a scale factor in [min_scale, 1.0]:
+      - latency: p95 of recent moves above target -> cut the scale (multiplicative),
+        comfortably below target -> recover slowly (additive). Judged once per window
+        of fresh samples (or per interval when traffic is light), so a slow burst cuts
+        the scale once instead of on every move until it leaves the window.
+      - load: more moves in flight than engines -> scale down immediately by the
+        overload ratio, so spikes shorten searches instead of queueing behind them.
+    """
+
+    def __init__(self, target_p95=0.5, capacity=2, window=200, min_scale=0.25, interval=2.0):
+        self.target_p95 = target_p95
+        self.capacity = max(1, capacity)
+        self.min_scale = min_scale
+        self.window = window
+        self.interval = interval
+
+        self._latencies = deque(maxlen=window)
+        # Samples since the scale was last adjusted; each adjustment only sees its own
+        self._fresh = []
+        self._adjusted = time.monotonic()
+        self._lock = threading.Lock()
+        self._scale = 1.0
+        self._in_flight = 0
+
+    @staticmethod
+    def _p95(samples):
+        samples = sorted(samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def p95(self):
+        with self._lock:
+            samples = list(self._latencies)
+        return self._p95(samples) if samples else None
+
+    def observe(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._fresh.append(latency)
+            # Need a few samples before reacting to the tail
+            if len(self._fresh) < 10:
+                return
+            now = time.monotonic()
+            if len(self._fresh) < self.window and now - self._adjusted < self.interval:
+                return
+            p95 = self._p95(self._fresh)
+            self._fresh = []
+            self._adjusted = now
+            if p95 > self.target_p95:
+                self._scale = max(self.min_scale, self._scale * 0.8)
+            elif p95 < self.target_p95 * 0.7:
+                self._scale = min(1.0, self._scale + 0.05)
+
+    @contextmanager
+    def track(self):
+        # Counts in-flight moves and feeds their wall time back into the controller
+        with self._lock:
+            self._in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self.observe(time.monotonic() - start)
+
+    def scale(self):
+        with self._lock:
+            scale = self._scale
+            overload = self._in_flight / self.capacity
+        if overload > 1.0:
+            scale = scale / overload
+        return max(self.min_scale, scale)
+
+    @staticmethod
+    def _depth(depth, scale):
+        # Depth is exponential in cost: shave at most a few plies, never below 3
+        return max(min(3, depth), depth - round((1.0 - scale) * 4))
+
+    def limits(self, baseline_time, defensive_depth, mistake_depth=None, mistake_lines=None):
+        """
+        Search limits for the next move, plus a report of what was granted.
+        mistake_depth / mistake_lines: depth of the extra mistake searches and how many
+        lines they may verify (the widen MultiPV cap or the shortlist size).
+        """
+        scale = self.scale()
+        limits = {
+            "scale": round(scale, 3),
+            "baseline_time": round(baseline_time * scale, 3),
+            "defensive_depth": self._depth(defensive_depth, scale),
+        }
+        if mistake_depth is not None:
+            limits["mistake_depth"] = self._depth(mistake_depth, scale)
+        if mistake_lines is not None:
+            limits["mistake_lines"] = max(1, round(mistake_lines * scale))
+        return limits
+
+    def stats(self):
+        p95 = self.p95()
+        with self._lock:
+            return {
+                "target_p95": self.target_p95,
+                "p95": round(p95, 4) if p95 is not None else None,
+                "scale": round(self._scale, 3),
+                "in_flight": self._in_flight,
+                "capacity": self.capacity,
+            }
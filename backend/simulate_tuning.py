@@ -2,54 +2,62 @@ import chess
 import chess.engine
 import os
 import sys
+import time
 import random
+import uuid
+from collections import Counter
 from morph_engine import MorphEngine
 
 # Add current directory to path so we can import MorphEngine
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-def simulate_game():
-    print("--- Starting Tuning Simulation ---")
-    print("Simulating a game between 'Weak User' and 'MorphEngine'...")
+MAX_MOVES = 200
+# Roughly 50ms of single-threaded Stockfish; a node limit, unlike a time limit,
+# gives the same move for the same position on every run
+USER_NODES = 50000
 
-    # Initialize MorphEngine
-    morph = MorphEngine()
-    
-    # Initialize a separate engine to act as the "User" (Weak Stockfish)
-    # We'll use the same stockfish binary but limit its strength
-    stockfish_path = morph.engine_path
-    if not os.path.exists(stockfish_path):
-        print(f"Error: Stockfish not found at {stockfish_path}")
-        return
+def play_game(morph, user_engine, rng=None, max_moves=MAX_MOVES, verbose=True):
+    """
+    Play one 'Weak User' (White) vs MorphEngine (Black) game with the given engines.
+    The user's randomness comes from rng and its engine searches a fixed node count
+    (from a cleared hash), so a seeded rng replays the same user behaviour.
+    MorphEngine's own searches are time-limited, so its moves can still vary.
+    Returns a summary dict.
+    """
+    rng = rng or random.Random()
+    log = print if verbose else (lambda *args, **kwargs: None)
+    start = time.time()
 
-    user_engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
-    # Limit user engine to be weak (e.g., 100ms per move, low skill)
+    # Limit user engine to be weak (a ~50ms search)
     # Note: Stockfish doesn't always respect Skill Level perfectly without UCI options, 
-    # but low time is usually enough to make it blunder occasionally.
-    user_limit = chess.engine.Limit(time=0.05) 
+    # but a small search is usually enough to make it blunder occasionally.
+    user_limit = chess.engine.Limit(nodes=USER_NODES)
 
     board = chess.Board()
+    # Lets MorphEngine carry evals between turns instead of re-searching the previous position
+    game_id = str(uuid.uuid4())
+    personas = Counter()
     
     # Play until game over or max moves reached
     move_count = 0
-    MAX_MOVES = 200
 
-    while not board.is_game_over() and move_count < MAX_MOVES:
+    while not board.is_game_over() and move_count < max_moves:
         move_count += 1
-        print(f"\nMove {move_count}:")
+        log(f"\nMove {move_count}:")
         
         # --- USER MOVE (White) ---
         # We want the user to make some mistakes to trigger "Mercy Mode"
         # Let's sometimes play a random legal move to simulate a blunder
-        if random.random() < 0.2:
-            print("User is making a random blunder...")
-            user_move = random.choice(list(board.legal_moves))
+        if rng.random() < 0.2:
+            log("User is making a random blunder...")
+            user_move = rng.choice(list(board.legal_moves))
         else:
-            result = user_engine.play(board, user_limit)
+            # game= sends ucinewgame on the first move, so earlier games' hash can't change the search
+            result = user_engine.play(board, user_limit, game=game_id)
             user_move = result.move
             
         board.push(user_move)
-        print(f"User played: {user_move.uci()}")
+        log(f"User played: {user_move.uci()}")
         
         if board.is_game_over():
             break
@@ -67,31 +75,63 @@ def simulate_game():
         board.push(user_move)
         
         # Simulate user taking some time (e.g., 2-5 seconds)
-        time_taken = random.uniform(1.0, 6.0)
+        time_taken = rng.uniform(1.0, 6.0)
         
-        print(f"MorphEngine analyzing...")
+        log(f"MorphEngine analyzing...")
         bot_move_uci, stats = morph.get_move(
             fen=current_fen, 
             time_taken_seconds=time_taken, 
             prev_fen=prev_fen, 
-            user_move_uci=user_move.uci()
+            user_move_uci=user_move.uci(),
+            game_id=game_id
         )
         
         if bot_move_uci:
-            print(f"MorphEngine Stats: {stats}")
-            print(f"MorphEngine played: {bot_move_uci}")
+            log(f"MorphEngine Stats: {stats}")
+            log(f"MorphEngine played: {bot_move_uci}")
+            personas[stats.get("difficulty", "Unknown")] += 1
             board.push(chess.Move.from_uci(bot_move_uci))
         else:
-            print("MorphEngine resigned or failed.")
+            log("MorphEngine resigned or failed.")
             break
 
-    print("\n--- Simulation Complete ---")
-    print(f"Result: {board.result()}")
-    print(f"Termination: {board.outcome().termination if board.outcome() else 'Max moves reached'}")
-    print(f"Final FEN: {board.fen()}")
-    print(f"Game Log should be updated at: {morph.log_file}")
-    
-    user_engine.quit()
+    outcome = board.outcome()
+    return {
+        "result": board.result(),
+        "termination": outcome.termination.name if outcome else "MAX_MOVES",
+        "moves": move_count,
+        "personas": dict(personas),
+        "final_fen": board.fen(),
+        "duration": round(time.time() - start, 2),
+    }
+
+def simulate_game(seed=None):
+    print("--- Starting Tuning Simulation ---")
+    print("Simulating a game between 'Weak User' and 'MorphEngine'...")
+
+    # Initialize MorphEngine
+    morph = MorphEngine(pool_size=1)
+    try:
+        # Initialize a separate engine to act as the "User" (Weak Stockfish)
+        # We'll use the same stockfish binary but limit its strength
+        stockfish_path = morph.engine_path
+        if not os.path.exists(stockfish_path):
+            print(f"Error: Stockfish not found at {stockfish_path}")
+            return
+
+        user_engine = chess.engine.SimpleEngine.popen_uci(stockfish_path)
+        try:
+            summary = play_game(morph, user_engine, random.Random(seed))
+        finally:
+            user_engine.quit()
+
+        print("\n--- Simulation Complete ---")
+        print(f"Result: {summary['result']}")
+        print(f"Termination: {summary['termination']}")
+        print(f"Final FEN: {summary['final_fen']}")
+        print(f"Game Log should be updated at: {morph.log_file}")
+    finally:
+        morph.close()
 
 if __name__ == "__main__":
     simulate_game()
@@ -0,0 +1,83 @@
+import asyncio
+
+
+class _Abandoned(Exception):
+    """The leading request was cancelled before its search finished."""
+
+
+# _follow found nothing to join
+_MISSING = object()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent async calls: the first caller for a key runs
+    the work, later callers for the same key await the same result.
+
+    `strength` lets a caller join only work at least as good as what it asked
+    for (e.g. a longer search of the same position); weaker in-flight work is
+    not shared and the caller runs its own.
+
+    `prepare` is awaited before a caller registers as leader (e.g. taking an engine
+    from the pool). A registered leader then never waits for a resource, so a
+    follower that already holds one can wait on it without deadlocking.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def _follow(self, key, strength):
+        entry = self._inflight.get(key)
+        if entry is None or entry[1] < strength:
+            return _MISSING
+        self.coalesced += 1
+        try:
+            # shield: a follower giving up must not cancel everyone's search
+            return await asyncio.shield(entry[0])
+        except _Abandoned:
+            return _MISSING  # Leader went away mid-search; do the work ourselves
+
+    async def run(self, key, work, strength=0, prepare=None):
+        result = await self._follow(key, strength)
+        if result is not _MISSING:
+            return result
+        if prepare is not None:
+            await prepare()
+            # Someone may have become leader meanwhile; they are ready to run
+            result = await self._follow(key, strength)
+            if result is not _MISSING:
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved even when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = (future, strength)
+        self.leaders += 1
+        try:
+            result = await work()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            self.abandoned += 1
+            future.set_exception(_Abandoned())
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._inflight[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
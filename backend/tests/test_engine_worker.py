@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+
+import chess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND)
+
+from engine_dispatch import EngineDispatcher
+from engine_worker import EngineWorker
+from job_queue import LocalJobQueue
+
+
+def test_moves_beyond_pool_size_raise_budget_pressure(tmp_path, monkeypatch):
+    monkeypatch.setenv("STOCKFISH_PATH", os.path.join(BACKEND, "fake_uci_engine.py"))
+    monkeypatch.setenv("FAKE_UCI_DELAY", "0.2")
+    monkeypatch.setenv("ENGINE_PLANNER", "off")
+    monkeypatch.setenv("PONDER_MOVES", "0")
+    monkeypatch.setenv("MOVE_LOG_PATH", str(tmp_path / "log.csv"))
+    monkeypatch.setenv("OPENING_BOOK_PATH", str(tmp_path / "no_book.bin"))
+    from morph_engine import AsyncMorphEngine
+
+    async def run():
+        queue = LocalJobQueue()
+        engine = AsyncMorphEngine(pool_size=2)
+        worker = EngineWorker(queue, engine)
+        dispatcher = EngineDispatcher(queue)
+        await worker.start()
+        pressure = {"in_flight": 0, "scale": 1.0}
+
+        async def sample():
+            while True:
+                pressure["in_flight"] = max(pressure["in_flight"], engine.budget.stats()["in_flight"])
+                pressure["scale"] = min(pressure["scale"], engine.budget.scale())
+                await asyncio.sleep(0.01)
+
+        async def move(i, first):
+            # Different positions, so nothing is coalesced or cached
+            board = chess.Board()
+            board.push(first)
+            return await dispatcher.get_move_for_board(board, 5.0, game_id=f"game-{i}")
+
+        sampler = asyncio.create_task(sample())
+        try:
+            while not await dispatcher.ready():
+                await asyncio.sleep(0.05)
+            firsts = list(chess.Board().legal_moves)[:12]
+            results = await asyncio.gather(*(move(i, first) for i, first in enumerate(firsts)))
+        finally:
+            sampler.cancel()
+            await worker.close()
+            await engine.close()
+        return results, pressure
+
+    results, pressure = asyncio.run(run())
+    assert all(bot_move for bot_move, _ in results)
+    # Moves waiting for one of the 2 engines still count as in flight and shed search time
+    assert pressure["in_flight"] > 2
+    assert pressure["scale"] < 1.0
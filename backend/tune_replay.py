@@ -0,0 +1,243 @@
+"""
+Sweeps MorphEngine's persona thresholds over a recorded replay dataset (record_replay.py).
+
+Every combination of USER_WINNING_MARGIN, USER_LOSING_MARGIN, FAST_PLAY_LIMIT,
+MISTAKE_SEVERE_MIN and MISTAKE_NATURAL_MIN/MAX is replayed through the same decisions
+as _choose_persona / _pick_mistake, as array math over all recorded positions:
+
+  - personas depend only on (winning, losing, fast): one boolean matrix per persona,
+    (threshold triples x positions)
+  - mistake picks depend only on the band: the first in-band MultiPV line per
+    position, computed once per distinct band
+  - per-combination sums are matrix products of the two
+
+The replay is counterfactual per position: the recorded games don't change, so the
+user's own CP loss is fixed and what moves is which persona answers it and what the
+bot gives away.
+
+    python tune_replay.py replay.npz --top 15 -o sweep.csv
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from replay_dataset import PERSONAS, load_dataset
+
+# _choose_persona rescues below this user score regardless of time
+RESCUE_CP = -300
+DEFENSIVE, BALANCED, ASSIST, SPEED, RESCUE = range(len(PERSONAS))
+# Target persona mix, in line with analyze_log.py's recommendations
+DEFAULT_TARGET = "defensive=0.1,balanced=0.5,assist=0.2,mercy=0.2"
+TRIPLE_CHUNK = 256
+
+
+def parse_values(text, kind=float):
+    """'a:b:step' (b exclusive) or 'a,b,c' -> array of values."""
+    if ":" in text:
+        start, stop, step = (kind(part) for part in text.split(":"))
+        return np.arange(start, stop, step)
+    return np.array([kind(part) for part in text.split(",")])
+
+
+def parse_target(text):
+    target = {name: 0.0 for name in ("defensive", "balanced", "assist", "mercy")}
+    for item in text.split(","):
+        name, value = item.split("=")
+        if name not in target:
+            raise ValueError(f"unknown persona group {name!r}")
+        target[name] = float(value)
+    return target
+
+
+def line_drops(data):
+    # (positions, lines - 1): drop of MultiPV lines 2..N from line 1, bot's point of view.
+    # Missing lines become -1 and never fall in a band (bands start at >= 0).
+    scores = data["scores"].astype(np.int64)
+    drops = scores[:, :1] - scores[:, 1:]
+    present = np.arange(1, scores.shape[1]) < data["n_lines"][:, None]
+    return np.where(present, drops, -1)
+
+
+def pick_mistakes(drops, min_drop, max_drop):
+    """Same rule as MorphEngine._pick_mistake: first line with min <= drop (<= max, if max)."""
+    in_band = drops >= min_drop
+    if max_drop:
+        in_band &= drops <= max_drop
+    found = in_band.any(axis=1)
+    first = in_band.argmax(axis=1)
+    picked = np.where(found, drops[np.arange(len(drops)), first], 0)
+    # No candidate: the best move is played (drop 0)
+    return picked.astype(np.float32), (~found).astype(np.float32)
+
+
+def personas(user_cp, time_taken, winning, losing, fast):
+    """(triples, positions) persona codes, mirroring MorphEngine._choose_persona."""
+    u = user_cp[None, :]
+    t = time_taken[None, :]
+    defensive = u > winning[:, None]
+    losing_ = ~defensive & (u < losing[:, None])
+    rescue = losing_ & (u < RESCUE_CP)
+    speed = losing_ & ~rescue & (t < fast[:, None])
+    codes = np.full(defensive.shape, BALANCED, dtype=np.int8)
+    codes[defensive] = DEFENSIVE
+    codes[losing_] = ASSIST
+    codes[speed] = SPEED
+    codes[rescue] = RESCUE
+    return codes
+
+
+def sweep(data, grid, target):
+    user_cp = data["user_cp"].astype(np.int64)
+    time_taken = data["time_taken"].astype(np.float64)
+    cp_loss = data["cp_loss"].astype(np.float32)
+    blunder = data["is_blunder"].astype(np.float32)
+    n = len(user_cp)
+    drops = line_drops(data)
+
+    # Balanced plays the static move; when it is outside the recorded lines its drop is
+    # at least the last line's, which is used as the estimate
+    last_drop = drops[np.arange(n), np.maximum(data["n_lines"] - 2, 0)] if drops.shape[1] else np.zeros(n)
+    static_drop = np.where(data["static_drop"] >= 0, data["static_drop"], np.maximum(last_drop, 0)).astype(np.float32)
+
+    # Mistake outcomes once per distinct band: (bands, positions)
+    natural_bands = [(lo, hi) for lo in grid["natural_min"] for hi in grid["natural_max"] if not hi or hi > lo]
+    natural = [pick_mistakes(drops, lo, hi) for lo, hi in natural_bands]
+    natural_drop = np.stack([d for d, _ in natural], axis=1)
+    natural_fallback = np.stack([f for _, f in natural], axis=1)
+    severe = [pick_mistakes(drops, lo, None) for lo in grid["severe_min"]]
+    severe_drop = np.stack([d for d, _ in severe], axis=1)
+    severe_fallback = np.stack([f for _, f in severe], axis=1)
+
+    triples = np.array(np.meshgrid(grid["winning"], grid["losing"], grid["fast"], indexing="ij")).reshape(3, -1).T
+    frames = []
+    for start in range(0, len(triples), TRIPLE_CHUNK):
+        chunk = triples[start:start + TRIPLE_CHUNK]
+        codes = personas(user_cp, time_taken, chunk[:, 0], chunk[:, 1], chunk[:, 2])
+        masks = [(codes == p).astype(np.float32) for p in range(len(PERSONAS))]
+        assist = masks[ASSIST]
+        mercy = masks[SPEED] + masks[RESCUE]
+        helped = assist + mercy
+        counts = np.stack([m.sum(axis=1) for m in masks], axis=1)  # (chunk, personas)
+
+        # (chunk, bands) sums of dropped cp and fallbacks
+        assist_drop = assist @ natural_drop
+        assist_fallback = assist @ natural_fallback
+        mercy_drop = mercy @ severe_drop
+        mercy_fallback = mercy @ severe_fallback
+        balanced_drop = masks[BALANCED] @ static_drop
+        help_cp_loss = helped @ cp_loss
+        help_blunders = helped @ blunder
+
+        # Broadcast to (chunk, natural bands, severe mins)
+        mistakes = (counts[:, ASSIST] + counts[:, SPEED] + counts[:, RESCUE])[:, None, None]
+        given = assist_drop[:, :, None] + mercy_drop[:, None, :]
+        fallbacks = assist_fallback[:, :, None] + mercy_fallback[:, None, :]
+        shape = given.shape
+        c, b, s = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), np.arange(shape[2]), indexing="ij")
+        c, b, s = c.ravel(), b.ravel(), s.ravel()
+
+        shares = counts / n
+        frame = {
+            "winning": chunk[c, 0].astype(int), "losing": chunk[c, 1].astype(int), "fast": chunk[c, 2],
+            "severe_min": np.asarray(grid["severe_min"])[s],
+            "natural_min": np.array([lo for lo, _ in natural_bands])[b],
+            "natural_max": np.array([hi for _, hi in natural_bands])[b],
+        }
+        for p, name in enumerate(("defensive", "balanced", "assist", "mercy_speed", "mercy_rescue")):
+            frame[name] = shares[c, p]
+        frame["bot_drop"] = ((given + balanced_drop[:, None, None]) / n).ravel()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            frame["mistake_drop"] = (given / mistakes).ravel()
+            frame["fallback"] = (fallbacks / mistakes).ravel()
+            frame["help_cp_loss"] = (help_cp_loss / helped.sum(axis=1))[c]
+            frame["blunders_helped"] = (help_blunders / max(blunder.sum(), 1))[c]
+        mix = np.abs(shares[:, DEFENSIVE] - target["defensive"]) + np.abs(shares[:, BALANCED] - target["balanced"]) \
+            + np.abs(shares[:, ASSIST] - target["assist"]) + np.abs(shares[:, SPEED] + shares[:, RESCUE] - target["mercy"])
+        frame["mix_error"] = mix[c] / 2
+        frames.append(pd.DataFrame(frame))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def replay_personas(data, config):
+    """Persona codes the recorded positions get under one config."""
+    one = lambda name: np.array([config[name]], dtype=np.float64)
+    return personas(data["user_cp"].astype(np.int64), data["time_taken"].astype(np.float64),
+                    one("USER_WINNING_MARGIN"), one("USER_LOSING_MARGIN"), one("FAST_PLAY_LIMIT"))[0]
+
+
+def log_frame(data, codes):
+    """The columns analyze_log.py aggregates, for a persona assignment."""
+    return pd.DataFrame({
+        "time_taken": data["time_taken"],
+        "cp_loss": data["cp_loss"],
+        "is_blunder": data["is_blunder"],
+        "bot_persona": np.array(PERSONAS)[codes],
+    })
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Sweep persona thresholds over a recorded replay dataset')
+    parser.add_argument('datasets', nargs='+', help='Replay .npz files from record_replay.py')
+    parser.add_argument('--winning', type=str, default='100:401:25', help='USER_WINNING_MARGIN values (a:b:step or a,b,c)')
+    parser.add_argument('--losing', type=str, default='-200:101:25', help='USER_LOSING_MARGIN values')
+    parser.add_argument('--fast', type=str, default='1:5.01:0.5', help='FAST_PLAY_LIMIT values')
+    parser.add_argument('--severe-min', type=str, default='250:601:50', help='MISTAKE_SEVERE_MIN values')
+    parser.add_argument('--natural-min', type=str, default='100:301:25', help='MISTAKE_NATURAL_MIN values')
+    parser.add_argument('--natural-max', type=str, default='250:501:50', help='MISTAKE_NATURAL_MAX values (0 = no cap)')
+    parser.add_argument('--target', type=str, default=DEFAULT_TARGET, help='Target persona mix the results are ranked by')
+    parser.add_argument('--top', type=int, default=10, help='Rows to print')
+    parser.add_argument('-o', '--out', type=str, default=None, help='Write every combination as CSV')
+    args = parser.parse_args()
+
+    from analyze_log import aggregate, report
+
+    data = load_dataset(*args.datasets)
+    n = len(data["user_cp"])
+    if n == 0:
+        print("Dataset is empty.")
+        return
+    meta = data["meta"]
+    print(f"Replay dataset: {n} decisions, {len(np.unique(data['game']))} games, "
+          f"{data['scores'].shape[1]} lines max (engine {meta.get('engine')}, baseline {meta.get('baseline_time')}s)")
+
+    # The recorded config must replay to the recorded personas, or the model is off
+    recorded = meta.get("config")
+    if recorded:
+        agree = (replay_personas(data, recorded) == data["persona"]).mean()
+        print(f"Recorded config {recorded}: replay matches {agree:.1%} of recorded personas")
+
+    grid = {
+        "winning": parse_values(args.winning, int),
+        "losing": parse_values(args.losing, int),
+        "fast": parse_values(args.fast, float),
+        "severe_min": parse_values(args.severe_min, int),
+        "natural_min": parse_values(args.natural_min, int),
+        "natural_max": parse_values(args.natural_max, int),
+    }
+    start = time.perf_counter()
+    results = sweep(data, grid, parse_target(args.target))
+    seconds = time.perf_counter() - start
+    print(f"Swept {len(results)} combinations in {seconds:.2f}s ({len(results) / seconds:,.0f}/s)")
+
+    results = results.sort_values(["mix_error", "bot_drop"], kind="stable").reset_index(drop=True)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(results.head(args.top).to_string(float_format=lambda v: f"{v:.3f}"))
+    if args.out:
+        results.to_csv(args.out, index=False)
+        print(f"Results saved to {args.out}")
+
+    best = results.iloc[0]
+    config = {"USER_WINNING_MARGIN": best["winning"], "USER_LOSING_MARGIN": best["losing"], "FAST_PLAY_LIMIT": best["fast"]}
+    print(f"\nBest: winning={best['winning']} losing={best['losing']} fast={best['fast']} severe_min={best['severe_min']} "
+          f"natural={best['natural_min']}-{best['natural_max']}")
+    report(aggregate(log_frame(data, replay_personas(data, config))))
+
+if __name__ == '__main__':
+    main()
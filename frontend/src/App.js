@@ -30,6 +30,7 @@ function App() {
   const [engineStats, setEngineStats] = useState(null);
   const [showStats, setShowStats] = useState(false);
   const [optionSquares, setOptionSquares] = useState({});
+  const [moveError, setMoveError] = useState(null);
   const lastMoveTime = useRef(Date.now());
 
   useEffect(() => {
@@ -78,6 +79,7 @@ function App() {
       setIsGameStarted(true);
       setModalOpen(false);
       setGameOverData(null);
+      setMoveError(null);
       lastMoveTime.current = Date.now();
 
       if (res.data.orientation === "black") {
@@ -88,6 +90,63 @@ function App() {
     }
   };
 
+  // FastAPI error detail: a string, or {error, fen} for a position out of sync
+  const errorText = (detail) =>
+    detail && typeof detail === "object" ? detail.error || JSON.stringify(detail) : detail;
+
+  // Reads /get-move/stream (Server-Sent Events): persona and search updates while the bot
+  // thinks, then the same body /get-move returns. Null only when the backend has no stream
+  // endpoint (404/405) or could not be reached; any other failure is thrown.
+  const streamBotMove = async (payload, onEvent) => {
+    let res;
+    try {
+      res = await fetch(`${API_URL}/get-move/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload),
+      });
+    } catch (err) {
+      return null;
+    }
+    if (res.ok && !res.body) return null;
+    if (!res.ok) {
+      let detail = res.statusText;
+      try {
+        detail = errorText((await res.json()).detail) || detail;
+      } catch (err) {
+        // Not a JSON error body
+      }
+      // Route missing (unknown games are 404 too, with their own detail)
+      if (res.status === 405 || (res.status === 404 && detail === "Not Found")) return null;
+      throw new Error(`Move failed (${res.status}): ${detail}`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        const chunk = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        let name = "message";
+        let data = "";
+        chunk.split("\n").forEach((line) => {
+          if (line.startsWith("event: ")) name = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        });
+        const parsed = JSON.parse(data);
+        if (name === "move") return parsed;
+        if (name === "error") throw new Error(`Move failed (${parsed.status}): ${errorText(parsed.detail)}`);
+        onEvent(name, parsed);
+      }
+    }
+    throw new Error("Move stream ended without a move");
+  };
+
   const makeBotMove = async (
     gId,
     userMove,
@@ -95,13 +154,23 @@ function App() {
     timeTaken,
     currentPgn
   ) => {
+    setMoveError(null);
     try {
-      const res = await axios.post(`${API_URL}/get-move`, {
+      const payload = {
         game_id: gId,
         user_move: userMove || "0000",
         fen: currentFen,
         time_taken: timeTaken,
+      };
+      const data = await streamBotMove(payload, (name, event) => {
+        if (name === "persona") {
+          setEngineStats({ ...event, difficulty: event.persona });
+        } else if (name === "info") {
+          setEngineStats((prev) => (prev ? { ...prev, depth: event.depth } : prev));
+        }
       });
+      // Older backends (no stream endpoint) get the plain request
+      const res = data ? { data } : await axios.post(`${API_URL}/get-move`, payload);
 
       console.log("Bot Move Response:", JSON.stringify(res.data, null, 2)); // DEBUG LOG
 
@@ -133,6 +202,16 @@ function App() {
       }
     } catch (err) {
       console.error("Error getting bot move", err);
+      const detail = err.response && err.response.data ? errorText(err.response.data.detail) : err.message;
+      setMoveError(detail || "Move failed");
+      // The backend took the move back; do the same so it can be played again
+      if (userMove) {
+        const previous = new Chess();
+        previous.loadPgn(currentPgn || "");
+        previous.undo();
+        setGame(previous);
+        setFen(previous.fen());
+      }
     }
   };
 
@@ -408,6 +487,11 @@ function App() {
               </div>
 
               <div className="flex gap-2">
+                {moveError && (
+                  <span className="px-3 py-1 bg-red-50 text-dessert-strawberry text-xs font-bold rounded-full flex items-center gap-1">
+                    <AlertTriangle className="w-3 h-3" /> {moveError}
+                  </span>
+                )}
                 {game.inCheck() && !game.isCheckmate() && (
                   <span className="px-3 py-1 bg-dessert-strawberry text-white text-xs font-bold uppercase tracking-wider rounded-full shadow-sm flex items-center gap-1">
                     <AlertTriangle className="w-3 h-3" /> Check